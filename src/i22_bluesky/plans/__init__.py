@@ -1,9 +1,10 @@
-from .linkam import linkam_plan, save_device_for_linkam
+from .linkam import linkam_plan, resume_linkam_plan, save_device_for_linkam
 from .pressure_jump import (
     check_detectors_for_pressure_jump,
     pressure_jump,
     save_device_for_pressure_jump,
 )
+from .session import run_session
 from .stopflow import (
     check_detectors_for_stopflow,
     check_stopflow_assembly,
@@ -11,6 +12,7 @@ from .stopflow import (
     save_device_for_stopflow,
     stopflow,
     stress_test_stopflow,
+    sweep_stopflow_rate,
 )
 from .test_pressure_cell import make_popping_sound
 
@@ -19,8 +21,10 @@ __all__ = [
     "pressure_jump",
     "save_device_for_pressure_jump",
     "linkam_plan",
+    "resume_linkam_plan",
     "save_device_for_linkam",
     "make_popping_sound",
+    "run_session",
     "test_pressure_cell",
     "stopflow",
     "check_detectors_for_stopflow",
@@ -28,4 +32,5 @@ __all__ = [
     "check_stopflow_experiment",
     "save_device_for_stopflow",
     "stress_test_stopflow",
+    "sweep_stopflow_rate",
 ]
@@ -1,11 +1,15 @@
+from pathlib import Path
 from typing import Annotated, Any
 
+import bluesky.plan_stubs as bps
 import bluesky.preprocessors as bpp
+import numpy as np
 from bluesky.utils import MsgGenerator
-from dodal.common.maths import step_to_num
 from dodal.devices.linkam3 import Linkam3
 from dodal.plan_stubs.data_session import attach_data_session_metadata_decorator
+from event_model import RunStart
 from ophyd_async.core import Device, StandardDetector, StandardFlyer
+from ophyd_async.epics.adcore import NDFileHDFIO
 from ophyd_async.fastcs.panda import HDFPanda, StaticSeqTableTriggerLogic
 from ophyd_async.plan_stubs import setup_ndstats_sum
 from pydantic import validate_call
@@ -13,6 +17,12 @@ from pydantic import validate_call
 from i22_bluesky.stubs.linkam import (
     LinkamTrajectory,
     capture_linkam_segment,
+    capture_linkam_segments,
+    coalesce_flown_segments,
+)
+from i22_bluesky.stubs.tetramm import (
+    DEFAULT_TETRAMM_READINGS_PER_FRAME,
+    tetramm_averaging_decorator,
 )
 from i22_bluesky.util.baseline import (
     DEFAULT_DETECTORS,
@@ -20,13 +30,19 @@ from i22_bluesky.util.baseline import (
     DEFAULT_PANDA,
     DEFAULT_STAMPED_DETECTOR,
 )
+from i22_bluesky.util.checkpoint import LinkamCheckpoint
+from i22_bluesky.util.monitor import DecimatedMonitor, MonitorDecimation
+from i22_bluesky.util.panda_capture import PandaCaptureSpec, apply_capture_spec
+from i22_bluesky.util.roi import DetectorROI, roi_wrapper
 from i22_bluesky.util.settings import (
     load_device,
     save_device,
     stamp_temp_pv,
 )
+from i22_bluesky.util.writer_profiles import WriterProfile, apply_writer_profile
 
 _PLAN_NAME = "linkam_plan"
+_MONITOR_STREAM_NAME = "linkam_monitor"
 
 
 def save_device_for_linkam(device: Device = DEFAULT_PANDA) -> MsgGenerator:
@@ -55,6 +71,45 @@ def linkam_plan(
         float, "Time allowed for opening shutter before triggering detectors."
     ] = 0.04,
     stream_name: Annotated[str, "Stream name for bluesky documents."] = "primary",
+    temperature_monitor: Annotated[
+        MonitorDecimation | None,
+        "If set, record linkam temperature and ramp rate throughout the run into \
+            a separate stream, decimated by these thresholds.",
+    ] = None,
+    writer_profile: Annotated[
+        WriterProfile | None,
+        "Compression for the detectors' HDF writers, None to leave them as they are.",
+    ] = WriterProfile.ARCHIVE,
+    coalesce: Annotated[
+        bool,
+        "Capture consecutive flown segments with the same frames and exposure as \
+            one acquisition, without re-arming between them.",
+    ] = True,
+    roi: Annotated[
+        dict[str, DetectorROI] | None,
+        "Region and binning of the frames to write, by detector name, for detectors \
+            that should not write full frames.",
+    ] = None,
+    checkpoint: Annotated[
+        Path | None,
+        "File to record progress through the trajectory in, so that it can be \
+            resumed after a failure.",
+    ] = None,
+    resume: Annotated[
+        bool,
+        "Start from the first point not yet captured according to the checkpoint \
+            file, rather than from the start of the trajectory.",
+    ] = False,
+    capture: Annotated[
+        PandaCaptureSpec | None,
+        "Fields the PandA captures and how, None to capture those in its saved \
+            settings.",
+    ] = None,
+    tetramm_readings_per_frame: Annotated[
+        int,
+        "Readings each TetrAMM (e.g. i0, it) writes per frame, each averaging an \
+            equal share of the samples in the frame's gate.",
+    ] = DEFAULT_TETRAMM_READINGS_PER_FRAME,
     metadata: dict[str, Any] | None = None,
 ) -> MsgGenerator:
     """
@@ -76,6 +131,18 @@ def linkam_plan(
         panda: PandA for controlling flyable motion
         stamped_detector: Detector to stamp temperature PV to H5 file
         detectors: Other StandardDetectors to capture
+        temperature_monitor: Thresholds for recording the linkam temperature and ramp
+            rate into the "linkam_monitor" stream, which is not recorded if unset
+        writer_profile: Compression for the detectors' HDF writers
+        coalesce: Whether to capture consecutive compatible flown segments as one
+            continuous acquisition
+        roi: Region and binning of the frames each named detector writes
+        checkpoint: File recording the points captured and runs completed, updated
+            after every acquisition (and every point of stepped segments)
+        resume: Whether to continue the trajectory from the checkpoint, rather than
+            starting a new one
+        capture: Fields the PandA captures, and whether each is sampled or averaged
+        tetramm_readings_per_frame: Readings each TetrAMM averages each frame into
 
     Returns:
         MsgGenerator: Plan
@@ -87,55 +154,201 @@ def linkam_plan(
     detectors = detectors | {stamped_detector}
     devices = detectors | {linkam, panda}
 
+    options = {
+        "shutter_time": shutter_time,
+        "stream_name": stream_name,
+        "temperature_monitor": temperature_monitor,
+        "writer_profile": writer_profile,
+        "coalesce": coalesce,
+        "roi": roi,
+        "capture": capture,
+        "tetramm_readings_per_frame": tetramm_readings_per_frame,
+    }
+    progress = None
+    if checkpoint is not None:
+        if resume:
+            progress = LinkamCheckpoint.load(checkpoint)
+            if progress.trajectory != trajectory:
+                raise ValueError(f"{checkpoint} is for a different trajectory")
+            if progress.complete:
+                raise ValueError(f"{checkpoint} is for a completed trajectory")
+        else:
+            progress = LinkamCheckpoint(trajectory=trajectory, plan_args=options)
+        progress.save(checkpoint)
+    elif resume:
+        raise ValueError("Cannot resume a trajectory without a checkpoint")
+    points = trajectory.expand()
+    first_point = progress.completed_points if progress is not None else 0
+
     plan_args = {
         "trajectory": trajectory,
         "linkam": linkam.name,
         "panda": panda.name,
         "stamped_detector": stamped_detector.name,
         "detectors": {detector.name for detector in detectors},
+        **options,
+        "checkpoint": str(checkpoint) if checkpoint is not None else None,
+        "resume": resume,
     }
     _md = {
+        "plan_name": _PLAN_NAME,
         "detectors": {device.name for device in detectors},
         "motors": {linkam.name},
         "plan_args": plan_args,
+        "estimated_duration": trajectory.estimated_duration()
+        - float(points["start_time"][first_point]),
         # TODO: Can we pass dimensional hint? motors? shape?
         "hints": {},
     }
+    if progress is not None:
+        _md["checkpoint"] = {
+            "id": progress.id,
+            "first_point": first_point,
+            "previous_runs": list(progress.run_uids),
+        }
     _md.update(metadata or {})
 
     for device in devices:
         yield from load_device(device, _PLAN_NAME)
     yield from stamp_temp_pv(linkam, stamped_detector)
     for det in detectors:
-        yield from setup_ndstats_sum(det)
+        # TetrAMMs write their currents without an areaDetector stats plugin
+        if isinstance(getattr(det, "fileio", None), NDFileHDFIO):
+            yield from setup_ndstats_sum(det)
+    yield from apply_writer_profile(detectors, writer_profile)
+    yield from apply_capture_spec(panda, capture)
+
+    monitor = (
+        DecimatedMonitor(
+            linkam.temp,
+            [linkam.ramp_rate],
+            temperature_monitor,
+            name=_MONITOR_STREAM_NAME,
+        )
+        if temperature_monitor is not None
+        else None
+    )
+
+    def collect_monitor():
+        if monitor is not None:
+            yield from bps.collect(monitor, name=_MONITOR_STREAM_NAME)
+
+    def stop_monitor():
+        if monitor is not None:
+            yield from bps.complete(monitor, wait=True)
+            yield from collect_monitor()
+
+    def record_progress(num_points: int):
+        if progress is not None and checkpoint is not None:
+            progress.completed_points += num_points
+            progress.save(checkpoint)
+
+    def record_run(name: str, doc: RunStart):
+        # Noted as the run starts rather than once it ends, so failed runs are too
+        if progress is not None and checkpoint is not None:
+            progress.run_uids.append(doc["uid"])
+            progress.save(checkpoint)
+
+    def capture_trajectory():
+        remaining = points[first_point:]
+        acquisitions = (
+            coalesce_flown_segments(remaining)
+            if coalesce
+            else np.split(remaining, np.flatnonzero(np.diff(remaining["segment"])) + 1)
+        )
+        # Stepped points are captured one at a time, so progress is kept for each
+        acquisitions = [
+            part
+            for acquisition in acquisitions
+            for part in (
+                [acquisition]
+                if acquisition["flown"][0]
+                else np.split(acquisition, len(acquisition))
+            )
+        ]
+        for acquisition in acquisitions:
+            first = acquisition[0]
+            if first["segment"] != acquisition[-1]["segment"]:
+                yield from capture_linkam_segments(
+                    linkam,
+                    flyer,
+                    detectors,
+                    acquisition,
+                    shutter_time=shutter_time,
+                    stream_name=stream_name,
+                )
+            else:
+                yield from capture_linkam_segment(
+                    linkam,
+                    flyer,
+                    detectors,
+                    float(first["temperature"]),
+                    float(acquisition[-1]["temperature"]),
+                    len(acquisition),
+                    float(first["rate"]),
+                    int(first["num_frames"]),
+                    float(first["exposure"]),
+                    fly=bool(first["flown"]),
+                    shutter_time=shutter_time,
+                    stream_name=stream_name,
+                )
+            yield from collect_monitor()
+            record_progress(len(acquisition))
 
     @bpp.stage_decorator(devices)
+    @tetramm_averaging_decorator(detectors, tetramm_readings_per_frame)
     @bpp.run_decorator(md=_md)
     def inner_linkam_plan():
-        start = trajectory.start
-        for segment in trajectory.path:
-            start, stop, num = (
-                start,
-                segment.stop,
-                segment.num
-                if segment.num is not None
-                else step_to_num(start, segment.stop, segment.step),
+        if monitor is not None:
+            yield from bps.declare_stream(
+                monitor, name=_MONITOR_STREAM_NAME, collect=True
             )
-            yield from capture_linkam_segment(
-                linkam,
-                flyer,
-                detectors,
-                start,
-                stop,
-                num,
-                segment.rate,
-                segment.num_frames or trajectory.default_num_frames,
-                segment.exposure or trajectory.default_exposure,
-                fly=segment.flown,
-                shutter_time=shutter_time,
-                stream_name=stream_name,
-            )
-            start = segment.stop
+            yield from bps.kickoff(monitor, wait=True)
+        yield from bpp.finalize_wrapper(capture_trajectory(), stop_monitor())
+
+    plan = roi_wrapper(inner_linkam_plan(), detectors, roi)
+    if progress is not None:
+        plan = bpp.subs_wrapper(plan, {"start": [record_run]})
+    return (yield from plan)
 
-    rs_uid = yield from inner_linkam_plan()
+
+def resume_linkam_plan(
+    checkpoint: Annotated[Path, "Checkpoint file of the trajectory to resume."],
+    linkam: Linkam3 = DEFAULT_LINKAM,
+    panda: HDFPanda = DEFAULT_PANDA,
+    stamped_detector: StandardDetector = DEFAULT_STAMPED_DETECTOR,
+    detectors: set[StandardDetector] = DEFAULT_DETECTORS,
+    metadata: dict[str, Any] | None = None,
+) -> MsgGenerator:
+    """
+    Continue a linkam_plan trajectory that failed part way through, from the first
+    point not yet captured, as a new run linked to the previous ones by the id of the
+    checkpoint in its start document. The options the trajectory was started with
+    (e.g. writer profile, ROI and PandA capture) are those of the checkpoint.
+
+    Args:
+        checkpoint: File the progress of the trajectory was recorded in
+        linkam: Linkam temperature stage
+        panda: PandA for controlling flyable motion
+        stamped_detector: Detector to stamp temperature PV to H5 file
+        detectors: Other StandardDetectors to capture
+
+    Returns:
+        MsgGenerator: Plan
+
+    Yields:
+        Iterator[MsgGenerator]: Bluesky messages
+    """
+    progress = LinkamCheckpoint.load(checkpoint)
+    rs_uid = yield from linkam_plan(
+        trajectory=progress.trajectory,
+        linkam=linkam,
+        panda=panda,
+        stamped_detector=stamped_detector,
+        detectors=detectors,
+        checkpoint=checkpoint,
+        resume=True,
+        metadata=metadata,
+        **progress.plan_args,
+    )
     return rs_uid
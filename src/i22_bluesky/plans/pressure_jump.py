@@ -4,6 +4,7 @@ import bluesky.plans as bp
 import bluesky.preprocessors as bpp
 from bluesky.protocols import Readable
 from bluesky.utils import MsgGenerator
+from dodal.devices.pressure_jump_cell import PressureJumpCell
 from dodal.devices.tetramm import TetrammDetector
 from dodal.plan_stubs.data_session import attach_data_session_metadata_decorator
 from ophyd_async.core import (
@@ -17,14 +18,37 @@ from i22_bluesky.plans.stopflow import (
     DEFAULT_BASELINE_MEASUREMENTS,
     raise_for_minimum_exposure_times,
 )
-from i22_bluesky.stubs.fly_and_collect import fly_and_collect
-from i22_bluesky.stubs.pressure_jump import prepare_seq_table_flyer_and_det
+from i22_bluesky.stubs.divided_rate import (
+    DIVIDED_SEQUENCER,
+    DIVIDED_STREAM_SUFFIX,
+    divide_trigger,
+    divided_metadata,
+    frame_deadtime,
+    too_slow_detectors,
+)
+from i22_bluesky.stubs.fly_and_collect import fly_and_collect_streams
+from i22_bluesky.stubs.pressure_jump import (
+    fast_valve_metadata,
+    fast_valve_wrapper,
+    prepare_seq_table_flyer_and_det,
+    pressure_jump_seq_table,
+)
+from i22_bluesky.stubs.tetramm import (
+    DEFAULT_TETRAMM_READINGS_PER_FRAME,
+    tetramm_averaging_decorator,
+)
 from i22_bluesky.util.baseline import (
+    DEFAULT_BASELINE_TTL,
     DEFAULT_DETECTORS,
     DEFAULT_PANDA,
     DEFAULT_PRESSURE_CELL,
 )
+from i22_bluesky.util.cached_baseline import cached_baseline
+from i22_bluesky.util.panda_capture import PandaCaptureSpec, apply_capture_spec
+from i22_bluesky.util.roi import DetectorROI, roi_wrapper
 from i22_bluesky.util.settings import load_device, save_device
+from i22_bluesky.util.telemetry import FrameRateTelemetry
+from i22_bluesky.util.writer_profiles import WriterProfile, apply_writer_profile
 
 _PLAN_NAME = "pressure_jump"
 
@@ -64,8 +88,16 @@ def pressure_jump(
     metadata: dict[str, Any] | None = None,
     baseline: set[Readable] = DEFAULT_BASELINE_MEASUREMENTS,
     detectors: set[StandardDetector] = DEFAULT_DETECTORS,
-    pressure_cell: StandardDetector = DEFAULT_PRESSURE_CELL,
+    pressure_cell: PressureJumpCell = DEFAULT_PRESSURE_CELL,
     panda: HDFPanda = DEFAULT_PANDA,
+    baseline_ttl: float = DEFAULT_BASELINE_TTL,
+    writer_profile: WriterProfile | None = WriterProfile.FAST,
+    roi: dict[str, DetectorROI] | None = None,
+    capture: PandaCaptureSpec | None = None,
+    divide_slow_detectors: bool = False,
+    max_lag: int | None = None,
+    valve_delay: float | None = None,
+    tetramm_readings_per_frame: int = DEFAULT_TETRAMM_READINGS_PER_FRAME,
 ) -> MsgGenerator:
     """
     Perform a pressure jump measurement
@@ -77,6 +109,27 @@ def pressure_jump(
         detectors: A set of detectors that will be collected.
         baseline: A set of devices to be read at the start and end of the plan
             in a stream names baseline.
+        baseline_ttl: Time (seconds) for which readings of slow-changing baseline
+            devices are reused from previous runs, 0 to always read them.
+        writer_profile: Compression for the detectors' HDF writers, None to leave
+            them as they are.
+        roi: Region and binning of the frames to write, by detector name, for
+            detectors that should not write full frames.
+        capture: Fields the PandA captures and how, None to capture those in its
+            saved settings.
+        divide_slow_detectors: Trigger detectors too slow for the exposure every
+            few frames from a second sequencer, collecting them into a separate
+            stream, rather than refusing to run.
+        max_lag: Log the rate at which each detector writes frames while
+            collecting, aborting if any falls more than this many frames behind
+            another in its stream. None to do neither.
+        valve_delay: Fire the fast valve from the PandA this long (seconds) after
+            the pre-jump frames, taking the post-jump frames straight after, so
+            the jump is timed to the frames to within microseconds. The valve is
+            armed for the run and disarmed after it. None to wait for the jump to
+            be signalled on BITA instead.
+        tetramm_readings_per_frame: Readings each TetrAMM (e.g. i0, it) writes per
+            frame, each averaging an equal share of the samples in the frame's gate.
         start_temp: initial temperature to reach before starting experiment
         cool_temp: target end temp for cooling stage
         cool_step: temperature step dT after each to perform scan
@@ -97,7 +150,8 @@ def pressure_jump(
     """
     # Check that all detectors supplied can actually go as
     # fast as requested
-    raise_for_minimum_exposure_times(exposure, detectors)
+    slow = too_slow_detectors(exposure, detectors) if divide_slow_detectors else set()
+    raise_for_minimum_exposure_times(exposure, detectors - slow)
 
     stream_name = "main"
     flyer = StandardFlyer(StaticSeqTableTriggerLogic(panda.seq[1]))
@@ -110,37 +164,83 @@ def pressure_jump(
         "panda": panda.name,
         "detectors": {d.name for d in detectors},
         "baseline": {d.name for d in baseline},
+        "baseline_ttl": baseline_ttl,
+        "writer_profile": writer_profile,
+        "roi": roi,
+        "capture": capture,
+        "divide_slow_detectors": divide_slow_detectors,
+        "max_lag": max_lag,
+        "valve_delay": valve_delay,
+        "tetramm_readings_per_frame": tetramm_readings_per_frame,
     }
     _md = {
+        "plan_name": _PLAN_NAME,
         "detectors": {d.name for d in detectors},
         "motors": {pressure_cell.name},
         "plan_args": plan_args,
         "hints": {},
     }
+    streams = {stream_name: detectors - slow}
+    deadtime = frame_deadtime(detectors - slow, exposure)
+    if valve_delay is not None:
+        _md["fast_valve"] = fast_valve_metadata(
+            pressure_jump_seq_table(
+                pre_jump_frames,
+                post_jump_frames,
+                exposure,
+                shutter_time,
+                deadtime,
+                0.0,
+                valve_delay,
+            )
+        )
+    divided = None
+    if slow:
+        divided = divide_trigger(
+            StandardFlyer(StaticSeqTableTriggerLogic(panda.seq[DIVIDED_SEQUENCER])),
+            slow,
+            exposure,
+            deadtime,
+        )
+        devices.add(divided.flyer)
+        streams[stream_name + DIVIDED_STREAM_SUFFIX] = slow
+        _md["divided_rate"] = divided_metadata(
+            divided,
+            stream_name + DIVIDED_STREAM_SUFFIX,
+            [0, pre_jump_frames] if pre_jump_frames else [0],
+        )
     _md.update(metadata or {})
 
     for device in detectors:
         yield from load_device(device, _PLAN_NAME)
 
-    @bpp.baseline_decorator(baseline)
+    @bpp.baseline_decorator(cached_baseline(baseline, baseline_ttl))
     @attach_data_session_metadata_decorator()
     @bpp.stage_decorator(devices)
+    @tetramm_averaging_decorator(detectors, tetramm_readings_per_frame)
     @bpp.run_decorator(md=_md)
     def inner_plan():
         yield from load_device(panda, _PLAN_NAME)
+        yield from apply_capture_spec(panda, capture)
+        yield from apply_writer_profile(detectors, writer_profile)
         yield from prepare_seq_table_flyer_and_det(
             flyer=flyer,
-            detectors=detectors,
+            detectors=detectors - slow,
             pre_jump_frames=pre_jump_frames,
             post_jump_frames=post_jump_frames,
             exposure=exposure,
             shutter_time=shutter_time,
+            divided=divided,
+            valve_delay=valve_delay,
         )
-        yield from fly_and_collect(
-            stream_name=stream_name,
-            detectors=detectors,
-            flyer=flyer,
+        yield from fly_and_collect_streams(
+            streams={name: list(dets) for name, dets in streams.items()},
+            flyers=([divided.flyer] if divided else []) + [flyer],
+            telemetry=None if max_lag is None else FrameRateTelemetry(max_lag),
         )
 
-    rs_uid = yield from inner_plan()
+    plan = roi_wrapper(inner_plan(), detectors, roi)
+    if valve_delay is not None:
+        plan = fast_valve_wrapper(plan, pressure_cell)
+    rs_uid = yield from plan
     return rs_uid
@@ -0,0 +1,171 @@
+import logging
+from typing import Annotated, Any, Literal
+
+from bluesky.protocols import Readable
+from bluesky.utils import MsgGenerator
+from dodal.devices.linkam3 import Linkam3
+from ophyd_async.core import Device, StandardDetector
+from ophyd_async.fastcs.panda import HDFPanda
+from pydantic import BaseModel, Field
+
+from i22_bluesky.plans.linkam import linkam_plan
+from i22_bluesky.plans.pressure_jump import pressure_jump
+from i22_bluesky.plans.stopflow import stopflow
+from i22_bluesky.stubs.linkam import LinkamTrajectory
+from i22_bluesky.stubs.session import run_staged_session
+from i22_bluesky.util.baseline import (
+    DEFAULT_BASELINE_MEASUREMENTS,
+    DEFAULT_BASELINE_TTL,
+    DEFAULT_DETECTORS,
+    DEFAULT_LINKAM,
+    DEFAULT_PANDA,
+    DEFAULT_PRESSURE_CELL,
+    DEFAULT_STAMPED_DETECTOR,
+)
+from i22_bluesky.util.panda_capture import PandaCaptureSpec
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StopflowRun(BaseModel):
+    plan: Literal["stopflow"] = "stopflow"
+    exposure: float = Field(gt=0.0, json_schema_extra={"units": "s"})
+    post_stop_frames: int = Field(ge=0)
+    pre_stop_frames: int = Field(ge=0, default=0)
+    shutter_time: float = Field(ge=0.0, default=4e-3, json_schema_extra={"units": "s"})
+    capture: PandaCaptureSpec | None = None
+    metadata: dict[str, Any] | None = None
+
+
+class PressureJumpRun(BaseModel):
+    plan: Literal["pressure_jump"] = "pressure_jump"
+    start_pressure: float
+    end_pressure: float
+    duration: float
+    exposure: float = Field(gt=0.0, json_schema_extra={"units": "s"})
+    pre_jump_frames: int = Field(ge=0, default=1)
+    post_jump_frames: int = Field(ge=0, default=1)
+    shutter_time: float = Field(ge=0.0, default=4e-3, json_schema_extra={"units": "s"})
+    capture: PandaCaptureSpec | None = None
+    metadata: dict[str, Any] | None = None
+
+
+class LinkamRun(BaseModel):
+    plan: Literal["linkam_plan"] = "linkam_plan"
+    trajectory: LinkamTrajectory
+    shutter_time: float = Field(ge=0.0, default=0.04, json_schema_extra={"units": "s"})
+    stream_name: str = "primary"
+    capture: PandaCaptureSpec | None = None
+    metadata: dict[str, Any] | None = None
+
+
+RunSpecification = Annotated[
+    StopflowRun | PressureJumpRun | LinkamRun, Field(discriminator="plan")
+]
+
+
+def run_session(
+    runs: Annotated[list[RunSpecification], "Runs to perform back to back, in order."],
+    panda: HDFPanda = DEFAULT_PANDA,
+    detectors: set[StandardDetector] = DEFAULT_DETECTORS,
+    baseline: set[Readable] = DEFAULT_BASELINE_MEASUREMENTS,
+    linkam: Linkam3 = DEFAULT_LINKAM,
+    stamped_detector: StandardDetector = DEFAULT_STAMPED_DETECTOR,
+    pressure_cell: StandardDetector = DEFAULT_PRESSURE_CELL,
+    baseline_ttl: float = DEFAULT_BASELINE_TTL,
+    close_in_background: bool = False,
+) -> MsgGenerator:
+    """
+    Perform a queue of stopflow, pressure jump and linkam runs, staging the union
+    of the devices they use once rather than for every run.
+
+    Each run is a separate bluesky run with its own start document. If a run fails
+    the rest of the session still goes ahead, the devices the failed run used
+    being reset first.
+
+    Args:
+        runs: Parameters of each run, which of stopflow, pressure_jump or linkam_plan
+            to use given by the "plan" field.
+        panda: PandA for controlling flyable motion.
+        detectors: A set of detectors that will be collected.
+        baseline: A set of devices to be read at the start and end of stopflow and
+            pressure jump runs.
+        linkam: Temperature controller for linkam runs.
+        stamped_detector: Detector to stamp temperature PV to H5 file in linkam runs.
+        pressure_cell: Pressure cell for pressure jump runs.
+        baseline_ttl: Time (seconds) for which readings of slow-changing baseline
+            devices are reused from previous runs, 0 to always read them.
+        close_in_background: Start each run while the detectors' files from the
+            previous run are still being closed, waiting for a detector's file to
+            close only when the run first uses that detector.
+
+    Returns:
+        MsgGenerator: Plan
+
+    Yields:
+        Iterator[MsgGenerator]: Bluesky messages
+    """
+
+    def plan_for(run: RunSpecification):
+        match run:
+            case StopflowRun():
+                return lambda: stopflow(
+                    exposure=run.exposure,
+                    post_stop_frames=run.post_stop_frames,
+                    pre_stop_frames=run.pre_stop_frames,
+                    shutter_time=run.shutter_time,
+                    panda=panda,
+                    detectors=detectors,
+                    baseline=baseline,
+                    metadata=run.metadata,
+                    baseline_ttl=baseline_ttl,
+                    capture=run.capture,
+                )
+            case PressureJumpRun():
+                return lambda: pressure_jump(
+                    start_pressure=run.start_pressure,
+                    end_pressure=run.end_pressure,
+                    duration=run.duration,
+                    exposure=run.exposure,
+                    pre_jump_frames=run.pre_jump_frames,
+                    post_jump_frames=run.post_jump_frames,
+                    shutter_time=run.shutter_time,
+                    metadata=run.metadata,
+                    baseline=baseline,
+                    detectors=detectors,
+                    pressure_cell=pressure_cell,
+                    panda=panda,
+                    baseline_ttl=baseline_ttl,
+                    capture=run.capture,
+                )
+            case LinkamRun():
+                return lambda: linkam_plan(
+                    trajectory=run.trajectory,
+                    linkam=linkam,
+                    panda=panda,
+                    stamped_detector=stamped_detector,
+                    detectors=detectors,
+                    shutter_time=run.shutter_time,
+                    stream_name=run.stream_name,
+                    capture=run.capture,
+                    metadata=run.metadata,
+                )
+
+    def devices_for(run: RunSpecification) -> set[Device]:
+        match run:
+            case StopflowRun() | PressureJumpRun():
+                staged = {device for device in baseline if isinstance(device, Device)}
+                return staged | detectors | {panda}
+            case LinkamRun():
+                return detectors | {stamped_detector, linkam, panda}
+
+    def log_failure(index: int, e: Exception):
+        LOGGER.error(f"Run {index} of session ({runs[index]}) failed", exc_info=e)
+
+    uids = yield from run_staged_session(
+        [plan_for(run) for run in runs],
+        [devices_for(run) for run in runs],
+        on_failure=log_failure,
+        close_in_background=close_in_background,
+    )
+    return uids
@@ -17,12 +17,14 @@
 # start acquisition -> acquire n frames -> wait for trigger -> acquire m frames
 # where n can be 0.
 
+import logging
+from pathlib import Path
 from typing import Any
 
 import bluesky.plans as bp
 import bluesky.preprocessors as bpp
 from bluesky.protocols import Readable
-from bluesky.utils import MsgGenerator
+from bluesky.utils import FailedStatus, MsgGenerator
 from dodal.devices.tetramm import TetrammDetector
 from dodal.plan_stubs.data_session import attach_data_session_metadata_decorator
 from ophyd_async.core import (
@@ -34,18 +36,50 @@ from ophyd_async.fastcs.panda import (
     StaticSeqTableTriggerLogic,
 )
 
-from i22_bluesky.stubs.fly_and_collect import fly_and_collect
+from i22_bluesky.stubs.divided_rate import (
+    DIVIDED_SEQUENCER,
+    DIVIDED_STREAM_SUFFIX,
+    divide_trigger,
+    divided_metadata,
+    frame_deadtime,
+    too_slow_detectors,
+)
+from i22_bluesky.stubs.fly_and_collect import fly_and_collect_streams
+from i22_bluesky.stubs.rate_sweep import (
+    RateStep,
+    append_rate_step,
+    exposure_ladder,
+    search_shortest_exposure,
+)
 from i22_bluesky.stubs.stopflow import (
+    capture_stop_time,
     prepare_seq_table_flyer_and_det,
     raise_for_minimum_exposure_times,
+    record_time_since_stop,
+)
+from i22_bluesky.stubs.tetramm import (
+    DEFAULT_TETRAMM_READINGS_PER_FRAME,
+    tetramm_averaging_decorator,
 )
 from i22_bluesky.util.baseline import (
     DEFAULT_BASELINE_MEASUREMENTS,
+    DEFAULT_BASELINE_TTL,
     DEFAULT_DETECTORS,
     DEFAULT_PANDA,
     FAST_DETECTORS,
 )
+from i22_bluesky.util.cached_baseline import cached_baseline
+from i22_bluesky.util.panda_capture import PandaCaptureSpec, apply_capture_spec
+from i22_bluesky.util.roi import DetectorROI, roi_wrapper
 from i22_bluesky.util.settings import load_device, save_device
+from i22_bluesky.util.telemetry import (
+    DetectorLagError,
+    FrameRateTelemetry,
+    read_frames_written,
+)
+from i22_bluesky.util.writer_profiles import WriterProfile, apply_writer_profile
+
+LOGGER = logging.getLogger(__name__)
 
 _PLAN_NAME = "stopflow"
 
@@ -132,6 +166,99 @@ def stress_test_stopflow(
     )
 
 
+def sweep_stopflow_rate(
+    results: Path,
+    start_exposure: float = 1.0 / 100.0,
+    shortest_exposure: float = 1.0 / 1000.0,
+    duration: float = 40.0,
+    factor: float = 2.0,
+    bisect_steps: int = 3,
+    each_detector: bool = True,
+    max_lag: int | None = None,
+    panda: HDFPanda = DEFAULT_PANDA,
+    detectors: set[StandardDetector] = FAST_DETECTORS,
+    baseline: set[Readable] = DEFAULT_BASELINE_MEASUREMENTS,
+) -> MsgGenerator[dict[str, float | None]]:
+    """
+    Find the highest rate at which detectors write every frame of a stopflow run.
+
+    Runs stopflow without waiting for a stop, at exposures stepping down from
+    start_exposure by a factor each time to shortest_exposure, each run lasting
+    about the same time so that the number of frames goes up with the rate. The
+    rate of a run counts the deadtime stopflow leaves after each exposure. The
+    detectors are not held to MINIMUM_EXPOSURE_TIMES, so that their real limits are
+    found. After each run the frames every detector and the PandA wrote are
+    counted, and once a run is not sustained (it fails, times out, falls behind or
+    any frame is missing) the interval between it and the last sustained run is
+    bisected. Every run is added to the results table as it finishes.
+
+    Args:
+        results: CSV file to add a row to for each run, created if needed.
+        start_exposure: Longest exposure (seconds) to try.
+        shortest_exposure: Shortest exposure (seconds) to try.
+        duration: Time (seconds) over which to take frames at each exposure.
+        factor: Ratio of each exposure to the next in the initial steps.
+        bisect_steps: Number of exposures to try once a run is not sustained.
+        each_detector: Sweep each detector alone as well as all of them together.
+        max_lag: Count a run as not sustained as soon as any detector falls more
+            than this many frames behind another. None to wait for it to finish.
+        panda: PandA for controlling flyable motion.
+        detectors: Detectors to sweep.
+        baseline: A set of devices to be read at the start and end of each run.
+
+    Returns:
+        The highest rate (Hz) each set of detectors sustained, counting the deadtime
+        between frames, None if the longest exposure was not, by the names of the
+        detectors joined by "+".
+    """
+    detector_sets = [detectors]
+    if each_detector and len(detectors) > 1:
+        detector_sets = [{det} for det in detectors] + detector_sets
+
+    highest: dict[str, float | None] = {}
+    for detector_set in detector_sets:
+        names = sorted(det.name for det in detector_set)
+
+        def step_at(exposure: float, detector_set=detector_set, names=names):
+            # The deadtime stopflow leaves between frames, none being divided
+            deadtime = frame_deadtime(detector_set | {panda}, exposure)
+            num_frames = max(round(duration / (exposure + deadtime)), 1)
+            return RateStep(names, exposure, deadtime, num_frames)
+
+        def sustains(exposure: float, detector_set=detector_set, step_at=step_at):
+            step = step_at(exposure)
+            try:
+                yield from stopflow(
+                    exposure=exposure,
+                    post_stop_frames=0,
+                    pre_stop_frames=step.num_frames,
+                    panda=panda,
+                    detectors=detector_set,
+                    baseline=baseline,
+                    divide_slow_detectors=False,
+                    max_lag=max_lag,
+                    check_exposure=False,
+                )
+                step.frames_written = yield from read_frames_written(
+                    [*detector_set, panda]
+                )
+            except (FailedStatus, TimeoutError, DetectorLagError) as error:
+                # Writers may not have been opened, so their counts are meaningless
+                step.error = repr(error)
+            append_rate_step(results, step)
+            return step.sustained
+
+        exposure = yield from search_shortest_exposure(
+            exposure_ladder(start_exposure, shortest_exposure, factor),
+            sustains,
+            bisect_steps,
+        )
+        key = "+".join(names)
+        highest[key] = None if exposure is None else step_at(exposure).rate
+        LOGGER.info(f"{key} sustained up to {highest[key]} Hz")
+    return highest
+
+
 def save_device_for_stopflow(panda: HDFPanda = DEFAULT_PANDA) -> MsgGenerator:
     yield from save_device(panda, _PLAN_NAME)
 
@@ -146,6 +273,14 @@ def stopflow(
     detectors: set[StandardDetector] = DEFAULT_DETECTORS,
     baseline: set[Readable] = DEFAULT_BASELINE_MEASUREMENTS,
     metadata: dict[str, Any] | None = None,
+    baseline_ttl: float = DEFAULT_BASELINE_TTL,
+    writer_profile: WriterProfile | None = WriterProfile.FAST,
+    roi: dict[str, DetectorROI] | None = None,
+    capture: PandaCaptureSpec | None = None,
+    divide_slow_detectors: bool = False,
+    max_lag: int | None = None,
+    tetramm_readings_per_frame: int = DEFAULT_TETRAMM_READINGS_PER_FRAME,
+    check_exposure: bool = True,
 ) -> MsgGenerator:
     """
     Perform a stop flow measurement, see detailed description in
@@ -163,6 +298,24 @@ def stopflow(
         detectors: A set of detectors that will be collected.
         baseline: A set of devices to be read at the start and end of the plan
             in a stream names baseline.
+        baseline_ttl: Time (seconds) for which readings of slow-changing baseline
+            devices are reused from previous runs, 0 to always read them.
+        writer_profile: Compression for the detectors' HDF writers, None to leave
+            them as they are.
+        roi: Region and binning of the frames to write, by detector name, for
+            detectors that should not write full frames.
+        capture: Fields the PandA captures and how, None to capture those in its
+            saved settings.
+        divide_slow_detectors: Trigger detectors too slow for the exposure every
+            few frames from a second sequencer, collecting them into a separate
+            stream, rather than refusing to run.
+        max_lag: Log the rate at which each detector writes frames while
+            collecting, aborting if any falls more than this many frames behind
+            another in its stream. None to do neither.
+        tetramm_readings_per_frame: Readings each TetrAMM (e.g. i0, it) writes per
+            frame, each averaging an equal share of the samples in the frame's gate.
+        check_exposure: Refuse exposures shorter than the detectors are known to
+            support, see MINIMUM_EXPOSURE_TIMES. Turned off to find their limits.
 
     Returns:
             MsgGenerator: Plan
@@ -173,7 +326,9 @@ def stopflow(
 
     # Check that all detectors supplied can actually go as
     # fast as requested
-    raise_for_minimum_exposure_times(exposure, detectors)
+    slow = too_slow_detectors(exposure, detectors) if divide_slow_detectors else set()
+    if check_exposure:
+        raise_for_minimum_exposure_times(exposure, detectors - slow)
 
     stream_name = "main"
     flyer = StandardFlyer(StaticSeqTableTriggerLogic(panda.seq[1]))
@@ -188,35 +343,69 @@ def stopflow(
         "panda": panda.name + ":" + repr(panda),
         "detectors": {device.name + ":" + repr(device) for device in detectors},
         "baseline": {device.name + ":" + repr(device) for device in baseline},
+        "baseline_ttl": baseline_ttl,
+        "writer_profile": writer_profile,
+        "roi": roi,
+        "capture": capture,
+        "divide_slow_detectors": divide_slow_detectors,
+        "max_lag": max_lag,
+        "tetramm_readings_per_frame": tetramm_readings_per_frame,
+        "check_exposure": check_exposure,
     }
     # Add panda to detectors so it captures and writes data.
     # It needs to be in metadata but not metadata planargs.
     _md = {
+        "plan_name": _PLAN_NAME,
         "detectors": {device.name for device in detectors},
         "plan_args": plan_args,
         "hints": {},
     }
-    _md.update(metadata or {})
     detectors = detectors | {panda}
+    streams = {stream_name: detectors - slow}
+    divided = None
+    if slow:
+        divided = divide_trigger(
+            StandardFlyer(StaticSeqTableTriggerLogic(panda.seq[DIVIDED_SEQUENCER])),
+            slow,
+            exposure,
+            frame_deadtime(detectors - slow - {panda}, exposure),
+        )
+        devices.add(divided.flyer)
+        streams[stream_name + DIVIDED_STREAM_SUFFIX] = slow
+        _md["divided_rate"] = divided_metadata(
+            divided,
+            stream_name + DIVIDED_STREAM_SUFFIX,
+            [0, pre_stop_frames] if pre_stop_frames else [0],
+        )
+    _md.update(metadata or {})
 
-    @bpp.baseline_decorator(baseline)
+    @bpp.baseline_decorator(cached_baseline(baseline, baseline_ttl))
     @attach_data_session_metadata_decorator()
     @bpp.stage_decorator(devices)
+    @tetramm_averaging_decorator(detectors, tetramm_readings_per_frame)
     @bpp.run_decorator(md=_md)
     def inner_stopflow_plan():
         yield from load_device(panda, _PLAN_NAME)
+        yield from apply_capture_spec(panda, capture)
+        if post_stop_frames > 0:
+            yield from capture_stop_time(panda)
+        yield from apply_writer_profile(detectors, writer_profile)
         yield from prepare_seq_table_flyer_and_det(
             flyer=flyer,
-            detectors=detectors,
+            detectors=detectors - slow,
             pre_stop_frames=pre_stop_frames,
             post_stop_frames=post_stop_frames,
             exposure=exposure,
             shutter_time=shutter_time,
+            divided=divided,
         )
-        yield from fly_and_collect(
-            stream_name=stream_name,
-            detectors=detectors,
-            flyer=flyer,
+        yield from fly_and_collect_streams(
+            streams={name: list(dets) for name, dets in streams.items()},
+            flyers=([divided.flyer] if divided else []) + [flyer],
+            telemetry=None if max_lag is None else FrameRateTelemetry(max_lag),
         )
+        if post_stop_frames > 0:
+            yield from record_time_since_stop(panda, pre_stop_frames)
 
-    yield from inner_stopflow_plan()
+    rs_uid = yield from roi_wrapper(inner_stopflow_plan(), detectors, roi)
+    return rs_uid
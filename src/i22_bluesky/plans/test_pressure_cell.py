@@ -1,6 +1,10 @@
+import logging
+
 import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
 from bluesky.utils import MsgGenerator
 from dodal.devices.pressure_jump_cell import (
+    AllValvesControlState,
     FastValveControlRequest,
     PressureJumpCell,
     PumpMotorDirectionState,
@@ -8,22 +12,28 @@ from dodal.devices.pressure_jump_cell import (
 
 from i22_bluesky.util.baseline import DEFAULT_PRESSURE_CELL
 
+LOGGER = logging.getLogger(__name__)
+
 
 def make_popping_sound(
     pressure_cell: PressureJumpCell = DEFAULT_PRESSURE_CELL,
 ) -> MsgGenerator:
-    # set V3 to open
-    pressure_cell.all_valves_control.fast_valve_control[3].set(
-        FastValveControlRequest.OPEN
-    )  # noqa: E501
-    # set V5 or V6 to open
-    # pressure_cell.all_valves_control.valve_control[5].set(ValveControlRequest.OPEN)
-    yield from bps.mv(pressure_cell, 0)
+    # open V5, which raises the pressure, waiting for it rather than racing the pump
+    yield from bps.abs_set(
+        pressure_cell.all_valves_control,
+        AllValvesControlState(valve_5=FastValveControlRequest.OPEN),
+        wait=True,
+    )
     # todo expect the pressure to rise
-    readout = pressure_cell.cell_temperature.read()
-    print(f"readout: {readout}")
+    readout = yield from bps.rd(pressure_cell.cell_temperature)
+    LOGGER.info(f"readout: {readout}")
     # ok but which pressure transducer?
-    yield from bps.collect(pressure_cell.pressure_transducers[1], name="omron_pressure")
+    yield from bpp.run_wrapper(
+        bps.trigger_and_read(
+            [pressure_cell.pressure_transducers[1]], name="omron_pressure"
+        ),
+        md={"plan_name": "make_popping_sound"},
+    )
 
 
 def lower_pressure(
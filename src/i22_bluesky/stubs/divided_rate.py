@@ -0,0 +1,210 @@
+import math
+from collections.abc import Collection
+from dataclasses import dataclass
+from typing import cast
+
+import bluesky.plan_stubs as bps
+import numpy as np
+from bluesky.utils import MsgGenerator
+from ophyd_async.core import (
+    DetectorController,
+    DetectorTrigger,
+    StandardDetector,
+    StandardFlyer,
+    TriggerInfo,
+    in_micros,
+)
+from ophyd_async.fastcs.panda import SeqTable, SeqTableInfo, SeqTrigger
+
+from i22_bluesky.util.baseline import DEADTIME_BUFFER
+from i22_bluesky.util.trace import traced
+
+#: Shortest exposure (seconds) each detector supports, by name
+MINIMUM_EXPOSURE_TIMES = {
+    "saxs": 1.0 / 250.0,
+    "waxs": 1.0 / 250.0,
+    "oav": 1.0 / 22.0,
+    "i0": 1.0 / 2e4,
+    "it": 1.0 / 2e4,
+}
+
+#: PandA sequencer driving detectors at a divided rate, its OUTB wired to them
+DIVIDED_SEQUENCER = 2
+
+#: Trigger the divided sequencer waits for before its first frame. Its BITB input
+#: is wired to OUTB of the main sequencer (SEQ1) in the PandA's saved settings, so
+#: it starts on the rising edge of the first main frame rather than when it is
+#: kicked off, which only arms it
+DIVIDED_START_TRIGGER = SeqTrigger.BITB_1
+
+#: Suffix of the name of the stream of the detectors triggered at a divided rate
+DIVIDED_STREAM_SUFFIX = "_divided"
+
+
+@dataclass
+class DividedTrigger:
+    """Detectors triggered by their own sequencer, once per divisor main frames."""
+
+    flyer: StandardFlyer[SeqTableInfo]
+    detectors: set[StandardDetector]
+    divisor: int
+    deadtime: float
+
+
+def too_slow_detectors(
+    exposure: float, detectors: Collection[StandardDetector]
+) -> set[StandardDetector]:
+    """The detectors that cannot take frames as short as exposure."""
+    return {
+        detector
+        for detector in detectors
+        if exposure < MINIMUM_EXPOSURE_TIMES.get(detector.name, 0.0)
+    }
+
+
+def frame_deadtime(detectors: Collection[StandardDetector], exposure: float) -> float:
+    """Deadtime to leave between frames for all of some detectors."""
+    if not detectors:
+        raise ValueError(
+            f"No detectors take frames as short as {exposure} s to time the frames "
+            f"by, at least one must support the exposure, see minimum exposure "
+            f"time table: {MINIMUM_EXPOSURE_TIMES}"
+        )
+    return (
+        max(
+            cast(DetectorController, det._controller).get_deadtime(exposure)  # noqa: SLF001
+            for det in detectors
+        )
+        + DEADTIME_BUFFER
+    )
+
+
+def divide_trigger(
+    flyer: StandardFlyer[SeqTableInfo],
+    detectors: set[StandardDetector],
+    exposure: float,
+    deadtime: float,
+) -> DividedTrigger:
+    """Trigger slower detectors every few main frames, as few as they allow.
+
+    Args:
+        flyer: Flyer of the sequencer to trigger the slower detectors with
+        detectors: Detectors too slow to take every main frame
+        exposure: Exposure of the main frames
+        deadtime: Deadtime between the main frames
+    """
+    minimum = max(MINIMUM_EXPOSURE_TIMES.get(det.name, 0.0) for det in detectors)
+    divided_deadtime = frame_deadtime(detectors, minimum)
+    # Rounded so that floating point error cannot add a frame
+    divisor = math.ceil(round((minimum + divided_deadtime) / (exposure + deadtime), 9))
+    return DividedTrigger(flyer, detectors, max(divisor, 1), divided_deadtime)
+
+
+def divided_seq_table(table: SeqTable, divisor: int, deadtime: float) -> SeqTable:
+    """Table taking a frame for every divisor frames of another, in step with it.
+
+    Frames are the rows with outb1 set, all assumed to have the same timing. The
+    table first waits for DIVIDED_START_TRIGGER, i.e. the first of the other
+    table's frames, leaving out the rows before it. Each run of frames, starting at
+    the first or at a row waiting for a trigger, is divided separately so that the
+    frames stay aligned after every trigger, any remainder of fewer than divisor
+    frames at the end of a run being left without a divided frame. Other rows keep
+    their timing but none of their outputs, the main table driving the shutter.
+
+    Args:
+        table: Table of the main frames
+        divisor: Number of main frames each divided frame spans
+        deadtime: Deadtime of the detectors taking the divided frames
+    """
+    divided = SeqTable.row(trigger=DIVIDED_START_TRIGGER)
+    row = int(np.argmax(table.outb1)) if np.any(table.outb1) else len(table)
+    while row < len(table):
+        trigger = table.trigger[row]
+        if not table.outb1[row]:
+            divided += SeqTable.row(
+                repeats=int(table.repeats[row]),
+                trigger=trigger,
+                time1=int(table.time1[row]),
+                time2=int(table.time2[row]),
+            )
+            row += 1
+            continue
+        end = row + 1
+        while (
+            end < len(table)
+            and table.outb1[end]
+            and table.trigger[end] == SeqTrigger.IMMEDIATE
+        ):
+            end += 1
+        num_frames = int(np.sum(table.repeats[row:end])) // divisor
+        gap = in_micros(deadtime)
+        time1 = divisor * int(table.time1[row] + table.time2[row]) - gap
+        if num_frames:
+            divided += SeqTable.row(trigger=trigger, time1=time1, outb1=True, time2=gap)
+        elif trigger != SeqTrigger.IMMEDIATE:
+            # Still wait for the trigger to stay in step with the main table
+            divided += SeqTable.row(trigger=trigger)
+        if num_frames > 1:
+            divided += SeqTable.row(
+                repeats=num_frames - 1, time1=time1, outb1=True, time2=gap
+            )
+        row = end
+    return divided
+
+
+@traced
+def prepare_divided_trigger(
+    divided: DividedTrigger, table: SeqTable, group: str
+) -> MsgGenerator:
+    """Prepare detectors and their sequencer to take frames at a divided rate.
+
+    Args:
+        divided: Detectors and sequencer to prepare
+        table: Table of the main frames, which the divided frames keep in step with
+        group: Group to add the prepares to, without waiting for them
+    """
+    divided_table = divided_seq_table(table, divided.divisor, divided.deadtime)
+    frames = divided_table.outb1
+    if not np.any(frames):
+        raise ValueError(
+            f"Too few frames for {sorted(det.name for det in divided.detectors)} to "
+            f"take any, taking one every {divided.divisor} frames"
+        )
+    trigger_info = TriggerInfo(
+        number_of_events=int(np.sum(divided_table.repeats[frames])),
+        trigger=DetectorTrigger.CONSTANT_GATE,
+        deadtime=divided.deadtime,
+        livetime=float(divided_table.time1[frames][0]) / 1e6,
+        exposure_timeout=60.0,
+    )
+    for det in divided.detectors:
+        yield from bps.prepare(det, trigger_info, wait=False, group=group)
+    yield from bps.prepare(
+        divided.flyer,
+        SeqTableInfo(sequence_table=divided_table, repeats=1),
+        wait=False,
+        group=group,
+    )
+
+
+def divided_metadata(
+    divided: DividedTrigger, stream_name: str, run_starts: list[int]
+) -> dict:
+    """Describe how the divided frames line up with the main frames.
+
+    Frame j of the divided frames from the run of main frames starting at main frame
+    s (counting from 0) spans main frames s + j * divisor up to s + (j + 1) *
+    divisor.
+
+    Args:
+        divided: Detectors triggered at a divided rate
+        stream_name: Name of the stream the divided frames are collected in
+        run_starts: Index of the first main frame of each run of frames, i.e. the
+            first and each after waiting for a trigger
+    """
+    return {
+        "stream": stream_name,
+        "detectors": sorted(det.name for det in divided.detectors),
+        "divisor": divided.divisor,
+        "run_starts": run_starts,
+    }
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+
 import bluesky.plan_stubs as bps
-from bluesky.utils import short_uid
+from bluesky.utils import MsgGenerator, short_uid
 from ophyd_async.core import (
     StandardDetector,
     StandardFlyer,
 )
 from ophyd_async.fastcs.panda import SeqTableInfo
 
+from i22_bluesky.util.telemetry import FrameRateTelemetry, read_frames_written
+from i22_bluesky.util.trace import traced
+
 
+@traced
 def fly_and_collect(
     stream_name: str,
     flyer: StandardFlyer[SeqTableInfo],
     detectors: list[StandardDetector],
+    while_collecting: Callable[[], MsgGenerator] | None = None,
+    telemetry: FrameRateTelemetry | None = None,
 ):
     """Kickoff, complete and collect with a flyer and multiple detectors.
 
@@ -20,16 +28,49 @@ def fly_and_collect(
     declares a stream for the detectors, then kicks off the detectors and the flyer.
     The detectors are collected until the flyer and detectors have completed.
 
+    If given, while_collecting is run after every collect, so other devices can be
+    driven during the acquisition. It should not block for long.
+
+    If given, telemetry is updated with the frames each detector has written after
+    every collect, and may abort the acquisition if a detector falls behind.
+
+    """
+    yield from fly_and_collect_streams(
+        {stream_name: detectors}, [flyer], while_collecting, telemetry
+    )
+
+
+@traced
+def fly_and_collect_streams(
+    streams: dict[str, list[StandardDetector]],
+    flyers: list[StandardFlyer[SeqTableInfo]],
+    while_collecting: Callable[[], MsgGenerator] | None = None,
+    telemetry: FrameRateTelemetry | None = None,
+):
+    """Kickoff, complete and collect with flyers and detectors in several streams.
+
+    As fly_and_collect, but for detectors triggered at different rates (e.g. by
+    different sequencers), which cannot share a stream as they take different
+    numbers of frames. The flyers are kicked off in turn, each once the last is
+    running, so flyers started by the outputs of another (e.g. the sequencer of
+    detectors triggered at a divided rate) must come before it.
+
     """
-    yield from bps.declare_stream(*detectors, name=stream_name, collect=True)
-    yield from bps.kickoff(flyer, wait=True)
+    detectors = [detector for stream in streams.values() for detector in stream]
+    for stream_name, stream_detectors in streams.items():
+        yield from bps.declare_stream(*stream_detectors, name=stream_name, collect=True)
+    for flyer in flyers:
+        yield from bps.kickoff(flyer, wait=True)
     for detector in detectors:
         yield from bps.kickoff(detector)
+    if telemetry is not None:
+        telemetry.start()
 
     # TODO: replace the following with collect_while_completing, find out why it hangs.
     group = short_uid(label="complete")
 
-    yield from bps.complete(flyer, wait=False, group=group)
+    for flyer in flyers:
+        yield from bps.complete(flyer, wait=False, group=group)
     for detector in detectors:
         yield from bps.complete(detector, wait=False, group=group)
 
@@ -41,9 +82,20 @@ def fly_and_collect(
             pass
         else:
             done = True
-        yield from bps.collect(
-            *detectors,
-            return_payload=False,
-            name=stream_name,
-        )
+        for stream_name, stream_detectors in streams.items():
+            yield from bps.collect(
+                *stream_detectors,
+                return_payload=False,
+                name=stream_name,
+            )
+        if telemetry is not None:
+            frames_written = yield from read_frames_written(detectors)
+            telemetry.update(
+                {
+                    stream_name: {det.name: frames_written[det.name] for det in dets}
+                    for stream_name, dets in streams.items()
+                }
+            )
+        if while_collecting is not None:
+            yield from while_collecting()
     yield from bps.wait(group=group)
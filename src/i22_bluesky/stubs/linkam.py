@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+from collections import deque
+
 import bluesky.plan_stubs as bps
 import numpy as np
 from dodal.common import MsgGenerator
 from dodal.common.coordination import group_uuid
+from dodal.common.maths import step_to_num
 from dodal.devices.linkam3 import Linkam3
 from ophyd_async.core import (
+    AsyncStatus,
     DetectorTrigger,
     StandardDetector,
     StandardFlyer,
@@ -19,8 +23,16 @@ from ophyd_async.fastcs.panda import (
 from pydantic import BaseModel, Field, model_validator
 
 from i22_bluesky.stubs.fly_and_collect import fly_and_collect
+from i22_bluesky.util.state_cache import DEFAULT_STATE_CACHE, cached_mv
+from i22_bluesky.util.trace import traced
+
+
+def watch_linkam(linkam: Linkam3) -> MsgGenerator:
+    """Cache the temperature of the linkam, to skip moving it where it already is."""
+    yield from DEFAULT_STATE_CACHE.watch(linkam, linkam.temp, linkam.tolerance)
 
 
+@traced
 def prepare_static_seq_table_flyer_and_detectors_with_same_trigger(
     flyer: StandardFlyer[SeqTableInfo],
     detectors: list[StandardDetector],
@@ -86,6 +98,24 @@ def prepare_static_seq_table_flyer_and_detectors_with_same_trigger(
     yield from bps.wait(group="prep")
 
 
+#: Most points that fit in the sequence table of a coalesced acquisition, each
+#: taking two rows plus a final row to close the shutter
+MAX_COALESCED_POINTS = (4096 - 1) // 2
+
+#: One row per point captured along a LinkamTrajectory, see LinkamTrajectory.expand
+LINKAM_POINT_DTYPE = np.dtype(
+    [
+        ("segment", np.int32),
+        ("temperature", np.float64),
+        ("rate", np.float64),
+        ("num_frames", np.int32),
+        ("exposure", np.float64),
+        ("flown", np.bool_),
+        ("start_time", np.float64),
+    ]
+)
+
+
 class LinkamPathSegment(BaseModel):
     stop: float = Field(
         description="Target final temperature and initial temperature of next segment.",
@@ -135,6 +165,17 @@ class LinkamPathSegment(BaseModel):
         )
         return self
 
+    def points(self, start: float) -> tuple[float, int]:
+        """Temperature of the last point and number of points when starting at start.
+
+        With `step` the last point is the last whole step before `stop`, or `stop`
+        itself if within 1% of a step of it.
+        """
+        if self.num is not None:
+            return self.stop, self.num
+        _, last, num = step_to_num(start, self.stop, self.step)
+        return last, num
+
 
 class LinkamTrajectory(BaseModel):
     start: float = Field(
@@ -169,7 +210,83 @@ class LinkamTrajectory(BaseModel):
         ), "Exposure not set for default and for some segment(s)!"
         return self
 
+    def _segments(self) -> dict[str, np.ndarray]:
+        # Per-segment parameters, with nominal start time and duration of each.
+        starts = np.array([self.start, *(segment.stop for segment in self.path[:-1])])
+        points = [
+            segment.points(start)
+            for segment, start in zip(self.path, starts, strict=True)
+        ]
+        segments = {
+            "start": starts,
+            "last": np.array([last for last, _ in points], dtype=np.float64),
+            "stop": np.array([segment.stop for segment in self.path]),
+            "num": np.array([num for _, num in points], dtype=np.intp),
+            "rate": np.array([segment.rate for segment in self.path]),
+            "num_frames": np.array(
+                [segment.num_frames or self.default_num_frames for segment in self.path]
+            ),
+            "exposure": np.array(
+                [segment.exposure or self.default_exposure for segment in self.path]
+            ),
+            "flown": np.array([segment.flown for segment in self.path]),
+        }
+        ramp = np.abs(segments["stop"] - starts) / (segments["rate"] / 60)
+        capture = segments["num"] * segments["num_frames"] * segments["exposure"]
+        # Flown segments capture while ramping, stepped ones after each step
+        duration = np.where(
+            segments["flown"], np.maximum(ramp, capture), ramp + capture
+        )
+        segments["start_time"] = np.concatenate([[0.0], np.cumsum(duration)[:-1]])
+        segments["duration"] = duration
+        return segments
+
+    def expand(self) -> np.ndarray:
+        """Every point to capture along the trajectory, in order.
+
+        Returns:
+            Structured array of LINKAM_POINT_DTYPE: the index of the segment each
+            point is in, its temperature, the segment's rate, frames and exposure,
+            whether it is flown, and the nominal time (seconds from the start of the
+            trajectory) at which capturing the point begins, ignoring detector
+            deadtime and shutter opening.
+        """
+        segments = self._segments()
+        num = segments["num"]
+        segment = np.repeat(np.arange(len(num)), num)
+        # Index of each point within its segment
+        index = np.arange(num.sum()) - np.repeat(np.cumsum(num) - num, num)
+        spacing = np.divide(
+            segments["last"] - segments["start"],
+            num - 1,
+            out=np.zeros(len(num)),
+            where=num > 1,
+        )
+
+        points = np.empty(len(segment), dtype=LINKAM_POINT_DTYPE)
+        points["segment"] = segment
+        points["temperature"] = segments["start"][segment] + index * spacing[segment]
+        for field in ("rate", "num_frames", "exposure", "flown"):
+            points[field] = segments[field][segment]
+        ramp_time = np.abs(points["temperature"] - segments["start"][segment]) / (
+            points["rate"] / 60
+        )
+        capture_time = points["num_frames"] * points["exposure"]
+        points["start_time"] = (
+            segments["start_time"][segment]
+            + ramp_time
+            + np.where(points["flown"], 0.0, index * capture_time)
+        )
+        return points
+
+    def estimated_duration(self) -> float:
+        """Nominal time (seconds) to follow the trajectory, ignoring detector
+        deadtime and shutter opening."""
+        segments = self._segments()
+        return float(segments["start_time"][-1] + segments["duration"][-1])
 
+
+@traced
 def capture_temp(
     linkam: Linkam3,
     flyer: StandardFlyer,
@@ -180,7 +297,8 @@ def capture_temp(
     shutter_time: float = 0.04,
     stream_name: str = "primary",
 ):
-    yield from bps.mv(linkam, temp)
+    yield from watch_linkam(linkam)
+    yield from cached_mv(linkam, temp)
     yield from prepare_static_seq_table_flyer_and_detectors_with_same_trigger(
         flyer=flyer,
         detectors=detectors,
@@ -195,6 +313,7 @@ def capture_temp(
     )
 
 
+@traced
 def capture_linkam_segment(
     linkam: Linkam3,
     flyer: StandardFlyer,
@@ -209,10 +328,11 @@ def capture_linkam_segment(
     stream_name: str = "primary",
     fly: bool = False,
 ) -> MsgGenerator:
+    yield from watch_linkam(linkam)
     # Move to start in case previous segment has misaligned step
-    yield from bps.mv(linkam, start)
+    yield from cached_mv(linkam, start)
     # Set temperature ramp rate to expected for segment
-    yield from bps.mv(linkam.ramp_rate, rate)
+    yield from cached_mv(linkam.ramp_rate, rate)
 
     if not fly:
         # Move, stop then collect at each step
@@ -235,9 +355,10 @@ def capture_linkam_segment(
             number_of_frames=num * num_frames,
             exposure=exposure,
             shutter_time=shutter_time,
-            period=abs(stop - start / (rate / 60)),  # period in s, dT/(dT/dt)
+            period=abs(stop - start) / (rate / 60),  # period in s, dT/(dT/dt)
         )
         linkam_group = group_uuid("linkam")
+        DEFAULT_STATE_CACHE.invalidate(linkam)
         yield from bps.abs_set(linkam, stop, group=linkam_group, wait=False)
         yield from fly_and_collect(
             stream_name=stream_name,
@@ -246,3 +367,180 @@ def capture_linkam_segment(
         )
         # Make sure linkam has finished
         yield from bps.wait(group=linkam_group)
+        DEFAULT_STATE_CACHE.confirm(linkam, stop)
+
+
+def _seq_table(**columns: np.ndarray) -> SeqTable:
+    # A table of the length of the given columns, the others left as their defaults
+    length = len(next(iter(columns.values())))
+    default = SeqTable.row()
+    return SeqTable(
+        **{
+            name: columns.get(name, np.repeat(getattr(default, name), length))
+            for name in SeqTable.model_fields
+            if name != "trigger"
+        },
+        trigger=[default.trigger[0]] * length,
+    )
+
+
+def _micros(times: np.ndarray) -> np.ndarray:
+    # As in_micros, but ignoring floating point error below a nanosecond
+    return np.ceil(np.round(times * 1e6, 3)).astype(np.uint32)
+
+
+def flown_points_seq_table(
+    points: np.ndarray, deadtime: float, shutter_time: float
+) -> SeqTable:
+    """Sequence table capturing each of some flown points at its nominal start time.
+
+    All points must have the same number of frames and exposure. Each point takes
+    two rows: a wait with the shutter closed (or left open if it would have to
+    reopen straight away) ending with the shutter opening, then the frames. A point
+    that cannot start on time, because the previous point's frames have not
+    finished, starts as soon as it can instead.
+
+    Args:
+        points: Rows of LINKAM_POINT_DTYPE, in order
+        deadtime: Deadtime of the detectors between frames
+        shutter_time: Time for the shutter to open or close
+    """
+    num_frames = int(points["num_frames"][0])
+    exposure = float(points["exposure"][0])
+    frame_time = num_frames * (exposure + deadtime)
+    min_spacing = frame_time + shutter_time
+    index = np.arange(len(points))
+    nominal = points["start_time"] - points["start_time"][0]
+    # Start of each point's frames, each no sooner than the previous allows
+    start = index * min_spacing + np.maximum.accumulate(nominal - index * min_spacing)
+    wait = np.diff(start, prepend=start[0] - min_spacing) - min_spacing
+
+    # A wait and a frames row per point, then a last row to close the shutter
+    rows = 2 * len(points) + 1
+    columns: dict[str, np.ndarray] = {
+        "repeats": np.ones(rows, dtype=np.uint16),
+        "time1": np.zeros(rows, dtype=np.uint32),
+        "outa1": np.zeros(rows, dtype=np.bool_),
+        "outb1": np.zeros(rows, dtype=np.bool_),
+        "time2": np.full(rows, in_micros(shutter_time), dtype=np.uint32),
+        "outa2": np.zeros(rows, dtype=np.bool_),
+    }
+    waits, frames = slice(0, -1, 2), slice(1, -1, 2)
+    columns["time1"][waits] = _micros(wait)
+    columns["outa1"][waits] = wait < shutter_time
+    columns["outa2"][waits] = True
+    columns["repeats"][frames] = num_frames
+    columns["time1"][frames] = in_micros(exposure)
+    columns["outa1"][frames] = True
+    columns["outb1"][frames] = True
+    columns["time2"][frames] = in_micros(deadtime)
+    columns["outa2"][frames] = True
+    return _seq_table(**columns)
+
+
+def coalesce_flown_segments(
+    points: np.ndarray, max_points: int = MAX_COALESCED_POINTS
+) -> list[np.ndarray]:
+    """Group the points of a trajectory into acquisitions.
+
+    Consecutive flown segments with the same frames and exposure per point are
+    grouped into one acquisition, as long as it has at most max_points points.
+    Every other segment is an acquisition of its own.
+
+    Args:
+        points: Points of a trajectory, as given by LinkamTrajectory.expand
+        max_points: Most points in an acquisition of more than one segment
+
+    Returns:
+        Contiguous slices of points, each of one or more whole segments
+    """
+    segments = np.split(points, np.flatnonzero(np.diff(points["segment"])) + 1)
+    groups: list[list[np.ndarray]] = []
+    for segment in segments:
+        previous = groups[-1][-1] if groups else None
+        if (
+            previous is not None
+            and previous["flown"][0]
+            and segment["flown"][0]
+            and previous["num_frames"][0] == segment["num_frames"][0]
+            and previous["exposure"][0] == segment["exposure"][0]
+            and sum(map(len, groups[-1])) + len(segment) <= max_points
+        ):
+            groups[-1].append(segment)
+        else:
+            groups.append([segment])
+    return [np.concatenate(group) for group in groups]
+
+
+@traced
+def capture_linkam_segments(
+    linkam: Linkam3,
+    flyer: StandardFlyer,
+    detectors: list[StandardDetector],
+    points: np.ndarray,
+    shutter_time: float = 0.04,
+    stream_name: str = "primary",
+) -> MsgGenerator:
+    """Fly consecutive segments as one acquisition, with no re-arming between them.
+
+    The detectors and flyer are prepared once, with a sequence table capturing
+    every point at its nominal time. While collecting, the linkam is sent on to the
+    end of the next segment, at that segment's rate, as soon as it reaches the end
+    of the current one.
+
+    Args:
+        linkam: Temperature controller
+        flyer: Flyer for the PandA sequence table triggering the detectors
+        detectors: Detectors to capture
+        points: Points of the segments, as grouped by coalesce_flown_segments
+        shutter_time: Time for the shutter to open or close
+        stream_name: Stream to collect the detectors into
+    """
+    num_frames = int(points["num_frames"][0])
+    exposure = float(points["exposure"][0])
+    deadtime = max(det._controller.get_deadtime(exposure) for det in detectors)  # noqa: SLF001
+    trigger_info = TriggerInfo(
+        number_of_events=len(points) * num_frames,
+        trigger=DetectorTrigger.CONSTANT_GATE,
+        deadtime=deadtime,
+        livetime=exposure,
+    )
+    table = flown_points_seq_table(points, deadtime, shutter_time)
+
+    ends = np.flatnonzero(np.diff(points["segment"], append=-1))
+    ramps = deque(
+        (float(points["rate"][end]), float(points["temperature"][end])) for end in ends
+    )
+    linkam_group = group_uuid("linkam")
+    ramping: AsyncStatus | None = None
+
+    def next_ramp():
+        nonlocal ramping
+        if ramps and (ramping is None or ramping.done):
+            rate, stop = ramps.popleft()
+            yield from cached_mv(linkam.ramp_rate, rate)
+            DEFAULT_STATE_CACHE.invalidate(linkam)
+            ramping = yield from bps.abs_set(linkam, stop, group=linkam_group)
+
+    yield from watch_linkam(linkam)
+    yield from cached_mv(linkam, float(points["temperature"][0]))
+    for det in detectors:
+        yield from bps.prepare(det, trigger_info, wait=False, group="prep")
+    yield from bps.prepare(
+        flyer, SeqTableInfo(sequence_table=table, repeats=1), wait=False, group="prep"
+    )
+    yield from bps.wait(group="prep")
+
+    yield from next_ramp()
+    yield from fly_and_collect(
+        stream_name=stream_name,
+        flyer=flyer,
+        detectors=detectors,
+        while_collecting=next_ramp,
+    )
+    # Finish any segments the acquisition ended before
+    while ramps:
+        yield from bps.wait(group=linkam_group)
+        yield from next_ramp()
+    yield from bps.wait(group=linkam_group)
+    DEFAULT_STATE_CACHE.confirm(linkam, float(points["temperature"][ends[-1]]))
@@ -1,7 +1,10 @@
 from typing import cast
 
 import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+import numpy as np
 from bluesky.utils import MsgGenerator
+from dodal.devices.pressure_jump_cell import FastValveControlRequest, PressureJumpCell
 from ophyd_async.core import (
     DetectorController,
     DetectorTrigger,
@@ -16,9 +19,25 @@ from ophyd_async.fastcs.panda._table import (
 )
 from ophyd_async.fastcs.panda._trigger import SeqTableInfo
 
+from i22_bluesky.stubs.divided_rate import DividedTrigger, prepare_divided_trigger
 from i22_bluesky.util.baseline import DEADTIME_BUFFER
+from i22_bluesky.util.seq_emulator import emulate_seq_table
+from i22_bluesky.util.trace import traced
 
+#: Sequencer output wired to the trigger input of the fast valve, which fires the
+#: valve on its rising edge. OUTC of SEQ1 is routed to a TTL output of the PandA in
+#: its saved settings, cabled to the external trigger input of FAST_VALVE on the
+#: pressure cell's controller, which only acts on it while the valve is armed
+FAST_VALVE_OUTPUT = "c"
 
+#: Fast valve of the pressure cell fired by FAST_VALVE_OUTPUT
+FAST_VALVE = 5
+
+#: Time (seconds) the fast valve output is held high when firing it
+FAST_VALVE_PULSE = 1e-3
+
+
+@traced
 def prepare_seq_table_flyer_and_det(
     flyer: StandardFlyer[SeqTableInfo],
     detectors: set[StandardDetector],
@@ -27,6 +46,8 @@ def prepare_seq_table_flyer_and_det(
     exposure: float,
     shutter_time: float,
     period: float = 0.0,
+    divided: DividedTrigger | None = None,
+    valve_delay: float | None = None,
 ) -> MsgGenerator:
     """
     Setup detectors/flyer for a pressure jump experiment. Create a seq table and
@@ -43,6 +64,11 @@ def prepare_seq_table_flyer_and_det(
                     open fully before beginning acquisition
             period: Time period (seconds) to wait after arming the detector
                     before taking the first batch of frames
+            divided: Detectors too slow for the exposure, to trigger from their
+                    own sequencer every few frames
+            valve_delay: Time (seconds) after the pre-jump frames to fire the
+                    fast valve from the sequencer, or None to wait for the jump
+                    on BITA
 
     Returns:
             MsgGenerator: Plan
@@ -74,6 +100,7 @@ def prepare_seq_table_flyer_and_det(
         shutter_time,
         deadtime,
         period,
+        valve_delay,
     )
     table_info = SeqTableInfo(sequence_table=table, repeats=1)
 
@@ -81,6 +108,8 @@ def prepare_seq_table_flyer_and_det(
     for det in detectors:
         yield from bps.prepare(det, trigger_info, wait=False, group="prep")
     yield from bps.prepare(flyer, table_info, wait=False, group="prep")
+    if divided is not None:
+        yield from prepare_divided_trigger(divided, table, group="prep")
     yield from bps.wait(group="prep")
 
 
@@ -91,6 +120,7 @@ def pressure_jump_seq_table(
     shutter_time: float,
     deadtime: float,
     period: float,
+    valve_delay: float | None = None,
 ) -> SeqTable:
     """Create a SeqTable based on the parameters of a a pressure jump measurement
 
@@ -104,6 +134,10 @@ def pressure_jump_seq_table(
                     instruments involved
             period: Time period (seconds) to wait after arming the detector
                     before taking the first batch of frames
+            valve_delay: Time (seconds) after the pre-jump frames to fire the
+                    fast valve, taking the post-jump frames straight after
+                    without waiting for a trigger. If None, the post-jump
+                    frames wait for the jump on BITA instead
 
     Returns:
             SeqTable: SeqTable that will result in a series of triggers
@@ -128,11 +162,21 @@ def pressure_jump_seq_table(
             time2=in_micros(deadtime),
             outa2=True,
         )
+    if valve_delay is not None:
+        # Keeping shutter open, fire the fast valve after the delay, so the jump
+        # is timed to the frames by the PandA's clock
+        table += SeqTable.row(
+            time1=in_micros(valve_delay),
+            outa1=True,
+            time2=in_micros(FAST_VALVE_PULSE),
+            outa2=True,
+            outc2=True,
+        )
     # todo not sure how do we get the trigger exactly
     # Do m triggers after BITA=1
     if post_jump_frames > 0:
         table += SeqTable.row(
-            trigger=SeqTrigger.BITA_1,
+            trigger=SeqTrigger.BITA_1 if valve_delay is None else SeqTrigger.IMMEDIATE,
             repeats=1,
             time1=in_micros(exposure),
             outa1=True,
@@ -152,3 +196,45 @@ def pressure_jump_seq_table(
     # Add the shutter close
     table += SeqTable.row(time2=in_micros(shutter_time))
     return table
+
+
+def fast_valve_metadata(table: SeqTable) -> dict:
+    """When a table fires the fast valve, relative to the frames it takes.
+
+    Times are in seconds from the start of the table, which are exact to the
+    PandA's clock, so the jump is known to within the valve's own response.
+
+    Args:
+        table: Table firing the fast valve on FAST_VALVE_OUTPUT
+    """
+    timeline = emulate_seq_table(table)
+    (fire_time, *_), _ = timeline.gates(FAST_VALVE_OUTPUT)
+    frame_starts, _ = timeline.gates("b")
+    return {
+        "output": FAST_VALVE_OUTPUT.upper(),
+        "fire_time": float(fire_time),
+        "pulse": FAST_VALVE_PULSE,
+        "frames_before": int(np.sum(frame_starts < fire_time)),
+        "first_frame_time": float(frame_starts[0]) if len(frame_starts) else None,
+    }
+
+
+def fast_valve_wrapper(
+    plan: MsgGenerator, pressure_cell: PressureJumpCell
+) -> MsgGenerator:
+    """Arm the fast valve for a plan to fire it from the PandA, disarming it after.
+
+    The valve ignores its trigger input unless armed, and is disarmed however the
+    plan ends, so it cannot be fired by the PandA outside of the plan.
+
+    Args:
+        plan: Plan firing the valve on FAST_VALVE_OUTPUT
+        pressure_cell: Cell of the valve
+    """
+    valve = pressure_cell.all_valves_control.fast_valve_control[FAST_VALVE]
+
+    def disarm() -> MsgGenerator:
+        yield from bps.abs_set(valve, FastValveControlRequest.DISARM, wait=True)
+
+    yield from bps.abs_set(valve, FastValveControlRequest.ARM, wait=True)
+    return (yield from bpp.finalize_wrapper(plan, disarm()))
@@ -0,0 +1,134 @@
+import csv
+import math
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from bluesky.utils import MsgGenerator
+
+#: Columns of the table of rate sweep results, one row per step
+RATE_SWEEP_COLUMNS = (
+    "time",
+    "detectors",
+    "exposure",
+    "deadtime",
+    "rate",
+    "frames",
+    "sustained",
+    "frames_written",
+    "error",
+)
+
+
+@dataclass
+class RateStep:
+    """A run at one exposure, and whether every detector kept up with it."""
+
+    #: Names of the detectors triggered, excluding the PandA
+    detectors: list[str]
+    #: Exposure (seconds) of each frame, excluding deadtime
+    exposure: float
+    #: Deadtime (seconds) left between frames
+    deadtime: float
+    #: Number of frames triggered
+    num_frames: int
+    #: Number of frames each detector (and the PandA) wrote, by name
+    frames_written: dict[str, int] = field(default_factory=dict)
+    #: Why the run failed, if it did
+    error: str | None = None
+    time: datetime = field(default_factory=datetime.now)
+
+    @property
+    def rate(self) -> float:
+        """Frames triggered per second, counting the deadtime between them."""
+        return 1.0 / (self.exposure + self.deadtime)
+
+    @property
+    def sustained(self) -> bool:
+        """Whether the run finished with every frame written by every detector."""
+        return self.error is None and all(
+            count == self.num_frames for count in self.frames_written.values()
+        )
+
+    def row(self) -> dict[str, str]:
+        return {
+            "time": self.time.isoformat(timespec="seconds"),
+            "detectors": "+".join(sorted(self.detectors)),
+            "exposure": f"{self.exposure:.6g}",
+            "deadtime": f"{self.deadtime:.6g}",
+            "rate": f"{self.rate:.6g}",
+            "frames": str(self.num_frames),
+            "sustained": str(self.sustained),
+            "frames_written": " ".join(
+                f"{name}={count}" for name, count in sorted(self.frames_written.items())
+            ),
+            "error": self.error or "",
+        }
+
+
+def append_rate_step(path: Path, step: RateStep) -> None:
+    """Add a step to a table of results, starting it if it does not exist."""
+    new = not path.exists()
+    with path.open("a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=RATE_SWEEP_COLUMNS)
+        if new:
+            writer.writeheader()
+        writer.writerow(step.row())
+
+
+def exposure_ladder(start: float, stop: float, factor: float = 2.0) -> list[float]:
+    """Exposures from start, each factor times shorter than the last, down to stop.
+
+    Args:
+        start: Longest exposure (seconds)
+        stop: Shortest exposure (seconds), always the last
+        factor: Ratio of each exposure to the next, greater than 1
+    """
+    if factor <= 1.0:
+        raise ValueError(f"Factor must be greater than 1, not {factor}")
+    if stop > start:
+        raise ValueError(f"Shortest exposure {stop} is longer than {start}")
+    # Rounded so that floating point error cannot add a step
+    num = math.floor(round(math.log(start / stop, factor), 9))
+    ladder = [start / factor**i for i in range(num + 1)]
+    return ladder if math.isclose(ladder[-1], stop) else ladder + [stop]
+
+
+def search_shortest_exposure(
+    ladder: list[float],
+    sustains: Callable[[float], MsgGenerator[bool]],
+    bisect_steps: int = 3,
+) -> MsgGenerator[float | None]:
+    """Find the shortest exposure that can be sustained.
+
+    Each exposure in the ladder is tried in turn until one is not sustained, then
+    the interval between it and the last sustained is bisected (geometrically,
+    halving the ratio between them) a few times.
+
+    Args:
+        ladder: Exposures to try, longest first
+        sustains: Plan trying an exposure, returning whether it was sustained
+        bisect_steps: Number of exposures to try between the shortest sustained and
+            longest unsustained exposures in the ladder
+
+    Returns:
+        The shortest exposure sustained, None if the first was not
+    """
+    shortest: float | None = None
+    failed: float | None = None
+    for exposure in ladder:
+        if (yield from sustains(exposure)):
+            shortest = exposure
+        else:
+            failed = exposure
+            break
+    if shortest is None or failed is None:
+        return shortest
+    for _ in range(bisect_steps):
+        exposure = math.sqrt(shortest * failed)
+        if (yield from sustains(exposure)):
+            shortest = exposure
+        else:
+            failed = exposure
+    return shortest
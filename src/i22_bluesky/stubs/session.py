@@ -0,0 +1,143 @@
+import asyncio
+from collections.abc import Callable, Iterable, Sequence
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+from bluesky.utils import (
+    Msg,
+    MsgGenerator,
+    RunEngineControlException,
+    root_ancestor,
+    separate_devices,
+    single_gen,
+)
+from ophyd_async.core import AsyncStatus, Device, StandardDetector
+
+
+def finish_writing(detector: StandardDetector) -> MsgGenerator:
+    """Close the file writer of a detector, by unstaging it outside of the RunEngine.
+
+    The RunEngine still counts the detector as staged, so it is not staged again
+    before the next run, but is unstaged when the session ends.
+    """
+    yield from bps.wait_for([detector.unstage])
+
+
+def start_finish_writing(detector: StandardDetector) -> MsgGenerator[AsyncStatus]:
+    """Start closing the file writer of a detector without waiting for it to close.
+
+    Returns:
+        Status that completes when the file is closed
+    """
+
+    async def start() -> AsyncStatus:
+        return detector.unstage()
+
+    (future,) = yield from bps.wait_for([start])
+    return future.result()
+
+
+def wait_for_statuses(statuses: Iterable[AsyncStatus]) -> MsgGenerator:
+    """Wait for statuses started outside of bluesky's groups to complete."""
+    statuses = list(statuses)
+
+    async def all_done() -> None:
+        await asyncio.gather(*statuses)
+
+    if statuses:
+        yield from bps.wait_for([all_done])
+
+
+def run_staged_session(
+    runs: Sequence[Callable[[], MsgGenerator]],
+    devices: Sequence[Iterable[Device]],
+    on_failure: Callable[[int, Exception], None],
+    close_in_background: bool = False,
+) -> MsgGenerator[list]:
+    """Run plans back to back, staging the devices they use once for all of them.
+
+    The union of the devices is staged before the first plan and unstaged after the
+    last. Stage and unstage messages the plans issue for these devices are dropped,
+    except that unstaging a detector still closes its file writer so the next run
+    writes to a new file.
+
+    If a plan fails the next one is still run: the devices the failed plan used are
+    unstaged and staged again, so the next run does not inherit an armed detector or
+    an open file.
+
+    Closing a large file can take long enough to add noticeably to the time between
+    runs. With close_in_background, the next plan starts while the writers of the
+    previous one are still closing, and only waits for a detector's file to be
+    closed when it first sends a message to that detector. Any error closing the
+    file is then raised in the next plan using the detector.
+
+    Args:
+        runs: Factories for the plans to run, in order
+        devices: Devices used by each of the plans
+        on_failure: Called with the index of a plan and the exception it raised
+        close_in_background: Close file writers after each plan concurrently with
+            the next plan, rather than before starting it
+
+    Returns:
+        The return value of each plan, or None for plans that failed
+    """
+    used = [
+        separate_devices(root_ancestor(device) for device in run_devices)
+        for run_devices in devices
+    ]
+    staged = {device for run_devices in used for device in run_devices}
+    closing: dict[Device, AsyncStatus] = {}
+
+    def wait_until_closed(devices: Iterable[Device]) -> MsgGenerator:
+        yield from wait_for_statuses(
+            closing.pop(device) for device in devices if device in closing
+        )
+
+    def close_later(detector: StandardDetector) -> MsgGenerator:
+        closing[detector] = yield from start_finish_writing(detector)
+
+    def unstaged(device: Device) -> MsgGenerator:
+        if not isinstance(device, StandardDetector):
+            return single_gen(Msg("null"))
+        if close_in_background:
+            return close_later(device)
+        return finish_writing(device)
+
+    def after_closed(msg: Msg, replacement: MsgGenerator | None) -> MsgGenerator:
+        yield from wait_until_closed([root_ancestor(msg.obj)])
+        if replacement is None:
+            return (yield msg)
+        return (yield from replacement)
+
+    def keep_staged(msg: Msg):
+        if msg.obj in staged and msg.command == "stage":
+            # Dropped, so there is no file to wait to be closed for
+            return single_gen(Msg("null")), None
+        replacement = None
+        if msg.obj in staged and msg.command == "unstage":
+            replacement = unstaged(msg.obj)
+        if isinstance(msg.obj, Device) and root_ancestor(msg.obj) in closing:
+            return after_closed(msg, replacement), None
+        return replacement, None
+
+    def session() -> MsgGenerator[list]:
+        results: list = []
+        for index, run in enumerate(runs):
+            try:
+                results.append((yield from bpp.plan_mutator(run(), keep_staged)))
+            except RunEngineControlException:
+                raise
+            except Exception as e:
+                results.append(None)
+                on_failure(index, e)
+                yield from wait_until_closed(used[index])
+                yield from bps.unstage_all(*reversed(used[index]))
+                yield from bps.stage_all(*used[index])
+        return results
+
+    return (
+        yield from bpp.stage_wrapper(
+            bpp.finalize_wrapper(session(), lambda: wait_until_closed(list(closing))),
+            staged,
+        )
+    )
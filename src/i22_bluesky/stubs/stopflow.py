@@ -1,3 +1,5 @@
+import logging
+from pathlib import Path
 from typing import cast
 
 import bluesky.plan_stubs as bps
@@ -10,15 +12,37 @@ from ophyd_async.core import (
     TriggerInfo,
     in_micros,
 )
+from ophyd_async.fastcs.panda import HDFPanda
 from ophyd_async.fastcs.panda._table import (
     SeqTable,
     SeqTrigger,
 )
 from ophyd_async.fastcs.panda._trigger import SeqTableInfo
 
+from i22_bluesky.stubs.divided_rate import (
+    MINIMUM_EXPOSURE_TIMES,
+    DividedTrigger,
+    prepare_divided_trigger,
+    too_slow_detectors,
+)
 from i22_bluesky.util.baseline import DEADTIME_BUFFER
+from i22_bluesky.util.panda_capture import capturable_fields, capture_field
+from i22_bluesky.util.time_zero import (
+    STOP_TIME_CAPTURE,
+    STOP_TIME_FIELD,
+    StopTiming,
+    TimeZeroSource,
+    read_time_zero,
+)
+from i22_bluesky.util.trace import traced
+
+LOGGER = logging.getLogger(__name__)
 
+#: Name of the stream of the time of the stop and of each frame relative to it
+TIME_SINCE_STOP_STREAM = "time_since_stop"
 
+
+@traced
 def prepare_seq_table_flyer_and_det(
     flyer: StandardFlyer[SeqTableInfo],
     detectors: set[StandardDetector],
@@ -27,6 +51,7 @@ def prepare_seq_table_flyer_and_det(
     exposure: float,
     shutter_time: float,
     period: float = 0.0,
+    divided: DividedTrigger | None = None,
 ) -> MsgGenerator:
     """
     Setup detectors/flyer for a stop flow experiment. Create a seq table and
@@ -44,6 +69,8 @@ def prepare_seq_table_flyer_and_det(
                     open fully before beginning acquisition
             period: Time period (seconds) to wait after arming the detector
                     before taking the first batch of frames
+            divided: Detectors too slow for the exposure, to trigger from their
+                    own sequencer every few frames
 
     Returns:
             MsgGenerator: Plan
@@ -82,6 +109,8 @@ def prepare_seq_table_flyer_and_det(
     for det in detectors:
         yield from bps.prepare(det, trigger_info, wait=False, group="prep")
     yield from bps.prepare(flyer, table_info, wait=False, group="prep")
+    if divided is not None:
+        yield from prepare_divided_trigger(divided, table, group="prep")
     yield from bps.wait(group="prep")
 
 
@@ -159,23 +188,65 @@ def raise_for_minimum_exposure_times(
     exposure: float,
     detectors: set[StandardDetector],
 ) -> None:
-    minimum_exposure_times = {
-        "saxs": 1.0 / 250.0,
-        "waxs": 1.0 / 250.0,
-        "oav": 1.0 / 22.0,
-        "i0": 1.0 / 2e4,
-        "it": 1.0 / 2e4,
-    }
-    detectors_below_limit = {
-        detector
-        for detector in detectors
-        if exposure < minimum_exposure_times.get(detector.name, 0.0)
-    }
+    detectors_below_limit = too_slow_detectors(exposure, detectors)
     if len(detectors_below_limit) > 0:
         raise KeyError(
             f"The exposure time requested was {exposure}, but "
             "the following detectors do not support going "
             f"that fast: {detectors_below_limit}. Try running the plan"
             "without them. "
-            f"See minimum exposure time table: {minimum_exposure_times}"
+            f"See minimum exposure time table: {MINIMUM_EXPOSURE_TIMES}"
+        )
+
+
+def capture_stop_time(panda: HDFPanda) -> MsgGenerator:
+    """Capture the latched time of the stop, to time the frames from it.
+
+    Applied after any capture spec, which would leave it out. A PandA without the
+    field is left as it is, with a warning, the frames then being timed from the
+    first post-stop gate.
+    """
+    if STOP_TIME_FIELD not in capturable_fields(panda):
+        LOGGER.warning(
+            f"PandA {panda.name} has no {STOP_TIME_FIELD} to capture the time of "
+            f"the stop with, frames will be timed from the first post-stop gate"
+        )
+        return
+    yield from capture_field(panda, STOP_TIME_CAPTURE)
+
+
+@traced
+def record_time_since_stop(
+    panda: HDFPanda,
+    pre_stop_frames: int,
+    stream_name: str = TIME_SINCE_STOP_STREAM,
+) -> MsgGenerator:
+    """Emit the time of the stop and of every frame since it, once all are captured.
+
+    The gate times (and the time of the BITA edge, if the PandA timestamps it) are
+    read from the PandA's file in one go and the times since the stop worked out
+    together, so this takes well under a second even for a million frames. The
+    run is left as it is, with a warning, if the file cannot be read.
+
+    Args:
+        panda: PandA that captured the gates, having finished capturing them
+        pre_stop_frames: Number of frames taken before waiting for the stop
+        stream_name: Name of the stream to emit a single event in
+    """
+    directory = yield from bps.rd(panda.data.hdf_directory)
+    file_name = yield from bps.rd(panda.data.hdf_file_name)
+    path = Path(directory) / file_name
+    try:
+        time_zero = read_time_zero(path, pre_stop_frames)
+    except (OSError, KeyError, ValueError) as error:
+        LOGGER.warning(f"Could not time frames from the stop using {path}: {error}")
+        return
+    if time_zero.source == TimeZeroSource.FIRST_POST_STOP_GATE:
+        LOGGER.warning(
+            f"No time of the stop captured in {path}, timing frames from the first "
+            f"post-stop gate, which is late if the stop came during pre-stop frames"
         )
+    timing = StopTiming(name="stop")
+    yield from bps.wait_for([timing.connect])
+    timing.update(time_zero)
+    yield from bps.trigger_and_read([timing], name=stream_name)
@@ -0,0 +1,59 @@
+from collections.abc import Collection
+from typing import cast
+
+import bluesky.preprocessors as bpp
+from bluesky.utils import MsgGenerator, make_decorator
+from dodal.devices.tetramm import TetrammController, TetrammDetector
+from ophyd_async.core import StandardDetector
+
+#: Readings each TetrAMM writes per frame unless a plan is given another ratio: one,
+#: so the IOC averages every sample of a gate into a single value per channel
+DEFAULT_TETRAMM_READINGS_PER_FRAME = 1
+
+
+def tetramm_averaging_wrapper(
+    plan: MsgGenerator,
+    detectors: Collection[StandardDetector],
+    readings_per_frame: int,
+) -> MsgGenerator:
+    """Run a plan with each TetrAMM among some detectors writing so many readings.
+
+    A TetrAMM samples its currents at a fixed rate and averages the samples within
+    each gate into readings, writing every reading of a frame. Fewer readings per
+    frame average more samples into each, so at one reading per frame a transmission
+    monitor costs a few values per frame however fast it is gated. The exposure may
+    allow fewer readings than asked for, see TetrammController.set_exposure. Takes
+    effect when the detectors are next prepared, other detectors are left alone.
+    Each TetrAMM's previous ratio is restored however the plan ends, so should be
+    applied within the staging of the detectors.
+
+    Args:
+        plan: Plan preparing the detectors
+        detectors: Detectors to be prepared
+        readings_per_frame: Most readings each TetrAMM writes per frame
+    """
+    if readings_per_frame < 1:
+        raise ValueError(
+            f"TetrAMMs must write at least one reading per frame, not "
+            f"{readings_per_frame}"
+        )
+    controllers = [
+        cast(TetrammController, detector._controller)  # noqa: SLF001
+        for detector in detectors
+        if isinstance(detector, TetrammDetector)
+    ]
+    previous = {
+        controller: controller.maximum_readings_per_frame for controller in controllers
+    }
+
+    def restore() -> MsgGenerator:
+        for controller, maximum in previous.items():
+            controller.maximum_readings_per_frame = maximum
+        yield from ()
+
+    for controller in controllers:
+        controller.maximum_readings_per_frame = readings_per_frame
+    return (yield from bpp.finalize_wrapper(plan, restore))
+
+
+tetramm_averaging_decorator = make_decorator(tetramm_averaging_wrapper)
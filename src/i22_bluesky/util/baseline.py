@@ -7,8 +7,8 @@ from ophyd_async.fastcs.panda import HDFPanda
 FAST_DETECTORS: set[StandardDetector] = {
     inject("saxs"),
     inject("waxs"),
-    # inject("i0"),
-    # inject("it"),
+    inject("i0"),
+    inject("it"),
 }
 DEFAULT_STAMPED_DETECTOR: StandardDetector = inject("saxs")
 
@@ -29,6 +29,10 @@ DEFAULT_BASELINE_MEASUREMENTS: set[Readable] = {
     inject("synchrotron"),
 }
 
+#: Time (s) for which readings of slow-changing baseline devices are reused between
+#: consecutive runs, 0 so that they are only reused when a plan is asked to
+DEFAULT_BASELINE_TTL = 0.0
+
 #: Buffer added to deadtime to handle minor discrepencies between detector
 #: and panda clocks
 DEADTIME_BUFFER = 20e-6
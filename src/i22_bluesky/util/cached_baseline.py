@@ -0,0 +1,173 @@
+import time
+import weakref
+from collections.abc import Collection, Iterable
+from typing import cast
+
+from bluesky.protocols import Configurable, Hints, Readable, Reading, Triggerable
+from bluesky.utils import maybe_await
+from event_model import DataKey
+from ophyd_async.core import AsyncStatus
+
+#: Baseline devices that are not expected to change between back-to-back runs
+SLOW_BASELINE_DEVICE_NAMES: frozenset[str] = frozenset(
+    {
+        "fswitch",
+        "slits_1",
+        "slits_2",
+        "slits_3",
+        "slits_4",
+        "slits_5",
+        "slits_6",
+        "hfm",
+        "vfm",
+        "undulator",
+        "dcm",
+    }
+)
+
+#: Suffix of the data key recording how old the reading of each device is
+AGE_SUFFIX = "-baseline_age"
+
+
+class CachedReadable:
+    """A baseline device, read when triggered and optionally reused between runs.
+
+    Reading happens when triggered, so ``trigger_and_read`` (as used by
+    ``baseline_decorator``) reads every wrapped device concurrently, and each
+    ``read`` returns what was read. The device's name, data keys and configuration
+    are its own, so the baseline stream is as if the device were read directly.
+
+    Once ``ttl`` is set above 0, a device named in ``slow`` is only read again once
+    its last reading is older than ``ttl``, otherwise the last reading (with its
+    original timestamps) is reused, and an extra ``<device>-baseline_age`` value
+    records the age in seconds of the reading used, 0 meaning it was read live.
+
+    Args:
+        device: Device to read
+        ttl: Time a reading of a slow device may be reused for, 0 to always read
+        slow: Names of devices whose readings may be reused
+    """
+
+    def __init__(
+        self,
+        device: Readable,
+        ttl: float = 0.0,
+        slow: Collection[str] = SLOW_BASELINE_DEVICE_NAMES,
+    ) -> None:
+        # Weak, so that the wrapper cached for the device does not keep it alive
+        self._device = weakref.ref(device)
+        self.parent = None
+        self.ttl = ttl
+        self._slow = device.name in slow
+        self._snapshot: tuple[float, dict[str, Reading]] | None = None
+        # Whether triggered since last read, and whether the reading is live
+        self._triggered = False
+        self._live = False
+
+    @property
+    def device(self) -> Readable:
+        device = self._device()
+        if device is None:
+            raise ReferenceError("The device read by this baseline no longer exists")
+        return device
+
+    @property
+    def name(self) -> str:
+        return self.device.name
+
+    @property
+    def hints(self) -> Hints:
+        return cast(Hints, getattr(self.device, "hints", {}))
+
+    def invalidate(self) -> None:
+        """Forget the last reading, so the device is read live next time."""
+        self._snapshot = None
+
+    def _is_fresh(self, now: float) -> bool:
+        return (
+            self._slow
+            and self._snapshot is not None
+            and now - self._snapshot[0] < self.ttl
+        )
+
+    async def _read_live(self) -> None:
+        if isinstance(self.device, Triggerable):
+            status = self.device.trigger()
+            if not isinstance(status, AsyncStatus):
+                raise TypeError(f"{self.name} must be triggered with an AsyncStatus")
+            await status
+        reading = await maybe_await(self.device.read())
+        self._snapshot = (time.monotonic(), reading)
+
+    @AsyncStatus.wrap
+    async def trigger(self) -> None:
+        self._live = not self._is_fresh(time.monotonic())
+        if self._live:
+            await self._read_live()
+        self._triggered = True
+
+    async def read(self) -> dict[str, Reading]:
+        now = time.monotonic()
+        if not self._triggered:
+            self._live = self._snapshot is None or not self._is_fresh(now)
+            if self._live:
+                await self._read_live()
+        self._triggered = False
+        assert self._snapshot is not None
+        read_at, reading = self._snapshot
+        if self.ttl <= 0:
+            return reading
+        return {
+            **reading,
+            self.name + AGE_SUFFIX: {
+                "value": 0.0 if self._live else max(now - read_at, 0.0),
+                "timestamp": time.time(),
+            },
+        }
+
+    async def describe(self) -> dict[str, DataKey]:
+        data_keys = dict(await maybe_await(self.device.describe()))
+        if self.ttl > 0:
+            data_keys[self.name + AGE_SUFFIX] = DataKey(
+                source=f"{self.name}:cache", dtype="number", shape=[], units="s"
+            )
+        return data_keys
+
+    async def read_configuration(self) -> dict[str, Reading]:
+        if isinstance(self.device, Configurable):
+            return dict(await maybe_await(self.device.read_configuration()))
+        return {}
+
+    async def describe_configuration(self) -> dict[str, DataKey]:
+        if isinstance(self.device, Configurable):
+            return dict(await maybe_await(self.device.describe_configuration()))
+        return {}
+
+
+#: Wrapper of each device, dropped along with the device
+_CACHES: weakref.WeakKeyDictionary[Readable, CachedReadable] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def cached_baseline(
+    devices: Iterable[Readable], ttl: float = 0.0
+) -> list[CachedReadable]:
+    """Wrap baseline devices to read them concurrently, reusing slow readings.
+
+    Each device keeps one wrapper for as long as it exists, so readings of slow
+    devices can be shared between consecutive runs when ttl is above 0. Returns a
+    list to be passed to ``baseline_decorator``.
+
+    Args:
+        devices: Devices to read
+        ttl: Time a reading of a slow device may be reused for, 0 to always read
+    """
+    wrappers = []
+    for device in sorted(devices, key=lambda device: device.name):
+        wrapper = _CACHES.get(device)
+        if wrapper is None:
+            wrapper = _CACHES[device] = CachedReadable(device)
+        wrapper.ttl = ttl
+        wrappers.append(wrapper)
+    return wrappers
@@ -0,0 +1,48 @@
+import os
+import uuid
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from i22_bluesky.stubs.linkam import LinkamTrajectory
+
+
+class LinkamCheckpoint(BaseModel):
+    """Progress through a LinkamTrajectory, saved as it goes so it can be resumed.
+
+    Every run following the trajectory, including those resuming it, records the
+    id in its start document, linking them together. The options the trajectory was
+    started with are kept, so that it is resumed the same way.
+    """
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    trajectory: LinkamTrajectory
+    completed_points: int = Field(
+        description="Number of points of the expanded trajectory fully captured.",
+        ge=0,
+        default=0,
+    )
+    run_uids: list[str] = Field(
+        description="Start document uids of the runs that followed the trajectory, \
+            noted as each starts so that those that failed are included.",
+        default_factory=list,
+    )
+    plan_args: dict[str, Any] = Field(
+        description="Options other than devices the trajectory was started with.",
+        default_factory=dict,
+    )
+
+    @property
+    def complete(self) -> bool:
+        return self.completed_points >= len(self.trajectory.expand())
+
+    @classmethod
+    def load(cls, path: Path) -> "LinkamCheckpoint":
+        return cls.model_validate_json(path.read_text())
+
+    def save(self, path: Path) -> None:
+        # Replace rather than overwrite, so a crash never leaves a partial file
+        partial = path.with_name(path.name + ".partial")
+        partial.write_text(self.model_dump_json(indent=2))
+        os.replace(partial, path)
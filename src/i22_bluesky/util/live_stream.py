@@ -0,0 +1,174 @@
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Collection, Mapping
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+import h5py
+import numpy as np
+from bluesky.callbacks import CallbackBase
+from event_model import (
+    ComposeDescriptorBundle,
+    ComposeRunBundle,
+    DataKey,
+    EventDescriptor,
+    RunStart,
+    RunStop,
+    StreamDatum,
+    StreamResource,
+    compose_run,
+)
+
+
+class LiveStreamCallback(CallbackBase, ABC):
+    """Process detector data as it is written, publishing the results as a run.
+
+    Subscribed to the RunEngine, this follows the StreamResource and StreamDatum
+    documents of some data keys, handing each newly written batch of events to
+    :meth:`process`, which subclasses implement. It can read from the HDF5 files
+    (opened in SWMR mode, as the writers keep them open) with :meth:`read`.
+    Whatever it derives is published with :meth:`publish_page` as a separate run,
+    whose start document refers to the original with ``parent_uid``.
+
+    Processing runs in whichever thread the documents are received in, so to avoid
+    holding up the RunEngine at high frame rates this should be subscribed in a
+    separate process, e.g. through ``bluesky.callbacks.zmq.RemoteDispatcher``.
+
+    Args:
+        data_keys: Data keys of the detectors to follow
+        publish: Called with each (name, document) of the published runs
+    """
+
+    def __init__(
+        self,
+        data_keys: Collection[str],
+        publish: Callable[[str, Mapping[str, Any]], None],
+    ) -> None:
+        super().__init__()
+        self._keys = frozenset(data_keys)
+        self._publish = publish
+        self._reset()
+
+    def _reset(self) -> None:
+        self._start: RunStart | None = None
+        self._run: ComposeRunBundle | None = None
+        self._streams: dict[str, ComposeDescriptorBundle] = {}
+        self._data_keys: dict[str, DataKey] = {}
+        self._resources: dict[str, StreamResource] = {}
+        self._files: dict[Path, h5py.File] = {}
+
+    @abstractmethod
+    def process(
+        self,
+        key: str,
+        resource: StreamResource,
+        data_key: DataKey,
+        start: int,
+        stop: int,
+        first_seq_num: int,
+    ) -> None:
+        """Handle the events from index start up to stop of a data key.
+
+        Args:
+            key: Data key the events are of
+            resource: StreamResource of the file the events are in
+            data_key: Description of the data key
+            start: Index of the first event in the file
+            stop: Index after the last event in the file
+            first_seq_num: Sequence number of the first event
+        """
+
+    def start(self, doc: RunStart):
+        self._reset()
+        self._start = doc
+        return doc
+
+    def descriptor(self, doc: EventDescriptor):
+        for key, data_key in doc["data_keys"].items():
+            if key in self._keys:
+                self._data_keys[key] = data_key
+        return doc
+
+    def stream_resource(self, doc: StreamResource):
+        if doc["data_key"] in self._keys:
+            self._resources[doc["uid"]] = doc
+        return doc
+
+    def stream_datum(self, doc: StreamDatum):
+        resource = self._resources.get(doc["stream_resource"])
+        if resource is None:
+            return doc
+        key = resource["data_key"]
+        # Events are numbered from 1, the same as the frames if not otherwise given
+        first_seq_num = doc["seq_nums"]["start"] or doc["indices"]["start"] + 1
+        self.process(
+            key,
+            resource,
+            self._data_keys[key],
+            doc["indices"]["start"],
+            doc["indices"]["stop"],
+            first_seq_num,
+        )
+        return doc
+
+    def stop(self, doc: RunStop):
+        for file in self._files.values():
+            file.close()
+        if self._run is not None:
+            self._publish(
+                "stop", self._run.compose_stop(exit_status=doc["exit_status"])
+            )
+        self._reset()
+        return doc
+
+    def read(
+        self, resource: StreamResource, dataset: str, start: int, stop: int
+    ) -> np.ndarray:
+        """Read the latest rows start up to stop of a dataset in a resource's file."""
+        path = Path(urlparse(resource["uri"]).path)
+        if path not in self._files:
+            self._files[path] = h5py.File(path, "r", libver="latest", swmr=True)
+        data = self._files[path][dataset]
+        data.refresh()
+        return data[start:stop]
+
+    def publish_page(
+        self,
+        stream_name: str,
+        data_keys: dict[str, DataKey],
+        data: dict[str, np.ndarray],
+        first_seq_num: int,
+        configuration: dict | None = None,
+    ) -> None:
+        """Publish consecutive events of a stream, starting the run and stream first
+        if needed.
+
+        Args:
+            stream_name: Name of the stream
+            data_keys: Description of the data in the stream, used the first time
+            data: Values of each data key, with an entry per event
+            first_seq_num: Sequence number of the first event
+            configuration: Configuration of the stream, used the first time
+        """
+        if self._run is None:
+            parent_uid = self._start["uid"] if self._start else None
+            self._run = compose_run(metadata={"parent_uid": parent_uid})
+            self._publish("start", self._run.start_doc)
+        if stream_name not in self._streams:
+            self._streams[stream_name] = self._run.compose_descriptor(
+                name=stream_name,
+                data_keys=data_keys,
+                configuration=configuration or {},
+            )
+            self._publish("descriptor", self._streams[stream_name].descriptor_doc)
+        num_events = len(next(iter(data.values())))
+        now = time.time()
+        self._publish(
+            "event_page",
+            self._streams[stream_name].compose_event_page(
+                data={key: values.tolist() for key, values in data.items()},
+                timestamps={key: [now] * num_events for key in data},
+                seq_num=list(range(first_seq_num, first_seq_num + num_events)),
+            ),
+        )
@@ -0,0 +1,270 @@
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from bluesky.callbacks import CallbackBase
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg
+from event_model import RunStart, RunStop, StreamDatum
+
+from i22_bluesky.util.trace import MsgHook, set_msg_hook
+
+#: Prefix of the name of every metric
+METRIC_PREFIX = "i22_"
+
+#: Upper bounds (seconds) of the buckets of latencies of single operations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: Upper bounds (seconds) of the buckets of durations of whole plans
+DURATION_BUCKETS = (1.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0, 3600.0, 14400.0)
+
+#: Upper bounds (Hz) of the buckets of mean frame rates of runs
+RATE_BUCKETS = (1.0, 10.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2000.0, 5000.0)
+
+#: Content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#: Name of a plan whose start document has no plan_name
+UNKNOWN_PLAN = "unknown"
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Observations counted into buckets, by label values, as Prometheus has them.
+
+    Args:
+        name: Name of the metric
+        documentation: Help text of the metric
+        buckets: Upper bounds of the buckets, ascending, +Inf being added
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[Labels, list[int]] = defaultdict(
+            lambda: [0] * (len(self.buckets) + 1)
+        )
+        self._sums: dict[Labels, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._counts[key][bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(tuple(sorted(labels.items())), ()))
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts, strict=True):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key + (('le', bound),))} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"{self.name}_sum{_format_labels(key)} {_format_value(self._sums[key])}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+class PlanMetrics(CallbackBase):
+    """Time plans and the operations within them, for Prometheus to scrape.
+
+    Subscribed to the RunEngine, this times each run from its start to its stop
+    document and works out the mean rate at which frames were written from its
+    stream datum documents. Installed on the RunEngine (with install), which also
+    sets it as the msg_hook ahead of any already set, it times prepares, from the
+    prepare until the wait for it finishes, and collects. Each is counted in a
+    histogram by the plan_name in the start document, and the histograms rendered
+    in the Prometheus text format can be served over HTTP (with serve) or written
+    to a file for a node exporter to pick up (with write_textfile, or after each
+    run if textfile is given).
+
+    Args:
+        textfile: File to write the metrics to at the end of each run
+        clock: Source of the time in seconds
+    """
+
+    def __init__(
+        self,
+        textfile: Path | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__()
+        self._textfile = textfile
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.plan_duration = Histogram(
+            METRIC_PREFIX + "plan_duration_seconds",
+            "Time from the start to the stop of each run.",
+            DURATION_BUCKETS,
+        )
+        self.prepare_latency = Histogram(
+            METRIC_PREFIX + "prepare_latency_seconds",
+            "Time from preparing a device until waiting for it finished.",
+            LATENCY_BUCKETS,
+        )
+        self.collect_latency = Histogram(
+            METRIC_PREFIX + "collect_latency_seconds",
+            "Time to collect from detectors.",
+            LATENCY_BUCKETS,
+        )
+        self.frame_rate = Histogram(
+            METRIC_PREFIX + "frames_per_second",
+            "Mean rate at which frames were written over each run.",
+            RATE_BUCKETS,
+        )
+        self._plan_name = UNKNOWN_PLAN
+        self._start_time: float | None = None
+        self._frames: dict[str, int] = {}
+        # Messages being timed until the next message starts, and prepares by group
+        self._timing: list[tuple[Histogram, float]] = []
+        self._prepares: dict[object, float] = {}
+        self._previous_hook: MsgHook | None = None
+        self._subscription: int | None = None
+
+    def install(self, RE: RunEngine) -> None:
+        """Time the messages and runs of a RunEngine, keeping its msg_hook."""
+        self._previous_hook = RE.msg_hook
+        set_msg_hook(RE, self.msg_hook)
+        self._subscription = RE.subscribe(self)
+
+    def uninstall(self, RE: RunEngine) -> None:
+        set_msg_hook(RE, self._previous_hook)
+        if self._subscription is not None:
+            RE.unsubscribe(self._subscription)
+        self._subscription = None
+
+    @property
+    def histograms(self) -> list[Histogram]:
+        return [
+            self.plan_duration,
+            self.prepare_latency,
+            self.collect_latency,
+            self.frame_rate,
+        ]
+
+    def start(self, doc: RunStart):
+        self._plan_name = str(doc.get("plan_name", UNKNOWN_PLAN))
+        self._start_time = doc["time"]
+        self._frames = {}
+        return doc
+
+    def stream_datum(self, doc: StreamDatum):
+        resource = doc["stream_resource"]
+        self._frames[resource] = max(
+            self._frames.get(resource, 0), doc["indices"]["stop"]
+        )
+        return doc
+
+    def stop(self, doc: RunStop):
+        if self._start_time is not None:
+            duration = doc["time"] - self._start_time
+            with self._lock:
+                self.plan_duration.observe(
+                    duration,
+                    plan_name=self._plan_name,
+                    exit_status=doc.get("exit_status", "success"),
+                )
+                if self._frames and duration > 0:
+                    self.frame_rate.observe(
+                        max(self._frames.values()) / duration,
+                        plan_name=self._plan_name,
+                    )
+        self._start_time = None
+        self._prepares = {}
+        if self._textfile is not None:
+            self.write_textfile(self._textfile)
+        return doc
+
+    def msg_hook(self, msg: Msg) -> None:
+        """Time messages as the RunEngine processes them.
+
+        The RunEngine processes each message once the last has finished, so one
+        finishes when the next is passed here.
+        """
+        now = self._clock()
+        with self._lock:
+            for histogram, started in self._timing:
+                histogram.observe(now - started, plan_name=self._plan_name)
+            self._timing = []
+            group = msg.kwargs.get("group")
+            if msg.command == "prepare":
+                self._prepares.setdefault(group, now)
+                if group is None:
+                    self._timing.append((self.prepare_latency, now))
+            elif msg.command == "wait" and group in self._prepares:
+                self._timing.append((self.prepare_latency, self._prepares.pop(group)))
+            elif msg.command == "collect":
+                self._timing.append((self.collect_latency, now))
+        if self._previous_hook is not None:
+            self._previous_hook(msg)
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text format."""
+        with self._lock:
+            lines = [line for hist in self.histograms for line in hist.render()]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path) -> None:
+        # Replace rather than overwrite, so a scrape never reads a partial file
+        partial = path.with_name(path.name + ".partial")
+        partial.write_text(self.render())
+        os.replace(partial, path)
+
+    def serve(self, port: int = 8000, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics over HTTP from a background thread.
+
+        Args:
+            port: Port to listen on, 0 for any free port
+            host: Address to listen on, by default only this machine
+
+        Returns:
+            The server, to be shut down when no longer needed
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from collections.abc import Iterator, Sequence
+
+from bluesky.protocols import PartialEvent, Reading
+from event_model import DataKey
+from ophyd_async.core import AsyncStatus, SignalR
+from pydantic import BaseModel, Field
+
+
+class MonitorDecimation(BaseModel):
+    min_interval: float = Field(
+        description="Minimum time between recorded samples. A sample is recorded \
+            once either this or `min_delta` has been exceeded.",
+        json_schema_extra={"units": "s"},
+        ge=0.0,
+        default=5.0,
+    )
+    min_delta: float = Field(
+        description="Minimum change of the key signal between recorded samples. \
+            A sample is recorded once either this or `min_interval` has been \
+            exceeded.",
+        ge=0.0,
+        default=0.5,
+    )
+
+
+class DecimatedMonitor:
+    """Buffer decimated monitor updates of some signals to be collected in batches.
+
+    Between kickoff and complete every update of the signals is observed, but a
+    sample of all of them is only buffered when the key signal has changed by at least
+    ``min_delta``, or ``min_interval`` has passed, since the last buffered sample.
+    Each collect drains the buffer into a single page of events, so a long ramp can
+    be recorded in full without an event per IOC update.
+
+    Args:
+        key: Signal whose changes decide when a sample is recorded
+        signals: Other signals to record alongside the key signal
+        decimation: Thresholds for recording a new sample
+        name: Name of the monitor, used for the stream it is collected into
+    """
+
+    def __init__(
+        self,
+        key: SignalR[float],
+        signals: Sequence[SignalR] = (),
+        decimation: MonitorDecimation | None = None,
+        name: str = "",
+    ) -> None:
+        self.name = name
+        self.parent = None
+        self._key = key
+        # Key signal last, so its initial update finds the others already present
+        self._signals = [*(signal for signal in signals if signal is not key), key]
+        self._decimation = decimation or MonitorDecimation()
+        self._latest: dict[str, Reading] = {}
+        self._buffer: list[PartialEvent] = []
+        self._last_recorded: tuple[float, float] | None = None
+
+    def _update(self, reading: dict[str, Reading]) -> None:
+        self._latest.update(reading)
+        if self._key.name not in reading or len(self._latest) < len(self._signals):
+            return
+        value = float(reading[self._key.name]["value"])
+        timestamp = reading[self._key.name]["timestamp"]
+        if self._last_recorded is not None:
+            last_time, last_value = self._last_recorded
+            if (
+                timestamp - last_time < self._decimation.min_interval
+                and abs(value - last_value) < self._decimation.min_delta
+            ):
+                return
+        self._last_recorded = (timestamp, value)
+        latest = self._latest.items()
+        self._buffer.append(
+            {
+                "data": {name: reading["value"] for name, reading in latest},
+                "timestamps": {name: reading["timestamp"] for name, reading in latest},
+                "time": time.time(),
+            }
+        )
+
+    @AsyncStatus.wrap
+    async def kickoff(self) -> None:
+        self._latest = {}
+        self._last_recorded = None
+        for signal in self._signals:
+            signal.subscribe(self._update)
+
+    @AsyncStatus.wrap
+    async def complete(self) -> None:
+        for signal in self._signals:
+            signal.clear_sub(self._update)
+
+    async def describe_collect(self) -> dict[str, DataKey]:
+        descriptions = await asyncio.gather(
+            *(signal.describe() for signal in self._signals)
+        )
+        return {k: v for description in descriptions for k, v in description.items()}
+
+    def collect(self) -> Iterator[PartialEvent]:
+        buffered, self._buffer = self._buffer, []
+        yield from buffered
@@ -0,0 +1,211 @@
+import logging
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, cast
+
+import h5py
+import numpy as np
+from bluesky.callbacks import CallbackBase
+from event_model import RunStart, RunStop, StreamResource
+
+from i22_bluesky.util.trigger_analysis import (
+    DETECTOR_DATASET,
+    GATE_TIME_KEY,
+    open_written,
+    read_frame_count,
+    resource_path,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+#: Data key of the PandA dataset capturing the length of each gate, if captured
+GATE_DURATION_KEY = "gate_duration"
+
+#: Channel of a TetrAMM's frames holding the sum of the currents of all inputs
+TETRAMM_SUM_CHANNEL = 6
+
+#: Suffix of the name of the side-car file written next to a detector's file
+SIDECAR_SUFFIX = "_normalization.h5"
+
+#: Dataset of the side-car file holding the table
+NORMALIZATION_DATASET = "normalization"
+
+#: One row per frame of a detector, see normalization_table
+NORMALIZATION_DTYPE = np.dtype(
+    [
+        ("frame", np.int64),
+        ("timestamp", np.float64),
+        ("exposure", np.float64),
+        ("i0", np.float64),
+        ("it", np.float64),
+        ("transmission", np.float64),
+    ]
+)
+
+
+def _fit(values: np.ndarray | float | None, num_frames: int) -> np.ndarray:
+    # One value per frame, truncated or padded with NaN where the source is short
+    fitted = np.full(num_frames, np.nan)
+    if values is None:
+        return fitted
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 0:
+        fitted[:] = values
+        return fitted
+    count = min(len(values), num_frames)
+    fitted[:count] = values[:count]
+    return fitted
+
+
+def normalization_table(
+    num_frames: int,
+    gate_times: np.ndarray,
+    exposure: np.ndarray | float | None = None,
+    i0: np.ndarray | None = None,
+    it: np.ndarray | None = None,
+) -> np.ndarray:
+    """Join what is needed to normalize each frame of a detector into one table.
+
+    Every column is lined up with the frames, the nth row being of the nth frame
+    and the nth gate, in one pass with numpy. Columns with fewer values than frames
+    (e.g. gates the PandA missed) are padded with NaN, as are those not given.
+
+    Args:
+        num_frames: Number of frames the detector wrote
+        gate_times: Time (seconds, PandA clock) of the start of each gate
+        exposure: Length (seconds) of each gate, or the exposure of every frame
+        i0: Mean incident current during each frame
+        it: Mean transmitted current during each frame
+
+    Returns:
+        Structured array of NORMALIZATION_DTYPE
+    """
+    table = np.empty(num_frames, dtype=NORMALIZATION_DTYPE)
+    table["frame"] = np.arange(num_frames)
+    table["timestamp"] = _fit(gate_times, num_frames)
+    table["exposure"] = _fit(exposure, num_frames)
+    table["i0"] = _fit(i0, num_frames)
+    table["it"] = _fit(it, num_frames)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["transmission"] = table["it"] / table["i0"]
+    return table
+
+
+def read_tetramm_current(
+    path: Path, dataset: str = DETECTOR_DATASET, channel: int = TETRAMM_SUM_CHANNEL
+) -> np.ndarray:
+    """Mean current of each frame of a TetrAMM, reading only the one channel."""
+    with open_written(path) as file:
+        # Frames are (channels, readings), each reading an average of samples
+        return file[dataset][:, channel, :].mean(axis=1)
+
+
+def write_normalization_table(
+    path: Path, table: np.ndarray, **attributes: str | float
+) -> None:
+    with h5py.File(path, "w") as file:
+        written = file.create_dataset(NORMALIZATION_DATASET, data=table)
+        written.attrs.update(attributes)
+
+
+class NormalizationSidecar(CallbackBase):
+    """Write a table for normalizing each frame of a detector, next to its file.
+
+    Subscribed to the RunEngine, this notes the files written during a run, then
+    when the run stops reads the gate times (and lengths, if captured) from the
+    PandA's file, the currents of the TetrAMMs measuring the incident and
+    transmitted beam (when collected) and the number of frames in the detector's
+    file. These are joined with normalization_table and written next to the
+    detector's file, as ``<file>_normalization.h5``. Only those datasets are read,
+    a channel at a time, so building the table costs little more than reading them.
+
+    When the gate lengths are not captured, the exposure in the run's plan_args is
+    taken as the exposure of every frame.
+
+    Args:
+        detector: Data key of the frames to normalize
+        i0: Data key of the TetrAMM measuring the incident beam
+        it: Data key of the TetrAMM measuring the transmitted beam
+        gate_time_key: Data key of the PandA dataset capturing the gate times
+        gate_duration_key: Data key of the PandA dataset capturing the gate lengths
+    """
+
+    def __init__(
+        self,
+        detector: str = "saxs",
+        i0: str = "i0",
+        it: str = "it",
+        gate_time_key: str = GATE_TIME_KEY,
+        gate_duration_key: str = GATE_DURATION_KEY,
+    ) -> None:
+        super().__init__()
+        self._detector = detector
+        self._i0 = i0
+        self._it = it
+        self._gate_time_key = gate_time_key
+        self._gate_duration_key = gate_duration_key
+        self._start: RunStart | None = None
+        self._resources: dict[str, StreamResource] = {}
+
+    def start(self, doc: RunStart):
+        self._start = doc
+        self._resources = {}
+        return doc
+
+    def stream_resource(self, doc: StreamResource):
+        self._resources[doc["data_key"]] = doc
+        return doc
+
+    def stop(self, doc: RunStop):
+        frames = self._resources.get(self._detector)
+        gates = self._resources.get(self._gate_time_key)
+        if self._start is not None and frames is not None and gates is not None:
+            path = resource_path(frames)
+            sidecar = path.with_name(path.stem + SIDECAR_SUFFIX)
+            try:
+                write_normalization_table(
+                    sidecar,
+                    self.table(frames, gates),
+                    run_uid=self._start["uid"],
+                    detector=self._detector,
+                    file=path.name,
+                )
+            except (OSError, KeyError, ValueError) as error:
+                # The run's data is intact without the table, so carry on
+                LOGGER.warning(f"Could not write {sidecar}: {error}")
+        self._start = None
+        self._resources = {}
+        return doc
+
+    def table(self, frames: StreamResource, gates: StreamResource) -> np.ndarray:
+        """Read the columns of the table of a run from the files it wrote."""
+        durations = self._resources.get(self._gate_duration_key)
+        exposure: np.ndarray | float | None
+        if durations is not None:
+            exposure = _read(durations)
+        else:
+            plan_args = (
+                cast(Mapping[str, Any], self._start.get("plan_args", {}))
+                if self._start
+                else {}
+            )
+            exposure = plan_args.get("exposure")
+        currents = {
+            key: read_tetramm_current(
+                resource_path(resource), resource["parameters"]["dataset"]
+            )
+            for key in (self._i0, self._it)
+            if (resource := self._resources.get(key)) is not None
+        }
+        return normalization_table(
+            read_frame_count(resource_path(frames), frames["parameters"]["dataset"]),
+            _read(gates),
+            exposure=exposure,
+            i0=currents.get(self._i0),
+            it=currents.get(self._it),
+        )
+
+
+def _read(resource: StreamResource) -> np.ndarray:
+    with open_written(resource_path(resource)) as file:
+        return file[resource["parameters"]["dataset"]][()]
@@ -0,0 +1,127 @@
+import re
+from enum import StrEnum
+
+from bluesky.utils import MsgGenerator
+from ophyd_async.core import SignalRW, walk_rw_signals
+from ophyd_async.fastcs.panda import HDFPanda
+from pydantic import BaseModel, Field
+
+from i22_bluesky.util.state_cache import cached_mv
+
+#: Suffix of the signals setting how each PandA field is captured
+CAPTURE_SUFFIX = "_capture"
+
+#: Suffix of the signals naming the dataset each PandA field is written to
+DATASET_SUFFIX = "_dataset"
+
+
+class CaptureMode(StrEnum):
+    """How a PandA field is captured each time PCAP is triggered."""
+
+    NO = "No"
+    VALUE = "Value"
+    DIFF = "Diff"
+    SUM = "Sum"
+    MEAN = "Mean"
+    MIN = "Min"
+    MAX = "Max"
+    MIN_MAX = "Min Max"
+    MIN_MAX_MEAN = "Min Max Mean"
+
+
+class CapturedField(BaseModel):
+    field: str = Field(
+        description="PandA field to capture, as BLOCK[N].FIELD, e.g. INENC1.VAL.",
+        pattern=r"^[A-Z_]+\d*\.[A-Z_0-9]+$",
+    )
+    mode: CaptureMode = Field(
+        description="Whether to sample the value at each trigger, or average (or \
+            take the extremes of) it over each gate.",
+        default=CaptureMode.VALUE,
+    )
+    dataset: str | None = Field(
+        description="Name of the dataset in the PandA's file, as saved if not set.",
+        default=None,
+    )
+
+
+class PandaCaptureSpec(BaseModel):
+    """The fields a PandA captures, all others being left out of its file.
+
+    The PandA writes every captured field on every trigger, so at high rates
+    capturing only what is needed keeps the size of its file and the bandwidth of
+    its writer down. Averaging (MEAN) is done on the FPGA over each gate, so is no
+    more costly than sampling.
+    """
+
+    fields: list[CapturedField] = Field(
+        description="Fields to capture, all others are not captured.",
+        default_factory=list,
+    )
+
+
+def _field_name(path: str, suffix: str) -> str:
+    # e.g. "inenc.1.val_capture" -> "INENC1.VAL"
+    *block, field = path.split(".")
+    return "".join(block).upper() + "." + field.removesuffix(suffix).upper()
+
+
+def _field_signals(panda: HDFPanda, suffix: str) -> dict[str, SignalRW]:
+    # The data block's own settings (e.g. num_capture) are not fields
+    return {
+        _field_name(path, suffix): signal
+        for path, signal in walk_rw_signals(panda).items()
+        if re.search(f"\\.[^.]+{suffix}$", path) and not path.startswith("data.")
+    }
+
+
+def apply_capture_spec(panda: HDFPanda, spec: PandaCaptureSpec | None) -> MsgGenerator:
+    """Capture only the fields in a spec, in the ways given, on a PandA.
+
+    Should be applied after loading saved settings and before preparing the PandA,
+    which reads the datasets it will write when it opens its file. Capture is left
+    as it is if the spec is None.
+    """
+    if spec is None:
+        return
+    captures = _field_signals(panda, CAPTURE_SUFFIX)
+    datasets = _field_signals(panda, DATASET_SUFFIX)
+    unknown = {field.field for field in spec.fields} - captures.keys()
+    if unknown:
+        raise ValueError(
+            f"PandA {panda.name} has no capturable fields {sorted(unknown)}, "
+            f"only {sorted(captures)}"
+        )
+    modes = dict.fromkeys(captures, CaptureMode.NO)
+    modes.update({field.field: field.mode for field in spec.fields})
+    moves = []
+    for name, mode in modes.items():
+        moves += [captures[name], mode.value]
+    for field in spec.fields:
+        if field.dataset is not None and field.field in datasets:
+            moves += [datasets[field.field], field.dataset]
+    yield from cached_mv(*moves)
+
+
+def capturable_fields(panda: HDFPanda) -> set[str]:
+    """The fields a PandA can capture, as BLOCK[N].FIELD."""
+    return set(_field_signals(panda, CAPTURE_SUFFIX))
+
+
+def capture_field(panda: HDFPanda, field: CapturedField) -> MsgGenerator:
+    """Capture one field of a PandA as given, leaving the others as they are.
+
+    For a field a plan relies on whatever else is captured, so should be applied
+    after apply_capture_spec.
+    """
+    captures = _field_signals(panda, CAPTURE_SUFFIX)
+    if field.field not in captures:
+        raise ValueError(
+            f"PandA {panda.name} has no capturable field {field.field}, "
+            f"only {sorted(captures)}"
+        )
+    moves = [captures[field.field], field.mode.value]
+    datasets = _field_signals(panda, DATASET_SUFFIX)
+    if field.dataset is not None and field.field in datasets:
+        moves += [datasets[field.field], field.dataset]
+    yield from cached_mv(*moves)
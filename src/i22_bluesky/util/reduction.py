@@ -0,0 +1,205 @@
+import os
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+from event_model import DataKey, StreamResource
+from pydantic import BaseModel, Field
+from scipy import sparse
+
+from i22_bluesky.util.live_stream import LiveStreamCallback
+
+#: Name of the stream of the reduced curves in the runs published by LiveReduction
+REDUCED_STREAM_NAME = "reduced"
+
+# Frames are binned in parallel, the sparse products releasing the GIL
+_EXECUTOR = ThreadPoolExecutor(os.cpu_count(), thread_name_prefix="reduction")
+
+
+class ReductionGeometry(BaseModel):
+    beam_centre_x: float = Field(
+        description="Column of the pixel the direct beam would hit.",
+        json_schema_extra={"units": "pixels"},
+    )
+    beam_centre_y: float = Field(
+        description="Row of the pixel the direct beam would hit.",
+        json_schema_extra={"units": "pixels"},
+    )
+    distance: float = Field(
+        description="Distance from sample to detector.",
+        json_schema_extra={"units": "mm"},
+        gt=0.0,
+    )
+    wavelength: float = Field(
+        description="Wavelength of the beam.",
+        json_schema_extra={"units": "Å"},
+        gt=0.0,
+    )
+    pixel_size: float = Field(
+        description="Size of a (square) pixel.",
+        json_schema_extra={"units": "mm"},
+        gt=0.0,
+        default=0.172,
+    )
+    num_bins: int = Field(
+        description="Number of equally spaced q bins to reduce frames into.",
+        gt=0,
+        default=500,
+    )
+    q_max: float | None = Field(
+        description="Upper edge of the last q bin, the largest q on the detector \
+            if not set.",
+        json_schema_extra={"units": "Å⁻¹"},
+        gt=0.0,
+        default=None,
+    )
+
+
+class QBinning:
+    """Precomputed lookup from pixels to q bins for azimuthal integration.
+
+    The bin of every pixel is computed once for a frame shape, as a sparse matrix
+    of bins by pixels, after which reducing a frame is a single sparse product with
+    no per-pixel Python or geometry. Reducing a whole frame is bound by memory
+    bandwidth rather than arithmetic, so the frames of a batch are reduced in
+    parallel, one per core.
+
+    Args:
+        geometry: Position of the detector relative to the sample and beam
+        shape: Shape (rows, columns) of the frames to reduce
+        mask: Pixels to ignore (e.g. module gaps and the beamstop), True where
+            masked
+    """
+
+    def __init__(
+        self,
+        geometry: ReductionGeometry,
+        shape: tuple[int, int],
+        mask: np.ndarray | None = None,
+    ) -> None:
+        rows, columns = np.indices(shape, dtype=np.float64)
+        radius = geometry.pixel_size * np.hypot(
+            rows - geometry.beam_centre_y, columns - geometry.beam_centre_x
+        )
+        two_theta = np.arctan2(radius, geometry.distance)
+        q = 4 * np.pi * np.sin(two_theta / 2) / geometry.wavelength
+        q_max = geometry.q_max or float(q.max())
+        self.num_bins = geometry.num_bins
+        self.edges = np.linspace(0.0, q_max, self.num_bins + 1)
+        self.q = (self.edges[:-1] + self.edges[1:]) / 2
+
+        bins = np.digitize(q, self.edges) - 1
+        # Pixels outside the bins, or masked, go in an extra bin that is dropped
+        outside = (bins < 0) | (bins >= self.num_bins)
+        if mask is not None:
+            outside |= mask
+        bins[outside] = self.num_bins
+        self.shape = shape
+        #: Bin of each pixel of a flattened frame, num_bins where it is ignored
+        self.bins = bins.ravel()
+        binned = np.flatnonzero(~outside.ravel())
+        self._matrix = sparse.csr_array(
+            (np.ones(len(binned)), (self.bins[binned], binned)),
+            shape=(self.num_bins, self.bins.size),
+        )
+        self._pixels = np.bincount(self.bins[binned], minlength=self.num_bins)
+
+    def reduce(self, frames: np.ndarray) -> np.ndarray:
+        """Mean intensity in each q bin of each of a batch of frames.
+
+        Args:
+            frames: Array of shape (frames, rows, columns)
+
+        Returns:
+            Array of shape (frames, bins), NaN for bins with no pixels
+        """
+        totals = np.empty((len(frames), self.num_bins))
+        # Faster than one product with the whole batch, which is read transposed
+        for index, total in enumerate(
+            _EXECUTOR.map(self._reduce_frame, frames.reshape(len(frames), -1))
+        ):
+            totals[index] = total
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return totals / self._pixels
+
+    def _reduce_frame(self, frame: np.ndarray) -> np.ndarray:
+        return self._matrix @ frame
+
+
+class LiveReduction(LiveStreamCallback):
+    """Reduce frames to I(q) as they are written, publishing the curves as a run.
+
+    Each newly written batch of frames of a detector with a geometry is reduced with
+    a :class:`QBinning`. Each detector has a "reduced_<detector>" stream in the
+    published run, holding a ``<detector>-I`` curve per event, with the q of the bins
+    in its configuration.
+
+    Args:
+        geometries: Geometry of each detector to reduce, by data key
+        publish: Called with each (name, document) of the published runs
+        masks: Pixels to ignore for each detector, by data key
+    """
+
+    def __init__(
+        self,
+        geometries: dict[str, ReductionGeometry],
+        publish: Callable[[str, Mapping[str, Any]], None],
+        masks: dict[str, np.ndarray] | None = None,
+    ) -> None:
+        super().__init__(geometries.keys(), publish)
+        self._geometries = geometries
+        self._masks = masks or {}
+        self._binnings: dict[str, QBinning] = {}
+
+    def process(
+        self,
+        key: str,
+        resource: StreamResource,
+        data_key: DataKey,
+        start: int,
+        stop: int,
+        first_seq_num: int,
+    ) -> None:
+        exposures_per_event = data_key["shape"][0] or 1
+        frames = self.read(
+            resource,
+            resource["parameters"]["dataset"],
+            start * exposures_per_event,
+            stop * exposures_per_event,
+        )
+        _, rows, columns = frames.shape
+        binning = self._binning(key, (rows, columns))
+        curves = binning.reduce(frames)
+        curves = curves.reshape(-1, exposures_per_event, curves.shape[-1]).mean(axis=1)
+        q_key = DataKey(
+            source=key, dtype="array", shape=[binning.num_bins], units="Å⁻¹"
+        )
+        self.publish_page(
+            f"{REDUCED_STREAM_NAME}_{key}",
+            data_keys={
+                f"{key}-I": DataKey(
+                    source=key,
+                    dtype="array",
+                    dtype_numpy="<f8",
+                    shape=[binning.num_bins],
+                )
+            },
+            data={f"{key}-I": curves},
+            first_seq_num=first_seq_num,
+            configuration={
+                key: {
+                    "data": {f"{key}-q": binning.q.tolist()},
+                    "timestamps": {f"{key}-q": time.time()},
+                    "data_keys": {f"{key}-q": q_key},
+                }
+            },
+        )
+
+    def _binning(self, key: str, shape: tuple[int, int]) -> QBinning:
+        binning = self._binnings.get(key)
+        if binning is None or binning.shape != shape:
+            binning = QBinning(self._geometries[key], shape, self._masks.get(key))
+            self._binnings[key] = binning
+        return binning
@@ -0,0 +1,229 @@
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Annotated as A
+from typing import cast
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+from bluesky.protocols import Hints, StreamAsset
+from bluesky.utils import MsgGenerator
+from dodal.common.coordination import group_uuid
+from event_model import DataKey
+from ophyd_async.core import (
+    DetectorWriter,
+    SignalR,
+    SignalRW,
+    StandardDetector,
+)
+from ophyd_async.epics.adcore import (
+    ADCallbacks,
+    ADWriter,
+    AreaDetector,
+    NDPluginBaseIO,
+)
+from ophyd_async.epics.core import PvSuffix
+from pydantic import BaseModel, Field, PositiveInt
+
+#: Suffix of the NDROI plugin of each areaDetector IOC, relative to the detector
+ROI_SUFFIX = "ROI:"
+
+#: Name of the NDROI plugin among the plugins of an areaDetector
+ROI_PLUGIN = "roi"
+
+
+class NDROIIO(NDPluginBaseIO):
+    """Plugin for selecting and binning a region of interest of an image.
+
+    This mirrors the interface provided by ADCore/db/NDROI.template.
+    See HTML docs at https://areadetector.github.io/areaDetector/ADCore/NDPluginROI.html
+    """
+
+    port_name: A[SignalR[str], PvSuffix("PortName_RBV")]
+    enable_x: A[SignalRW[bool], PvSuffix.rbv("EnableX")]
+    enable_y: A[SignalRW[bool], PvSuffix.rbv("EnableY")]
+    min_x: A[SignalRW[int], PvSuffix.rbv("MinX")]
+    min_y: A[SignalRW[int], PvSuffix.rbv("MinY")]
+    size_x: A[SignalRW[int], PvSuffix.rbv("SizeX")]
+    size_y: A[SignalRW[int], PvSuffix.rbv("SizeY")]
+    bin_x: A[SignalRW[int], PvSuffix.rbv("BinX")]
+    bin_y: A[SignalRW[int], PvSuffix.rbv("BinY")]
+
+
+class DetectorROI(BaseModel):
+    min_x: int = Field(description="First column of the region.", ge=0, default=0)
+    min_y: int = Field(description="First row of the region.", ge=0, default=0)
+    size_x: int | None = Field(
+        description="Number of columns in the region, to the edge of the sensor if \
+            not set.",
+        gt=0,
+        default=None,
+    )
+    size_y: int | None = Field(
+        description="Number of rows in the region, to the edge of the sensor if not \
+            set.",
+        gt=0,
+        default=None,
+    )
+    bin_x: int = Field(description="Columns summed into each pixel.", gt=0, default=1)
+    bin_y: int = Field(description="Rows summed into each pixel.", gt=0, default=1)
+
+
+class ROIWriter(DetectorWriter):
+    """Write the frames of an areaDetector as reduced by an NDROI plugin.
+
+    Wraps the detector's own writer, describing the frames with the shape computed
+    from the ROI settings: the file plugin's own array size is only updated once a
+    frame has passed through the ROI plugin, so is stale when the writer opens.
+    """
+
+    def __init__(self, writer: ADWriter, roi: NDROIIO) -> None:
+        self.writer = writer
+        self.roi = roi
+        self._shape: tuple[int, int] | None = None
+
+    async def shape(self) -> tuple[int, int]:
+        size_y, size_x, bin_y, bin_x = await asyncio.gather(
+            self.roi.size_y.get_value(),
+            self.roi.size_x.get_value(),
+            self.roi.bin_y.get_value(),
+            self.roi.bin_x.get_value(),
+        )
+        return size_y // bin_y, size_x // bin_x
+
+    async def open(
+        self, name: str, exposures_per_event: PositiveInt = 1
+    ) -> dict[str, DataKey]:
+        describe = await self.writer.open(name, exposures_per_event)
+        self._shape = await self.shape()
+        describe[name]["shape"] = [exposures_per_event, *self._shape]
+        return describe
+
+    def get_hints(self, name: str) -> Hints:
+        return self.writer.get_hints(name)
+
+    async def get_indices_written(self) -> int:
+        return await self.writer.get_indices_written()
+
+    def observe_indices_written(self, timeout: float) -> AsyncGenerator[int, None]:
+        return self.writer.observe_indices_written(timeout)
+
+    async def collect_stream_docs(
+        self, name: str, indices_written: int
+    ) -> AsyncIterator[StreamAsset]:
+        async for asset in self.writer.collect_stream_docs(name, indices_written):
+            if asset[0] == "stream_resource" and self._shape is not None:
+                parameters = asset[1]["parameters"]
+                chunk_shape = parameters.get("chunk_shape")
+                if asset[1]["data_key"] == name and chunk_shape:
+                    parameters["chunk_shape"] = [chunk_shape[0], *self._shape]
+            yield asset
+
+    async def close(self) -> None:
+        await self.writer.close()
+
+
+def validate_roi(region: DetectorROI, sensor: tuple[int, int]) -> tuple[int, int]:
+    """Check a region lies within a sensor of (rows, columns).
+
+    Returns:
+        The size (rows, columns) of the region, to the edge of the sensor where
+        the region does not say
+    """
+    rows, columns = sensor
+    size_y = region.size_y or rows - region.min_y
+    size_x = region.size_x or columns - region.min_x
+    if region.min_y + size_y > rows or region.min_x + size_x > columns:
+        raise ValueError(
+            f"{region} does not fit within a sensor of {rows} rows by {columns} columns"
+        )
+    if size_y < region.bin_y or size_x < region.bin_x:
+        raise ValueError(f"{region} is binned into less than one pixel")
+    return size_y, size_x
+
+
+def configure_roi(detector: AreaDetector, region: DetectorROI) -> MsgGenerator[str]:
+    """Insert a detector's NDROI plugin between the source of its HDF writer and it.
+
+    The plugin must be wired into the detector as its ``roi`` plugin, e.g.
+    ``PilatusDetector(..., plugins={"roi": NDROIIO(prefix + ROI_SUFFIX)})``.
+
+    Returns:
+        The port the HDF writer previously took frames from, to restore with
+        `restore_roi`
+    """
+    roi = cast(NDROIIO, detector.get_plugin(ROI_PLUGIN, NDROIIO))
+    source_port = yield from bps.rd(detector.fileio.nd_array_port)
+    roi_port = yield from bps.rd(roi.port_name)
+    rows = yield from bps.rd(detector.driver.array_size_y)
+    columns = yield from bps.rd(detector.driver.array_size_x)
+    size_y, size_x = validate_roi(region, (rows, columns))
+
+    settings = {
+        roi.nd_array_port: source_port,
+        roi.enable_callbacks: ADCallbacks.ENABLE,
+        roi.enable_x: True,
+        roi.enable_y: True,
+        roi.min_x: region.min_x,
+        roi.min_y: region.min_y,
+        roi.size_x: size_x,
+        roi.size_y: size_y,
+        roi.bin_x: region.bin_x,
+        roi.bin_y: region.bin_y,
+    }
+    group = group_uuid("roi")
+    for signal, value in settings.items():
+        yield from bps.abs_set(signal, value, group=group)
+    yield from bps.wait(group=group)
+    yield from bps.abs_set(detector.fileio.nd_array_port, roi_port, wait=True)
+    standard: StandardDetector = detector
+    standard._writer = ROIWriter(detector._writer, roi)  # noqa: SLF001
+    return source_port
+
+
+def restore_roi(detector: AreaDetector, source_port: str) -> MsgGenerator:
+    """Connect a detector's HDF writer back to where it took frames from before."""
+    yield from bps.abs_set(detector.fileio.nd_array_port, source_port, wait=True)
+    standard: StandardDetector = detector
+    writer = standard._writer  # noqa: SLF001
+    if isinstance(writer, ROIWriter):
+        detector._writer = writer.writer  # noqa: SLF001
+
+
+def roi_wrapper(
+    plan: MsgGenerator,
+    detectors: set[StandardDetector],
+    roi: dict[str, DetectorROI] | None,
+) -> MsgGenerator:
+    """Write only a binned region of the frames of some detectors during a plan.
+
+    Frames are reduced on the IOC before reaching the HDF writer, and the reduced
+    shape is what the detectors describe, so appears in the data descriptors. The
+    writers take full frames again once the plan finishes, however it finishes.
+
+    Args:
+        plan: Plan to run
+        detectors: Detectors used by the plan
+        roi: Region of each detector to write, by detector name. Detectors not
+            named write full frames.
+    """
+    unknown = set(roi or {}) - {detector.name for detector in detectors}
+    if unknown:
+        raise ValueError(f"ROI given for detectors not in plan: {sorted(unknown)}")
+    regions: dict[AreaDetector, DetectorROI] = {}
+    for detector in detectors:
+        if (region := (roi or {}).get(detector.name)) is not None:
+            if not isinstance(detector, AreaDetector):
+                raise ValueError(f"{detector.name} is not an areaDetector, has no ROI")
+            regions[detector] = region
+    previous: dict[AreaDetector, str] = {}
+
+    def configure_and_run():
+        for detector, region in regions.items():
+            previous[detector] = yield from configure_roi(detector, region)
+        return (yield from plan)
+
+    def restore():
+        for detector, port in previous.items():
+            yield from restore_roi(detector, port)
+
+    return (yield from bpp.finalize_wrapper(configure_and_run(), restore()))
@@ -0,0 +1,149 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import ArrayLike
+from ophyd_async.fastcs.panda import SeqTable, SeqTrigger
+
+#: Time (seconds) of one unit of time1 and time2, the prescaler being set to 1 µs
+SEQ_TIME_UNIT = 1e-6
+
+#: Outputs of the sequencer, each with a column per phase in a SeqTable
+SEQ_OUTPUTS = ("a", "b", "c", "d", "e", "f")
+
+
+@dataclass
+class SeqTimeline:
+    """The phases a PandA sequencer goes through running a table.
+
+    Each phase holds the outputs at constant values until the next phase starts. A
+    phase followed by a line waiting for its trigger condition lasts until the
+    condition is met, the outputs holding their values meanwhile.
+    """
+
+    #: Time (seconds after the table starts) each phase starts at, ascending
+    starts: np.ndarray
+    #: Value of each output (by letter) in each phase
+    outputs: dict[str, np.ndarray]
+    #: Time the last phase ends, inf if left waiting for a trigger that never comes
+    end: float
+
+    def gates(self, output: str) -> tuple[np.ndarray, np.ndarray]:
+        """Times of the rising and falling edges of an output.
+
+        Outputs start low, and are left as they are at the end, so when an output is
+        high at the end there is one fewer falling edge.
+        """
+        value = self.outputs[output].astype(np.int8)
+        changes = np.diff(value, prepend=0)
+        return self.starts[changes > 0], self.starts[changes < 0]
+
+    def state(self, output: str, times: ArrayLike) -> np.ndarray:
+        """Value of an output at each of some times (seconds after the start)."""
+        phase = np.searchsorted(self.starts, times, side="right") - 1
+        value = self.outputs[output][np.maximum(phase, 0)]
+        return np.where(phase >= 0, value, False)
+
+
+def emulate_seq_table(
+    table: SeqTable,
+    conditions: Mapping[SeqTrigger, ArrayLike] | None = None,
+    repeats: int = 1,
+) -> SeqTimeline:
+    """Work out when the outputs of a PandA sequencer change running a table.
+
+    Every repeat of a line waits for the line's trigger condition, then sets the
+    phase 1 outputs for time1 and the phase 2 outputs for time2. As on the PandA,
+    conditions are levels rather than edges: a repeat starts as soon as its
+    condition holds, so a condition held high triggers repeat after repeat. Lines
+    with an immediate trigger are expanded with numpy, so tables taking millions of
+    frames are quick to emulate; only repeats of triggered lines are stepped through
+    one at a time. Phases of zero length are left out, as they never reach the
+    outputs.
+
+    Args:
+        table: Table the sequencer runs
+        conditions: Intervals (start, end) of time (seconds after the table starts)
+            during which each trigger condition lines wait for holds, e.g. while
+            BITA is high for SeqTrigger.BITA_1. The end of an interval may be inf,
+            for a condition that holds from then on.
+        repeats: Number of times the sequencer runs through the table
+
+    Returns:
+        The phases of the sequencer, up to the end of the table or the first line
+        whose condition never holds
+    """
+    if np.any(table.repeats == 0):
+        raise ValueError("Cannot emulate lines that repeat indefinitely")
+    held = {
+        SeqTrigger(trigger): _intervals(intervals)
+        for trigger, intervals in (conditions or {}).items()
+    }
+    time1 = table.time1.astype(np.float64) * SEQ_TIME_UNIT
+    time2 = table.time2.astype(np.float64) * SEQ_TIME_UNIT
+
+    starts: list[np.ndarray] = []
+    lines: list[np.ndarray] = []
+    now = 0.0
+    for line in np.tile(np.arange(len(table)), repeats):
+        period = time1[line] + time2[line]
+        trigger = SeqTrigger(table.trigger[line])
+        if trigger == SeqTrigger.IMMEDIATE:
+            line_starts = now + period * np.arange(table.repeats[line])
+            now += period * table.repeats[line]
+        else:
+            interval_starts, interval_ends = held.get(trigger, (np.empty(0),) * 2)
+            line_starts = np.empty(table.repeats[line])
+            for repeat in range(len(line_starts)):
+                # First interval the condition still holds in, or has yet to
+                interval = np.searchsorted(interval_ends, now, side="right")
+                if interval == len(interval_ends):
+                    return _timeline(table, starts, lines, time1, np.inf)
+                now = max(now, float(interval_starts[interval]))
+                line_starts[repeat] = now
+                now += period
+        starts.append(line_starts)
+        lines.append(np.full(len(line_starts), line))
+    return _timeline(table, starts, lines, time1, now)
+
+
+def _intervals(intervals: ArrayLike) -> tuple[np.ndarray, np.ndarray]:
+    # Starts and ends of intervals, in order of their starts
+    unordered = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+    array = unordered[np.argsort(unordered[:, 0])]
+    if np.any(array[:, 1] < array[:, 0]) or np.any(array[1:, 0] < array[:-1, 1]):
+        raise ValueError(
+            "Condition intervals must not end before they start or overlap"
+        )
+    return array[:, 0], array[:, 1]
+
+
+def _timeline(
+    table: SeqTable,
+    starts: list[np.ndarray],
+    lines: list[np.ndarray],
+    time1: np.ndarray,
+    end: float,
+) -> SeqTimeline:
+    # Interleave the two phases of every repeat, dropping those of zero length
+    repeat_starts = np.concatenate(starts) if starts else np.empty(0)
+    repeat_lines = np.concatenate(lines) if lines else np.empty(0, dtype=np.intp)
+    phase_starts = np.stack(
+        [repeat_starts, repeat_starts + time1[repeat_lines]], axis=1
+    ).ravel()
+    phase_ends = np.append(phase_starts[1:], end)
+    keep = phase_ends > phase_starts
+    return SeqTimeline(
+        starts=phase_starts[keep],
+        outputs={
+            output: np.stack(
+                [
+                    getattr(table, f"out{output}1")[repeat_lines],
+                    getattr(table, f"out{output}2")[repeat_lines],
+                ],
+                axis=1,
+            ).ravel()[keep]
+            for output in SEQ_OUTPUTS
+        },
+        end=end,
+    )
@@ -12,6 +12,8 @@ from ophyd_async.epics.adcore import (
 from ophyd_async.fastcs.panda import HDFPanda
 from ophyd_async.plan_stubs import retrieve_settings, setup_ndattributes, store_settings
 
+from i22_bluesky.util.state_cache import DEFAULT_STATE_CACHE
+
 _REPO_ROOT = Path(__file__).parent.parent.parent.parent
 
 _SETTINGS_PROVIDER = YamlSettingsProvider(_REPO_ROOT / "pvs")
@@ -24,9 +26,13 @@ def save_device(device: Device, plan_name: str) -> MsgGenerator:
 
 
 def load_device(device: Device, plan_name: str) -> MsgGenerator:
-    yield from retrieve_settings(
+    settings = yield from retrieve_settings(
         _SETTINGS_PROVIDER, plan_name, device, only_config=isinstance(device, HDFPanda)
     )
+    # Saved settings rewrite signals that stubs set through the cache (e.g. what
+    # the PandA captures), so values confirmed before no longer hold
+    for signal in settings:
+        DEFAULT_STATE_CACHE.invalidate(signal)
 
 
 def stamp_temp_pv(linkam: Linkam3, stamped_detector: StandardDetector):
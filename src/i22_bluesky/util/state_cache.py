@@ -0,0 +1,134 @@
+import weakref
+from collections.abc import Mapping
+from numbers import Real
+from typing import Any
+
+import bluesky.plan_stubs as bps
+from bluesky.protocols import Movable
+from bluesky.utils import MsgGenerator
+from ophyd_async.core import SignalR, SignalRW
+
+
+class StateCache:
+    """Values devices were last confirmed to have reached, to skip setting them again.
+
+    A device is confirmed at a value when a move to it finishes, and stays so until
+    its readback is seen to leave the value by more than the device's tolerance,
+    e.g. because something other than these plans moved it. Only watched devices
+    are cached, so that no value outlives the means to notice it changing.
+    Devices are held weakly, so each instance of a device is cached separately.
+    """
+
+    def __init__(self) -> None:
+        self._confirmed: weakref.WeakKeyDictionary[Movable, Any] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._tolerances: weakref.WeakKeyDictionary[Movable, float] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def watch(
+        self,
+        device: Movable,
+        readback: SignalR | None = None,
+        tolerance: float = 0.0,
+    ) -> MsgGenerator:
+        """Cache a device, forgetting its value whenever its readback leaves it.
+
+        A device without a readback signal to monitor is not cached, so is always
+        moved.
+
+        Args:
+            device: Device to cache
+            readback: Signal monitored for changes, by default the device itself
+            tolerance: Furthest a value may be from the confirmed value to match it
+        """
+        yield from self.watch_all(
+            {device: (device if readback is None else readback, tolerance)}
+        )
+
+    def watch_all(
+        self, readbacks: Mapping[Movable, tuple[Movable | SignalR, float]]
+    ) -> MsgGenerator:
+        """Cache several devices as watch, subscribing to their readbacks together.
+
+        Devices already watched are left as they are.
+
+        Args:
+            readbacks: Signal monitored for changes and tolerance, by device
+        """
+        signals = {
+            device: (readback, tolerance)
+            for device, (readback, tolerance) in readbacks.items()
+            if device not in self._tolerances and isinstance(readback, SignalR)
+        }
+        if not signals:
+            return
+
+        def forget_if_changed(device_ref: weakref.ref[Movable]):
+            def callback(value):
+                device = device_ref()
+                if device is not None and not self.is_at(device, value):
+                    self._confirmed.pop(device, None)
+
+            return callback
+
+        async def subscribe():
+            for device, (readback, _) in signals.items():
+                readback.subscribe_value(forget_if_changed(weakref.ref(device)))
+
+        yield from bps.wait_for([subscribe])
+        for device, (_, tolerance) in signals.items():
+            self._tolerances[device] = tolerance
+
+    def is_at(self, device: Movable, value: Any) -> bool:
+        """Whether a device was confirmed at a value, within its tolerance."""
+        if device not in self._confirmed:
+            return False
+        confirmed = self._confirmed[device]
+        if isinstance(confirmed, Real) and isinstance(value, Real):
+            return abs(float(confirmed) - float(value)) <= self._tolerances[device]
+        return confirmed == value
+
+    def confirm(self, device: Movable, value: Any) -> None:
+        if device in self._tolerances:
+            self._confirmed[device] = value
+
+    def invalidate(self, device: Movable | None = None) -> None:
+        """Forget the value of a device, or of every device if None."""
+        if device is None:
+            self._confirmed.clear()
+        else:
+            self._confirmed.pop(device, None)
+
+
+#: Cache used by stubs unless given another, kept for the life of the process so
+#: that sets are skipped across runs as well as within them
+DEFAULT_STATE_CACHE = StateCache()
+
+
+def cached_mv(*args: Any, cache: StateCache | None = None) -> MsgGenerator:
+    """Move devices in parallel and wait, as bps.mv, skipping those already there.
+
+    Signals are watched for changes as they are set, other devices only once
+    watched with a readback (by StateCache.watch) are skipped when already at
+    their target.
+
+    Args:
+        args: Device, target value, device, target value...
+        cache: Cache of the values confirmed, by default DEFAULT_STATE_CACHE
+    """
+    cache = DEFAULT_STATE_CACHE if cache is None else cache
+    targets = list(zip(args[::2], args[1::2], strict=True))
+    yield from cache.watch_all(
+        {device: (device, 0.0) for device, _ in targets if isinstance(device, SignalRW)}
+    )
+    moves = []
+    for device, value in targets:
+        if not cache.is_at(device, value):
+            cache.invalidate(device)
+            moves += [device, value]
+    if moves:
+        yield from bps.mv(*moves)
+    for device, value in zip(moves[::2], moves[1::2], strict=True):
+        cache.confirm(device, value)
@@ -0,0 +1,108 @@
+from collections.abc import Callable, Collection, Mapping
+from typing import Any
+
+import numpy as np
+from event_model import DataKey, StreamResource
+from pydantic import BaseModel, Field
+
+from i22_bluesky.util.live_stream import LiveStreamCallback
+
+#: Name of the stream of the totals in the runs published by StatsTotals
+TOTALS_STREAM_NAME = "totals"
+
+#: Dataset the HDF writer records an NDAttribute named ``name`` in
+NDATTRIBUTE_DATASET = "/entry/instrument/NDAttributes/{name}"
+
+
+class BeamLossThreshold(BaseModel):
+    minimum: float = Field(
+        description="A frame is always flagged as beam lost when its total is below \
+            this, the only threshold until frames with beam have been seen.",
+        ge=0.0,
+    )
+    fraction: float = Field(
+        description="A frame is flagged as beam lost when its total is below this \
+            fraction of the median total of recent frames.",
+        gt=0.0,
+        lt=1.0,
+        default=0.5,
+    )
+    window: int = Field(
+        description="Number of recent frames (with beam) the median is taken over.",
+        gt=0,
+        default=100,
+    )
+
+
+class StatsTotals(LiveStreamCallback):
+    """Publish the NDStats total of every frame as it is written, flagging beam loss.
+
+    ``setup_ndstats_sum`` makes each detector's HDF writer record the total counts of
+    every frame as a ``<detector>-sum`` NDAttribute alongside the image. This follows
+    the image data of each detector and reads only the totals of newly written
+    frames from the same file, so intensity can be monitored live at a negligible
+    cost compared to the images.
+
+    Each detector has a "totals_<detector>" stream in the published run, holding
+    ``<detector>-sum`` and a ``<detector>-beam_lost`` flag per event. With more than
+    one exposure per event the exposures are summed. Recent frames with beam are
+    kept from one run to the next, so the first frames of a run are compared to
+    the last of the run before.
+
+    Args:
+        detectors: Data keys of the images of the detectors
+        publish: Called with each (name, document) of the published runs
+        beam_loss: Thresholds for flagging beam loss
+    """
+
+    def __init__(
+        self,
+        detectors: Collection[str],
+        publish: Callable[[str, Mapping[str, Any]], None],
+        beam_loss: BeamLossThreshold,
+    ) -> None:
+        super().__init__(detectors, publish)
+        self._beam_loss = beam_loss
+        self._recent: dict[str, np.ndarray] = {}
+
+    def beam_lost(self, key: str, totals: np.ndarray) -> np.ndarray:
+        """Flag totals well below those of recent frames with beam, or the minimum."""
+        recent = self._recent.get(key, np.empty(0))
+        threshold = self._beam_loss.minimum
+        if len(recent):
+            threshold = max(threshold, self._beam_loss.fraction * np.median(recent))
+        lost = totals < threshold
+        self._recent[key] = np.concatenate([recent, totals[~lost]])[
+            -self._beam_loss.window :
+        ]
+        return lost
+
+    def process(
+        self,
+        key: str,
+        resource: StreamResource,
+        data_key: DataKey,
+        start: int,
+        stop: int,
+        first_seq_num: int,
+    ) -> None:
+        exposures_per_event = data_key["shape"][0] or 1
+        sums = self.read(
+            resource,
+            NDATTRIBUTE_DATASET.format(name=f"{key}-sum"),
+            start * exposures_per_event,
+            stop * exposures_per_event,
+        )
+        totals = sums.reshape(-1, exposures_per_event).sum(axis=1)
+        self.publish_page(
+            f"{TOTALS_STREAM_NAME}_{key}",
+            data_keys={
+                f"{key}-sum": DataKey(source=key, dtype="number", shape=[]),
+                f"{key}-beam_lost": DataKey(source=key, dtype="boolean", shape=[]),
+            },
+            data={
+                f"{key}-sum": totals,
+                f"{key}-beam_lost": self.beam_lost(key, totals),
+            },
+            first_seq_num=first_seq_num,
+        )
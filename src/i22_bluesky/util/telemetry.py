@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass
+
+import bluesky.plan_stubs as bps
+from bluesky.utils import MsgGenerator
+from ophyd_async.core import StandardDetector
+
+LOGGER = logging.getLogger(__name__)
+
+
+class DetectorLagError(RuntimeError):
+    """A detector fell too far behind the others in its stream."""
+
+
+@dataclass
+class FrameRateSample:
+    """Progress of the detectors writing frames, at one collect."""
+
+    #: Time (seconds) since the detectors were kicked off
+    elapsed: float
+    #: Number of frames each detector has written, by stream then detector name
+    frames_written: dict[str, dict[str, int]]
+    #: Frames per second each detector wrote since the previous sample, by name
+    instantaneous_rate: dict[str, float]
+    #: Frames per second each detector wrote since kickoff, by name
+    average_rate: dict[str, float]
+    #: Frames between the detectors that have written most and fewest, by stream
+    lag: dict[str, int]
+
+    def summary(self) -> str:
+        return "; ".join(
+            f"{stream}: "
+            + ", ".join(
+                f"{name} {count} ({self.instantaneous_rate[name]:.1f}/s, "
+                f"mean {self.average_rate[name]:.1f}/s)"
+                for name, count in sorted(frames.items())
+            )
+            + f", lag {self.lag[stream]}"
+            for stream, frames in self.frames_written.items()
+        )
+
+
+class FrameRateTelemetry:
+    """Follow the frames detectors write while flying, to check they keep pace.
+
+    Given the number of frames each detector has written at each collect, this
+    works out how fast each is writing and how far behind the fastest in its stream
+    the slowest is, publishes it, and raises if the slowest falls too far behind,
+    so a run that is dropping frames can be stopped rather than waited out.
+    Detectors in different streams (e.g. triggered at a divided rate) are not
+    compared.
+
+    Args:
+        max_lag: Most frames a detector may be behind another in its stream, None
+            for no limit
+        publish: Called with each sample, by default logging it
+        clock: Source of the time in seconds
+    """
+
+    def __init__(
+        self,
+        max_lag: int | None = None,
+        publish: Callable[[FrameRateSample], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_lag = max_lag
+        self._publish = publish or (lambda sample: LOGGER.info(sample.summary()))
+        self._clock = clock
+        self._start = clock()
+        self._last: tuple[float, dict[str, int]] | None = None
+
+    def start(self) -> None:
+        """Start timing, as the detectors are kicked off."""
+        self._start = self._clock()
+        self._last = None
+
+    def update(
+        self, frames_written: Mapping[str, Mapping[str, int]]
+    ) -> FrameRateSample:
+        """Publish a sample of the frames written by each detector, by stream.
+
+        Raises:
+            DetectorLagError: If a detector is more than max_lag frames behind
+                another in its stream
+        """
+        now = self._clock()
+        counts = {
+            name: count
+            for frames in frames_written.values()
+            for name, count in frames.items()
+        }
+        last_time, last_counts = self._last or (self._start, {})
+        since_last = max(now - last_time, 1e-9)
+        elapsed = max(now - self._start, 1e-9)
+        sample = FrameRateSample(
+            elapsed=now - self._start,
+            frames_written={
+                stream: dict(frames) for stream, frames in frames_written.items()
+            },
+            instantaneous_rate={
+                name: (count - last_counts.get(name, 0)) / since_last
+                for name, count in counts.items()
+            },
+            average_rate={name: count / elapsed for name, count in counts.items()},
+            lag={
+                stream: max(frames.values()) - min(frames.values()) if frames else 0
+                for stream, frames in frames_written.items()
+            },
+        )
+        self._last = (now, counts)
+        self._publish(sample)
+        if self._max_lag is not None and any(
+            lag > self._max_lag for lag in sample.lag.values()
+        ):
+            raise DetectorLagError(
+                f"Detectors fell more than {self._max_lag} frames behind others "
+                f"in their stream: {sample.summary()}"
+            )
+        return sample
+
+
+def read_frames_written(
+    detectors: Collection[StandardDetector],
+) -> MsgGenerator[dict[str, int]]:
+    """Number of frames each detector's writer wrote in its last acquisition.
+
+    The detectors are read together, waiting once for all of them, as this is done
+    on every collect.
+    """
+    ordered = list(detectors)
+
+    async def frames_written() -> list[int]:
+        return await asyncio.gather(*(det.get_index() for det in ordered))
+
+    (future,) = yield from bps.wait_for([frames_written])
+    return dict(zip((det.name for det in ordered), future.result(), strict=True))
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+
+import h5py
+import numpy as np
+from numpy.typing import ArrayLike
+from ophyd_async.core import Array1D, StandardReadable, soft_signal_r_and_setter
+
+from i22_bluesky.util.panda_capture import CapturedField, CaptureMode
+from i22_bluesky.util.trigger_analysis import GATE_TIME_KEY
+
+#: Data key of the PandA dataset capturing the time of the stop-flow edge on BITA,
+#: latched by the PandA's saved wiring so every capture after the stop holds it
+STOP_TIME_KEY = "stop_time"
+
+#: PandA field latching the time of the stop. In the PandA's saved settings
+#: COUNTER1 counts the microsecond clock, scaled to seconds, from the start of
+#: capture while BITA is low, so holds the time of its rising edge from then on
+STOP_TIME_FIELD = "COUNTER1.OUT"
+
+#: How the time of the stop is captured, into the dataset it is read from
+STOP_TIME_CAPTURE = CapturedField(
+    field=STOP_TIME_FIELD, mode=CaptureMode.VALUE, dataset=STOP_TIME_KEY
+)
+
+
+class TimeZeroSource(StrEnum):
+    """Where the time of the stop was taken from."""
+
+    #: The time of the BITA edge, timestamped by the PandA
+    BITA_EDGE = "bita_edge"
+    #: The first post-stop gate, which starts on the BITA edge when the sequencer
+    #: is already waiting for it, but later if the stop came during pre-stop frames
+    FIRST_POST_STOP_GATE = "first_post_stop_gate"
+
+
+@dataclass
+class TimeZero:
+    """The time of the stop, and of every frame relative to it."""
+
+    #: Time (seconds) of the stop, in the PandA's clock
+    time_zero: float
+    #: Time (seconds) of the start of each frame less the time of the stop
+    time_since_stop: np.ndarray
+    source: TimeZeroSource
+
+
+def time_since_stop(
+    gate_times: ArrayLike,
+    pre_stop_frames: int,
+    stop_times: ArrayLike | None = None,
+) -> TimeZero:
+    """Time every frame from the stop, for fitting kinetics directly.
+
+    Args:
+        gate_times: Time of the start of each frame, in the PandA's clock
+        pre_stop_frames: Number of frames taken before waiting for the stop
+        stop_times: Time of the stop as captured with each frame, valid from the
+            first capture after the stop, if the PandA timestamps the BITA edge.
+            Otherwise the stop is taken to be the first post-stop gate.
+    """
+    gate_times = np.asarray(gate_times, dtype=np.float64)
+    if stop_times is not None and np.size(stop_times):
+        zero = float(np.asarray(stop_times, dtype=np.float64)[-1])
+        if np.isfinite(zero):
+            return TimeZero(zero, gate_times - zero, TimeZeroSource.BITA_EDGE)
+    if pre_stop_frames >= len(gate_times):
+        raise ValueError(
+            f"No post-stop gates among {len(gate_times)} captured, after "
+            f"{pre_stop_frames} pre-stop frames"
+        )
+    zero = float(gate_times[pre_stop_frames])
+    return TimeZero(zero, gate_times - zero, TimeZeroSource.FIRST_POST_STOP_GATE)
+
+
+def read_time_zero(path: Path, pre_stop_frames: int) -> TimeZero:
+    """Time every frame from the stop, from the file the PandA is writing."""
+    # Opened as a reader alongside the PandA, which may still have it open
+    with h5py.File(path, "r", swmr=True) as file:
+        gate_times = file["/" + GATE_TIME_KEY][()]
+        stop_times = file.get("/" + STOP_TIME_KEY)
+        return time_since_stop(
+            gate_times,
+            pre_stop_frames,
+            None if stop_times is None else stop_times[()],
+        )
+
+
+class StopTiming(StandardReadable):
+    """Readable holding the time of a stop, to emit it in a stream of the run."""
+
+    def __init__(self, name: str = "") -> None:
+        with self.add_children_as_readables():
+            self.time_zero, self._set_time_zero = soft_signal_r_and_setter(float)
+            self.time_since_stop, self._set_time_since_stop = soft_signal_r_and_setter(
+                Array1D[np.float64], units="s"
+            )
+            self.source, self._set_source = soft_signal_r_and_setter(str)
+        super().__init__(name)
+
+    def update(self, time_zero: TimeZero) -> None:
+        self._set_time_zero(time_zero.time_zero)
+        self._set_time_since_stop(time_zero.time_since_stop)
+        self._set_source(time_zero.source.value)
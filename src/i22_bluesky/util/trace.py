@@ -0,0 +1,221 @@
+import functools
+import json
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, ParamSpec
+
+from bluesky.callbacks import CallbackBase
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg, MsgGenerator
+from event_model import RunStart, RunStop
+
+P = ParamSpec("P")
+
+#: Commands timed until the next message starts when not in a group
+TIMED_COMMANDS = {"collect", "wait_for", "sleep"}
+
+#: Thread ids of the tracks of the stubs' spans and the timed messages
+STUB_TRACK, MESSAGE_TRACK = 1, 2
+
+#: Trace being recorded, None when tracing is disabled
+_ACTIVE: "ChromeTrace | None" = None
+
+#: Called by a RunEngine with each message before processing it
+MsgHook = Callable[[Msg], None]
+
+
+def set_msg_hook(RE: RunEngine, hook: MsgHook | None) -> None:
+    """Set the msg_hook of a RunEngine, which bluesky types as only ever None."""
+    RE.msg_hook = hook  # type: ignore[assignment]
+
+
+class ChromeTrace(CallbackBase):
+    """Spans of plan stubs and of the operations they wait for, per run.
+
+    Stubs decorated with traced record a span from when they start until they
+    finish, nested within those that called them. Every message sent with a group
+    (sets, prepares, kickoffs, completes...) starts a span that lasts until the
+    wait for its group finishes, so operations running in parallel are shown
+    overlapping on the track of their group, and the wait itself is a span on the
+    same track. A few other messages (e.g. collects) are spans until the next
+    message, which the RunEngine only starts once they finish.
+
+    At the end of each run the spans so far are written as Chrome trace event JSON,
+    named after the uid of the run, which can be opened in Perfetto or
+    chrome://tracing.
+
+    Args:
+        directory: Directory to write a trace of each run to
+        clock: Source of the time in seconds
+    """
+
+    def __init__(
+        self, directory: Path, clock: Callable[[], float] = time.perf_counter
+    ) -> None:
+        super().__init__()
+        self._directory = directory
+        self._clock = clock
+        self._origin = clock()
+        self._events: list[dict[str, Any]] = []
+        self._start: RunStart | None = None
+        # Messages timed until the next message, groups with spans yet to end
+        self._timing: list[tuple[str, float]] = []
+        self._groups: dict[str, list[str]] = {}
+        self._waiting: list[str] = []
+        self._previous_hook: MsgHook | None = None
+        self._subscription: int | None = None
+
+    def install(self, RE: RunEngine) -> None:
+        """Trace the messages and runs of a RunEngine, keeping its msg_hook."""
+        self._previous_hook = RE.msg_hook
+        set_msg_hook(RE, self.msg_hook)
+        self._subscription = RE.subscribe(self)
+
+    def uninstall(self, RE: RunEngine) -> None:
+        set_msg_hook(RE, self._previous_hook)
+        if self._subscription is not None:
+            RE.unsubscribe(self._subscription)
+        self._subscription = None
+
+    def _now(self) -> float:
+        # Microseconds since the trace started
+        return (self._clock() - self._origin) * 1e6
+
+    def begin(self, name: str) -> None:
+        self._events.append(
+            {"name": name, "ph": "B", "ts": self._now(), "pid": 1, "tid": STUB_TRACK}
+        )
+
+    def end(self, name: str) -> None:
+        self._events.append(
+            {"name": name, "ph": "E", "ts": self._now(), "pid": 1, "tid": STUB_TRACK}
+        )
+
+    def _async(self, phase: str, name: str, group: str, ts: float) -> None:
+        self._events.append(
+            {
+                "name": name,
+                "cat": "group",
+                "ph": phase,
+                "id": group,
+                "ts": ts,
+                "pid": 1,
+                "tid": MESSAGE_TRACK,
+            }
+        )
+
+    def msg_hook(self, msg: Msg) -> None:
+        """Start and end the spans of messages as the RunEngine processes them."""
+        now = self._now()
+        for name, started in self._timing:
+            self._events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": started,
+                    "dur": now - started,
+                    "pid": 1,
+                    "tid": MESSAGE_TRACK,
+                }
+            )
+        self._timing = []
+        for group in self._waiting:
+            for name in self._groups.pop(group, []):
+                self._async("e", name, group, now)
+        self._waiting = []
+
+        group = msg.kwargs.get("group")
+        name = f"{msg.command} {getattr(msg.obj, 'name', '')}".strip()
+        if msg.command == "wait" and group is not None:
+            name = f"wait {group}"
+            self._groups.setdefault(group, []).append(name)
+            self._async("b", name, group, now)
+            self._waiting.append(group)
+        elif group is not None:
+            self._groups.setdefault(group, []).append(name)
+            self._async("b", name, group, now)
+        elif msg.command in TIMED_COMMANDS:
+            self._timing.append((name, now))
+        if self._previous_hook is not None:
+            self._previous_hook(msg)
+
+    def start(self, doc: RunStart):
+        self._start = doc
+        return doc
+
+    def stop(self, doc: RunStop):
+        if self._start is not None:
+            self.write(self._directory / f"{self._start['uid']}.json")
+        self._start = None
+        return doc
+
+    def write(self, path: Path) -> None:
+        """Write the spans recorded since they were last written."""
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in ((STUB_TRACK, "plan stubs"), (MESSAGE_TRACK, "messages"))
+        ]
+        path.write_text(
+            json.dumps(
+                {
+                    "traceEvents": metadata + self._events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"run_uid": self._start["uid"] if self._start else ""},
+                }
+            )
+        )
+        self._events = []
+
+
+def start_tracing(RE: RunEngine, directory: Path) -> ChromeTrace:
+    """Record spans of the plans the RunEngine runs, writing a trace for each run.
+
+    The RunEngine's msg_hook is kept, and called after tracing each message.
+    """
+    global _ACTIVE
+    stop_tracing(RE)
+    _ACTIVE = ChromeTrace(directory)
+    _ACTIVE.install(RE)
+    return _ACTIVE
+
+
+def stop_tracing(RE: RunEngine) -> None:
+    """Stop recording spans, restoring the RunEngine's msg_hook."""
+    global _ACTIVE
+    if _ACTIVE is None:
+        return
+    _ACTIVE.uninstall(RE)
+    _ACTIVE = None
+
+
+def traced(stub: Callable[P, MsgGenerator]) -> Callable[P, MsgGenerator]:
+    """Record a span of a plan stub from when it starts until it finishes.
+
+    While tracing is disabled the stub's plan is returned as it is, so costs no
+    more than checking whether it is enabled.
+    """
+
+    @functools.wraps(stub)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> MsgGenerator:
+        plan = stub(*args, **kwargs)
+        if _ACTIVE is None:
+            return plan
+        module = stub.__module__.rsplit(".", 1)[-1]
+        return _span(_ACTIVE, f"{module}.{stub.__qualname__}", plan)
+
+    return wrapper
+
+
+def _span(trace: ChromeTrace, name: str, plan: MsgGenerator) -> MsgGenerator:
+    trace.begin(name)
+    try:
+        return (yield from plan)
+    finally:
+        trace.end(name)
@@ -0,0 +1,244 @@
+import logging
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast
+from urllib.parse import urlparse
+
+import h5py
+import numpy as np
+from bluesky.callbacks import CallbackBase
+from event_model import RunStart, RunStop, StreamResource
+
+from i22_bluesky.util.seq_emulator import SeqTimeline
+
+LOGGER = logging.getLogger(__name__)
+
+#: Data key of the PandA dataset capturing the time of each detector gate
+GATE_TIME_KEY = "time"
+
+#: Number of intended gates tried as the first captured, when aligning a capture
+ALIGNMENT_CANDIDATES = 5
+
+#: Dataset the HDF writer of an areaDetector writes frames to
+DETECTOR_DATASET = "/entry/data/data"
+
+
+@dataclass
+class TriggerReport:
+    """Comparison of the gates a PandA captured with those it was meant to send."""
+
+    #: Number of gates in the intended schedule
+    num_expected: int
+    #: Number of gates captured
+    num_captured: int
+    #: Indices of the intended gates with no captured gate near them
+    missed: np.ndarray
+    #: Indices of the captured gates not near any intended gate (or a repeat of one)
+    unexpected: np.ndarray
+    #: Time (seconds) of each matched captured gate less its intended time
+    jitter: np.ndarray
+    #: Time (seconds) of the start of the schedule in the capture's clock
+    offset: float
+    #: Number of frames each detector wrote, by name
+    frame_counts: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def frame_count_mismatches(self) -> dict[str, int]:
+        """Frames each detector wrote more (or fewer) than gates were intended."""
+        return {
+            name: count - self.num_expected
+            for name, count in self.frame_counts.items()
+            if count != self.num_expected
+        }
+
+    def summary(self) -> str:
+        jitter = np.abs(self.jitter) if len(self.jitter) else np.zeros(1)
+        lines = [
+            f"{self.num_captured}/{self.num_expected} gates captured, "
+            f"{len(self.missed)} missed, {len(self.unexpected)} unexpected",
+            f"Jitter: rms {np.sqrt(np.mean(jitter**2)) * 1e6:.1f} µs, "
+            f"max {jitter.max() * 1e6:.1f} µs",
+        ]
+        lines += [
+            f"{name} wrote {self.num_expected + difference} frames, "
+            f"expected {self.num_expected}"
+            for name, difference in self.frame_count_mismatches.items()
+        ]
+        return "\n".join(lines)
+
+
+def analyse_triggers(
+    gate_times: np.ndarray,
+    expected: np.ndarray,
+    frame_counts: Mapping[str, int] | None = None,
+    tolerance: float | None = None,
+) -> TriggerReport:
+    """Match captured gates to those intended, to find jitter and missed gates.
+
+    The capture's clock starts at an unknown time relative to the schedule, so the
+    offset between them is found first, by aligning the first captured gate with
+    each of the first few intended gates and keeping the alignment that matches
+    the most gates. Each captured gate is then matched with the nearest intended
+    gate, all with numpy so a million gates take well under a second.
+
+    Args:
+        gate_times: Time of each captured gate, in the capture's clock
+        expected: Intended time of each gate, ascending, e.g. the rising edges of
+            the detector output of an emulated SeqTimeline
+        frame_counts: Number of frames each detector wrote, by name
+        tolerance: Furthest (seconds) a captured gate can be from its intended time
+            to match it, by default half the shortest interval between gates
+
+    Returns:
+        The comparison
+    """
+    gate_times = np.sort(np.asarray(gate_times, dtype=np.float64))
+    expected = np.asarray(expected, dtype=np.float64)
+    if tolerance is None:
+        intervals = np.diff(expected)
+        tolerance = intervals.min() / 2 if len(intervals) else np.inf
+    frame_counts = dict(frame_counts or {})
+    offset = 0.0
+    if len(gate_times) == 0 or len(expected) == 0:
+        return TriggerReport(
+            num_expected=len(expected),
+            num_captured=len(gate_times),
+            missed=np.arange(len(expected)),
+            unexpected=np.arange(len(gate_times)),
+            jitter=np.empty(0),
+            offset=offset,
+            frame_counts=frame_counts,
+        )
+
+    # Align the first captured gate with whichever of the first few intended gates
+    # gives the most matches, in case the first were missed
+    best = 0
+    for candidate in gate_times[0] - expected[:ALIGNMENT_CANDIDATES]:
+        _, error = _nearest(expected, gate_times - candidate)
+        matches = np.abs(error) <= tolerance
+        if matches.sum() > best:
+            best = matches.sum()
+            offset = candidate + float(np.median(error[matches]))
+    nearest, error = _nearest(expected, gate_times - offset)
+    matched = np.abs(error) <= tolerance
+    # Only the first captured gate matching an intended gate counts
+    matched[1:] &= nearest[1:] != nearest[:-1]
+    missed = np.ones(len(expected), dtype=np.bool_)
+    missed[nearest[matched]] = False
+    return TriggerReport(
+        num_expected=len(expected),
+        num_captured=len(gate_times),
+        missed=np.flatnonzero(missed),
+        unexpected=np.flatnonzero(~matched),
+        jitter=error[matched],
+        offset=offset,
+        frame_counts=frame_counts,
+    )
+
+
+def _nearest(expected: np.ndarray, times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Index of the nearest expected time to each time, and the time less it
+    after = np.clip(np.searchsorted(expected, times), 1, len(expected) - 1)
+    before = after - 1
+    if len(expected) == 1:
+        after = before = np.zeros_like(after)
+    nearest = np.where(
+        times - expected[before] <= expected[after] - times, before, after
+    )
+    return nearest, times - expected[nearest]
+
+
+def open_written(path: Path) -> h5py.File:
+    """Open a file written during a run, though its writer may still have it open.
+
+    The PandA and detectors write their files in SWMR mode and only close them when
+    unstaged, after the run has stopped, so they are opened as SWMR readers.
+    """
+    return h5py.File(path, "r", swmr=True)
+
+
+def read_gate_times(path: Path, dataset: str = "/" + GATE_TIME_KEY) -> np.ndarray:
+    """Read the time of every gate from a PandA's capture file."""
+    with open_written(path) as file:
+        return file[dataset][()]
+
+
+def read_frame_count(path: Path, dataset: str = DETECTOR_DATASET) -> int:
+    """Number of frames written to a detector's file, without reading them."""
+    with open_written(path) as file:
+        return file[dataset].shape[0]
+
+
+class TriggerAnalysis(CallbackBase):
+    """Compare the gates the PandA captured in each run with those intended.
+
+    Subscribed to the RunEngine, this notes the files written during a run, then
+    when the run stops reads the gate times from the PandA's file and the number
+    of frames in each detector's file, and reports how they compare with the
+    intended gates. Only the gate times and dataset shapes are read, so the report
+    is ready within a few seconds of the end of the run even for a million frames.
+
+    Args:
+        expected: Intended times of the gates of a run, given its start document,
+            or None to skip analysing the run
+        report: Called with the report on each run analysed
+        gate_time_key: Data key of the PandA dataset capturing the gate times
+    """
+
+    def __init__(
+        self,
+        expected: Callable[[RunStart], SeqTimeline | np.ndarray | None],
+        report: Callable[[TriggerReport], None] | None = None,
+        gate_time_key: str = GATE_TIME_KEY,
+    ) -> None:
+        super().__init__()
+        self._expected = expected
+        self._report = report or (lambda report: LOGGER.info(report.summary()))
+        self._gate_time_key = gate_time_key
+        self._start: RunStart | None = None
+        self._resources: dict[str, StreamResource] = {}
+
+    def start(self, doc: RunStart):
+        self._start = doc
+        self._resources = {}
+        return doc
+
+    def stream_resource(self, doc: StreamResource):
+        self._resources[doc["data_key"]] = doc
+        return doc
+
+    def stop(self, doc: RunStop):
+        gates = self._resources.get(self._gate_time_key)
+        expected = self._expected(self._start) if self._start else None
+        if gates is not None and expected is not None:
+            if isinstance(expected, SeqTimeline):
+                expected, _ = expected.gates("b")
+            detectors = set(
+                cast(Iterable[str], self._start.get("detectors", ()))
+                if self._start
+                else ()
+            )
+            self._report(
+                analyse_triggers(
+                    read_gate_times(
+                        resource_path(gates), gates["parameters"]["dataset"]
+                    ),
+                    expected,
+                    frame_counts={
+                        key: read_frame_count(
+                            resource_path(resource), resource["parameters"]["dataset"]
+                        )
+                        for key, resource in self._resources.items()
+                        if key in detectors
+                    },
+                )
+            )
+        self._start = None
+        self._resources = {}
+        return doc
+
+
+def resource_path(resource: StreamResource) -> Path:
+    """Local path of the file a stream resource points to."""
+    return Path(urlparse(resource["uri"]).path)
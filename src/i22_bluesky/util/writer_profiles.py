@@ -0,0 +1,47 @@
+from enum import Enum
+
+from bluesky.utils import MsgGenerator
+from ophyd_async.core import StandardDetector
+from ophyd_async.epics.adcore import ADCompression, NDFileHDFIO
+
+from i22_bluesky.util.state_cache import cached_mv
+
+
+class WriterProfile(str, Enum):
+    """Compression applied by the HDF writers of area detectors during a plan.
+
+    Chunking is always one frame per chunk, as ophyd-async turns on automatic chunk
+    sizing when opening the writer, so only the compression differs between them.
+    """
+
+    #: Lightweight compression that keeps up with the fastest frame rates
+    FAST = "fast"
+    #: Higher compression for slower acquisitions, trading CPU for file size
+    ARCHIVE = "archive"
+    #: No compression at all
+    NONE = "none"
+
+
+WRITER_COMPRESSION: dict[WriterProfile, ADCompression] = {
+    WriterProfile.FAST: ADCompression.BSLZ4,
+    WriterProfile.ARCHIVE: ADCompression.ZLIB,
+    WriterProfile.NONE: ADCompression.NONE,
+}
+
+
+def apply_writer_profile(
+    detectors: set[StandardDetector], profile: WriterProfile | None
+) -> MsgGenerator:
+    """Set the compression of the HDF writer of each area detector for a profile.
+
+    Detectors without an areaDetector HDF writer (e.g. the PandA) are left alone,
+    as is every detector if the profile is None.
+    """
+    if profile is None:
+        return
+    moves = []
+    for detector in detectors:
+        fileio = getattr(detector, "fileio", None)
+        if isinstance(fileio, NDFileHDFIO):
+            moves += [fileio.compression, WRITER_COMPRESSION[profile]]
+    yield from cached_mv(*moves)
@@ -1,5 +1,9 @@
 import asyncio
 import os
+import subprocess
+import sys
+from collections.abc import Callable, Iterator
+from pathlib import Path
 from typing import Any
 
 import pytest
@@ -41,3 +45,41 @@ def RE(request):
 
     request.addfinalizer(clean_event_loop)
     return RE
+
+
+# Opens each file given as a SWMR writer, as the PandA and detectors do during a run,
+# holding them open until told to stop
+_SWMR_WRITER = """
+import sys
+import h5py
+files = [h5py.File(path, "a", libver="latest") for path in sys.argv[1:]]
+for file in files:
+    file.swmr_mode = True
+print("open", flush=True)
+sys.stdin.readline()
+"""
+
+
+@pytest.fixture
+def hold_open_for_write() -> Iterator[Callable[..., None]]:
+    """Hold files (written with libver="latest") open in another process's writer.
+
+    HDF5 lets a process reopen files it has open itself, so the writer must be in
+    another process for readers to see what they would on the beamline.
+    """
+    writers: list[subprocess.Popen[str]] = []
+
+    def hold(*paths: Path) -> None:
+        writer = subprocess.Popen(
+            [sys.executable, "-c", _SWMR_WRITER, *map(str, paths)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        writers.append(writer)
+        assert writer.stdout is not None
+        assert writer.stdout.readline().strip() == "open"
+
+    yield hold
+    for writer in writers:
+        writer.communicate("\n", timeout=10)
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.run_engine import RunEngine
+from dodal.common.beamlines import beamline_utils
+from dodal.devices.linkam3 import Linkam3
+from ophyd_async.core import (
+    DeviceVector,
+    StaticFilenameProvider,
+    StaticPathProvider,
+    YamlSettingsProvider,
+    init_devices,
+)
+from ophyd_async.epics.adpilatus import PilatusDetector
+from ophyd_async.fastcs.panda import HDFPanda, SeqBlock
+from ophyd_async.testing import callback_on_mock_put, set_mock_value
+
+import i22_bluesky.util.settings
+
+
+class MockBeamline:
+    def __init__(self, path: Path):
+        self.path_provider = StaticPathProvider(StaticFilenameProvider("data"), path)
+        # Devices are only named and connected from local variables
+        with init_devices(mock=True):
+            saxs = PilatusDetector("SAXS:", self.path_provider)
+            panda = HDFPanda("PANDA:", self.path_provider)
+            linkam = Linkam3("LINKAM:")
+        self.saxs, self.panda, self.linkam = saxs, panda, linkam
+        # Blocks are only discovered from a real PandA
+        self.panda.seq = DeviceVector({1: SeqBlock(), 2: SeqBlock()})
+        callback_on_mock_put(
+            self.linkam.set_point,
+            lambda value, wait: set_mock_value(self.linkam.temp, value),
+        )
+
+
+def mock_beamline(
+    RE: RunEngine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> MockBeamline:
+    """Mock devices of the beamline, with no saved settings to load."""
+    beamline = MockBeamline(tmp_path)
+    RE(bps.wait_for([lambda: beamline.panda.connect(mock=True)]))
+    # Not updated from the visit service, whichever beamline module set it last
+    monkeypatch.setattr(
+        beamline_utils, "PATH_PROVIDER", beamline.path_provider, raising=False
+    )
+    # No saved settings to load
+    monkeypatch.setattr(
+        i22_bluesky.util.settings,
+        "_SETTINGS_PROVIDER",
+        YamlSettingsProvider(tmp_path),
+    )
+    for plan_name in ("stopflow", "pressure_jump", "linkam_plan"):
+        (tmp_path / f"{plan_name}.yaml").write_text("{}")
+    return beamline
@@ -1,10 +1,12 @@
 from pathlib import Path
 from unittest.mock import ANY, Mock
 
+import bluesky.preprocessors as bpp
 import numpy as np
 import pytest
 from bluesky.run_engine import RunEngine
 from bluesky.utils import Msg
+from mock_beamline import mock_beamline
 from ophyd_async.core import (
     PathProvider,
     StandardDetector,
@@ -16,8 +18,18 @@ from ophyd_async.core import (
 from ophyd_async.epics.adpilatus import PilatusDetector
 from pydantic import ValidationError
 
+from i22_bluesky.plans.linkam import linkam_plan
 from i22_bluesky.stubs import LinkamPathSegment, LinkamTrajectory
-from i22_bluesky.stubs.linkam import capture_linkam_segment
+from i22_bluesky.stubs.linkam import (
+    LINKAM_POINT_DTYPE,
+    capture_linkam_segment,
+    capture_linkam_segments,
+    coalesce_flown_segments,
+    flown_points_seq_table,
+)
+from i22_bluesky.util.checkpoint import LinkamCheckpoint
+from i22_bluesky.util.seq_emulator import emulate_seq_table
+from i22_bluesky.util.writer_profiles import WriterProfile
 
 
 def test_trajectory_validation_enforced():
@@ -92,6 +104,57 @@ def stepped_trajectory():
     )
 
 
+def test_expand_stepped_trajectory(stepped_trajectory: LinkamTrajectory):
+    points = stepped_trajectory.expand()
+    assert points.dtype == LINKAM_POINT_DTYPE
+    assert points["segment"].tolist() == [0] * 11 + [1] * 11
+    np.testing.assert_allclose(
+        points["temperature"],
+        np.concatenate([np.linspace(0, 50, 11), np.linspace(50, 0, 11)]),
+    )
+    # Segments are flown by default, points passed every 30 s at 10 degrees/minute
+    assert points["flown"].all()
+    np.testing.assert_allclose(points["start_time"][:3], [0.0, 30.0, 60.0])
+    np.testing.assert_allclose(points["start_time"][11:13], [300.0, 330.0])
+    assert stepped_trajectory.estimated_duration() == pytest.approx(600.0)
+
+
+def test_expand_step_stops_at_last_whole_step():
+    trajectory = LinkamTrajectory(
+        start=20.0,
+        path=[
+            LinkamPathSegment(stop=31.0, rate=60.0, step=5.0, flown=False),
+            LinkamPathSegment(stop=11.0, rate=30.0, num=3, num_frames=4),
+        ],
+        default_exposure=0.5,
+        default_num_frames=2,
+    )
+    points = trajectory.expand()
+    np.testing.assert_allclose(points["temperature"], [20, 25, 30, 31, 21, 11])
+    assert points["num_frames"].tolist() == [2, 2, 2, 4, 4, 4]
+    assert points["flown"].tolist() == [False] * 3 + [True] * 3
+    # Flown points are captured as the ramp passes them
+    stepped_duration = 11.0 + 3 * 2 * 0.5
+    np.testing.assert_allclose(
+        points["start_time"][3:], stepped_duration + np.array([0.0, 20.0, 40.0])
+    )
+
+
+def test_expand_is_vectorised_for_long_trajectories():
+    trajectory = LinkamTrajectory(
+        start=0.0,
+        path=[
+            LinkamPathSegment(stop=100.0 * (i % 2 == 0), rate=5.0, num=2000)
+            for i in range(20)
+        ],
+        default_exposure=0.1,
+        default_num_frames=1,
+    )
+    points = trajectory.expand()
+    assert len(points) == 40_000
+    assert (np.diff(points["start_time"]) >= 0).all()
+
+
 @pytest.fixture
 def name_provider(name="foo"):
     return StaticFilenameProvider(name)
@@ -181,3 +244,149 @@ def test_flown_behaviour_sequence_table(
             same_trigger_info = trigger_info
         else:
             assert trigger_info == same_trigger_info
+
+
+@pytest.fixture
+def triangle_trajectory() -> LinkamTrajectory:
+    return LinkamTrajectory(
+        start=20.0,
+        path=[
+            LinkamPathSegment(stop=20.0 + 10.0 * (i % 2 == 0), rate=60.0, num=6)
+            for i in range(6)
+        ],
+        default_exposure=0.1,
+        default_num_frames=2,
+    )
+
+
+def test_coalesce_triangle_into_one_acquisition(triangle_trajectory: LinkamTrajectory):
+    points = triangle_trajectory.expand()
+    acquisitions = coalesce_flown_segments(points)
+    assert len(acquisitions) == 1
+    np.testing.assert_array_equal(acquisitions[0], points)
+
+
+def test_coalesce_splits_incompatible_segments():
+    trajectory = LinkamTrajectory(
+        start=20.0,
+        path=[
+            LinkamPathSegment(stop=30.0, rate=60.0, num=3),
+            LinkamPathSegment(stop=40.0, rate=30.0, num=3),
+            LinkamPathSegment(stop=50.0, rate=30.0, num=3, exposure=0.2),
+            LinkamPathSegment(stop=60.0, rate=30.0, num=3, flown=False),
+            LinkamPathSegment(stop=70.0, rate=30.0, num=3),
+            LinkamPathSegment(stop=80.0, rate=30.0, num=3),
+            LinkamPathSegment(stop=90.0, rate=30.0, num=3),
+        ],
+        default_exposure=0.1,
+        default_num_frames=1,
+    )
+    acquisitions = coalesce_flown_segments(trajectory.expand(), max_points=6)
+    assert [np.unique(a["segment"]).tolist() for a in acquisitions] == [
+        [0, 1],
+        [2],
+        [3],
+        [4, 5],
+        [6],
+    ]
+
+
+def test_flown_points_seq_table_times_each_point():
+    trajectory = LinkamTrajectory(
+        start=0.0,
+        path=[
+            LinkamPathSegment(stop=20.0, rate=60.0, num=3),
+            # Points 0.05 s apart, too close to be captured on time
+            LinkamPathSegment(stop=20.1, rate=60.0, num=3),
+        ],
+        default_exposure=0.1,
+        default_num_frames=2,
+    )
+    points = trajectory.expand()
+    table = flown_points_seq_table(points, deadtime=0.01, shutter_time=0.04)
+    assert len(table) == 2 * 6 + 1
+    # Frames rows
+    assert table.repeats[1:-1:2].tolist() == [2] * 6
+    assert table.time1[1:-1:2].tolist() == [100_000] * 6
+    assert table.outb1.tolist() == [False, True] * 6 + [False]
+    # Wait rows: 10 s between points, less frames and shutter opening
+    assert table.time1[0:-1:2].tolist() == [0, 9_740_000, 9_740_000, 0, 0, 0]
+    # Shutter left open when it could not close and reopen in time
+    assert table.outa1[0:-1:2].tolist() == [True, False, False, True, True, True]
+    assert not table.outa2[-1]
+
+    # Frames of each point start at its nominal time, or as soon as possible after
+    timeline = emulate_seq_table(table)
+    rising, _ = timeline.gates("b")
+    point_starts = rising[::2] - 0.04
+    nominal = points["start_time"] - points["start_time"][0]
+    np.testing.assert_allclose(point_starts[:3], nominal[:3])
+    np.testing.assert_allclose(np.diff(point_starts[2:]), 2 * 0.11 + 0.04)
+
+
+def test_coalesced_segments_ramp_through_each_segment_end(
+    triangle_trajectory: LinkamTrajectory,
+    mock_saxs: PilatusDetector,
+):
+    linkam = Mock()
+    flyer = Mock()
+    points = triangle_trajectory.expand()
+    plan = capture_linkam_segments(linkam, flyer, [mock_saxs], points)
+    msgs = []
+    reply = None
+    while True:
+        try:
+            msg = plan.send(reply)
+        except StopIteration:
+            break
+        msgs.append(msg)
+        reply = Mock(done=True) if msg.command == "set" else None
+
+    assert len([msg for msg in msgs if msg.command == "prepare"]) == 2
+    assert len([msg for msg in msgs if msg.command == "kickoff"]) == 2
+    linkam_sets = [msg.args[0] for msg in msgs if msg.obj is linkam]
+    assert linkam_sets == [20.0, 30.0, 20.0, 30.0, 20.0, 30.0, 20.0]
+    trigger_info = next(msg.args[0] for msg in msgs if msg.obj is mock_saxs)
+    assert trigger_info.number_of_events == 6 * 6 * 2
+
+
+def test_failed_run_is_recorded_in_checkpoint(
+    RE: RunEngine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    beamline = mock_beamline(RE, tmp_path, monkeypatch)
+    checkpoint = tmp_path / "checkpoint.json"
+    starts: list[str] = []
+    RE.subscribe(lambda name, doc: starts.append(doc["uid"]), "start")
+
+    def beam_dump():
+        raise RuntimeError("Beam dump")
+        yield
+
+    def fail_on_prepare(msg: Msg):
+        return (beam_dump(), None) if msg.command == "prepare" else (None, None)
+
+    plan = linkam_plan(
+        LinkamTrajectory(
+            start=20.0,
+            path=[LinkamPathSegment(stop=30.0, rate=10.0, num=3, flown=False)],
+            default_num_frames=2,
+            default_exposure=0.1,
+        ),
+        linkam=beamline.linkam,
+        panda=beamline.panda,
+        stamped_detector=beamline.saxs,
+        detectors={beamline.saxs},
+        checkpoint=checkpoint,
+        writer_profile=WriterProfile.FAST,
+        tetramm_readings_per_frame=4,
+    )
+    with pytest.raises(RuntimeError, match="Beam dump"):
+        RE(bpp.plan_mutator(plan, fail_on_prepare))
+
+    progress = LinkamCheckpoint.load(checkpoint)
+    assert progress.run_uids == starts
+    assert len(starts) == 1
+    assert progress.completed_points == 0
+    # Kept to resume the trajectory the same way
+    assert progress.plan_args["writer_profile"] == "fast"
+    assert progress.plan_args["tetramm_readings_per_frame"] == 4
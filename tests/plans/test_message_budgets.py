@@ -0,0 +1,128 @@
+"""Message counts of each plan, checked against budgets to catch regressions.
+
+Each plan is run against mock devices, recording every message it sends, and the
+messages are counted by command in each phase of the plan: "setup" before the run
+is opened, "run" while it is open and "teardown" after it is closed. A test fails
+if any count is over its budget in message_budgets.json.
+
+To record new budgets after an intentional change, run the tests with
+UPDATE_MESSAGE_BUDGETS=1 and review the diff of message_budgets.json.
+"""
+
+import json
+import os
+from collections import Counter
+from collections.abc import Callable
+from pathlib import Path
+from unittest.mock import Mock
+
+import bluesky.preprocessors as bpp
+import pytest
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg, MsgGenerator
+from mock_beamline import MockBeamline, mock_beamline
+
+from i22_bluesky.plans import linkam_plan, pressure_jump, stopflow
+from i22_bluesky.stubs import LinkamPathSegment, LinkamTrajectory
+
+BUDGETS_PATH = Path(__file__).parent / "message_budgets.json"
+
+#: Commands that need real hardware to complete, recorded but not sent
+HARDWARE_COMMANDS = {"prepare", "kickoff", "complete", "collect", "declare_stream"}
+
+
+@pytest.fixture
+def beamline(
+    RE: RunEngine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> MockBeamline:
+    return mock_beamline(RE, tmp_path, monkeypatch)
+
+
+def record_messages(RE: RunEngine, plan: MsgGenerator) -> dict[str, dict[str, int]]:
+    """Run a plan, counting the messages it sends by command in each phase."""
+    counts: dict[str, Counter[str]] = {
+        phase: Counter() for phase in ("setup", "run", "teardown")
+    }
+    phase = "setup"
+    substitutes: set[int] = set()
+
+    def substitute() -> MsgGenerator:
+        msg = Msg("null")
+        substitutes.add(id(msg))
+        yield msg
+
+    def record(msg: Msg):
+        nonlocal phase
+        if id(msg) in substitutes:
+            return None, None
+        if msg.command == "close_run":
+            phase = "teardown"
+        counts[phase][msg.command] += 1
+        if msg.command == "open_run":
+            phase = "run"
+        if msg.command in HARDWARE_COMMANDS:
+            return substitute(), None
+        return None, None
+
+    RE(bpp.plan_mutator(plan, record))
+    return {phase: dict(sorted(count.items())) for phase, count in counts.items()}
+
+
+PLANS: dict[str, Callable[[MockBeamline], MsgGenerator]] = {
+    "stopflow": lambda beamline: stopflow(
+        exposure=0.1,
+        post_stop_frames=10,
+        pre_stop_frames=5,
+        panda=beamline.panda,
+        detectors={beamline.saxs},
+        baseline=set(),
+    ),
+    "pressure_jump": lambda beamline: pressure_jump(
+        start_pressure=1.0,
+        end_pressure=2.0,
+        duration=3.0,
+        exposure=0.1,
+        panda=beamline.panda,
+        detectors={beamline.saxs},
+        baseline=set(),
+        pressure_cell=Mock(name="pressure_cell"),
+    ),
+    "linkam_plan": lambda beamline: linkam_plan(
+        LinkamTrajectory(
+            start=20.0,
+            path=[
+                LinkamPathSegment(stop=30.0, rate=10.0, num=3, flown=False),
+                LinkamPathSegment(stop=20.0, rate=10.0, num=5),
+                LinkamPathSegment(stop=30.0, rate=10.0, num=5),
+            ],
+            default_num_frames=2,
+            default_exposure=0.1,
+        ),
+        linkam=beamline.linkam,
+        panda=beamline.panda,
+        stamped_detector=beamline.saxs,
+        detectors={beamline.saxs},
+    ),
+}
+
+
+@pytest.mark.parametrize("plan_name", PLANS)
+def test_messages_within_budget(RE: RunEngine, beamline: MockBeamline, plan_name: str):
+    counts = record_messages(RE, PLANS[plan_name](beamline))
+    budgets = json.loads(BUDGETS_PATH.read_text()) if BUDGETS_PATH.exists() else {}
+    if os.getenv("UPDATE_MESSAGE_BUDGETS", "0") == "1":
+        budgets[plan_name] = counts
+        BUDGETS_PATH.write_text(json.dumps(budgets, indent=2, sort_keys=True) + "\n")
+        return
+
+    budget = budgets[plan_name]
+    over = {
+        f"{phase}.{command}": f"{count} > {budget[phase].get(command, 0)}"
+        for phase, phase_counts in counts.items()
+        for command, count in phase_counts.items()
+        if count > budget[phase].get(command, 0)
+    }
+    assert not over, (
+        f"{plan_name} sent more messages than budgeted: {over}. If intended, rerun "
+        "with UPDATE_MESSAGE_BUDGETS=1 to update the budgets."
+    )
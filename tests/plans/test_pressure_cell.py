@@ -0,0 +1,28 @@
+import pytest
+from bluesky.run_engine import RunEngine
+from dodal.devices.pressure_jump_cell import PressureJumpCell
+from ophyd_async.core import init_devices
+from ophyd_async.testing import get_mock_put
+
+from i22_bluesky.plans import make_popping_sound
+
+
+@pytest.fixture
+def pressure_cell(RE: RunEngine) -> PressureJumpCell:
+    with init_devices(mock=True):
+        pressure_cell = PressureJumpCell("TEST")
+    return pressure_cell
+
+
+def test_popping_sound_opens_fast_valve_5(
+    RE: RunEngine, pressure_cell: PressureJumpCell
+):
+    docs: list[str] = []
+    RE(make_popping_sound(pressure_cell), lambda name, doc: docs.append(name))
+
+    valves = pressure_cell.all_valves_control
+    # The open sequence is started, then reset for the next
+    opened = get_mock_put(valves.fast_valve_control[5].open).call_args_list
+    assert [put.args[0] for put in opened] == ["1", "0"]
+    get_mock_put(valves.fast_valve_control[6].open).assert_not_called()
+    assert docs == ["start", "descriptor", "event", "stop"]
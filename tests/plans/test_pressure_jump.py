@@ -0,0 +1,75 @@
+import bluesky.plan_stubs as bps
+import numpy as np
+import pytest
+from bluesky.run_engine import RunEngine
+from bluesky.utils import MsgGenerator
+from dodal.devices.pressure_jump_cell import FastValveControlRequest, PressureJumpCell
+from ophyd_async.core import init_devices
+from ophyd_async.testing import get_mock_put
+
+from i22_bluesky.stubs.pressure_jump import (
+    FAST_VALVE,
+    FAST_VALVE_OUTPUT,
+    FAST_VALVE_PULSE,
+    fast_valve_metadata,
+    fast_valve_wrapper,
+    pressure_jump_seq_table,
+)
+from i22_bluesky.util.seq_emulator import emulate_seq_table
+
+
+def test_fast_valve_fired_after_pre_jump_frames():
+    exposure, deadtime, shutter_time, valve_delay = 0.01, 2e-3, 4e-3, 0.05
+    table = pressure_jump_seq_table(
+        5, 10, exposure, shutter_time, deadtime, 0.0, valve_delay
+    )
+    # Nothing to wait for, so the whole table plays out
+    timeline = emulate_seq_table(table)
+    assert np.isfinite(timeline.end)
+
+    fired, released = timeline.gates(FAST_VALVE_OUTPUT)
+    frames, _ = timeline.gates("b")
+    pre_jump_end = shutter_time + 5 * (exposure + deadtime)
+    np.testing.assert_allclose(fired, [pre_jump_end + valve_delay])
+    np.testing.assert_allclose(released - fired, [FAST_VALVE_PULSE])
+    assert len(frames) == 15
+    # Post-jump frames follow the valve at once, the shutter staying open
+    assert frames[5] == pytest.approx(released[0])
+    assert timeline.state("a", [fired[0]]).all()
+
+    assert fast_valve_metadata(table) == {
+        "output": "C",
+        "fire_time": pytest.approx(pre_jump_end + valve_delay),
+        "pulse": FAST_VALVE_PULSE,
+        "frames_before": 5,
+        "first_frame_time": pytest.approx(shutter_time),
+    }
+
+
+def test_post_jump_frames_wait_for_jump_without_valve():
+    table = pressure_jump_seq_table(5, 10, 0.01, 4e-3, 2e-3, 0.0)
+    timeline = emulate_seq_table(table)
+    frames, _ = timeline.gates("b")
+    fired, _ = timeline.gates(FAST_VALVE_OUTPUT)
+    assert len(frames) == 5
+    assert len(fired) == 0
+    assert timeline.end == np.inf
+
+
+def test_fast_valve_armed_only_during_plan(RE: RunEngine):
+    with init_devices(mock=True):
+        pressure_cell = PressureJumpCell("TEST")
+    valve = pressure_cell.all_valves_control.fast_valve_control[FAST_VALVE]
+    requests = get_mock_put(valve.close)
+
+    def failing_plan() -> MsgGenerator:
+        assert requests.call_args.args[0] == FastValveControlRequest.ARM
+        yield from bps.null()
+        raise RuntimeError("Jump failed")
+
+    with pytest.raises(RuntimeError, match="Jump failed"):
+        RE(fast_valve_wrapper(failing_plan(), pressure_cell))
+    assert [put.args[0] for put in requests.call_args_list] == [
+        FastValveControlRequest.ARM,
+        FastValveControlRequest.DISARM,
+    ]
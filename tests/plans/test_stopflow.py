@@ -1,12 +1,16 @@
 import asyncio
+import csv
+from pathlib import Path
 from typing import cast
 from unittest.mock import Mock, patch
 
+import bluesky.plan_stubs as bps
 import numpy as np
 import pytest
 from bluesky.protocols import Readable
 from bluesky.run_engine import RunEngine
 from dodal.beamlines.i22 import i0, it, panda1, saxs, waxs
+from mock_beamline import mock_beamline
 from ophyd_async.core import StandardDetector
 from ophyd_async.epics.adcore import ADHDFWriter
 from ophyd_async.epics.adpilatus import PilatusDetector, PilatusDriverIO
@@ -18,10 +22,15 @@ from ophyd_async.fastcs.panda import (
 )
 from ophyd_async.testing import callback_on_mock_put, set_mock_value
 
-from i22_bluesky.plans import check_detectors_for_stopflow, stopflow
+from i22_bluesky.plans import (
+    check_detectors_for_stopflow,
+    stopflow,
+    sweep_stopflow_rate,
+)
 from i22_bluesky.plans.stopflow import (
     raise_for_minimum_exposure_times,
 )
+from i22_bluesky.stubs.divided_rate import frame_deadtime
 from i22_bluesky.stubs.stopflow import stopflow_seq_table
 
 SEQ_TABLE_TEST_CASES: tuple[tuple[SeqTable, SeqTable], ...] = (
@@ -382,3 +391,51 @@ def test_stopflow_plan(RE: RunEngine):
             baseline=set(),
         )
     )
+
+
+def test_sweep_reports_rate_with_deadtime(
+    RE: RunEngine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    beamline = mock_beamline(RE, tmp_path, monkeypatch)
+    triggered: dict[str, int] = {}
+
+    def fake_stopflow(exposure: float, pre_stop_frames: int, **kwargs):
+        yield from bps.null()
+        if exposure < 4e-3:
+            raise TimeoutError("Detector fell behind")
+        triggered["frames"] = pre_stop_frames
+
+    def fake_read_frames_written(detectors):
+        yield from bps.null()
+        return {det.name: triggered["frames"] for det in detectors}
+
+    results = tmp_path / "sweep.csv"
+    with (
+        patch("i22_bluesky.plans.stopflow.stopflow", fake_stopflow),
+        patch(
+            "i22_bluesky.plans.stopflow.read_frames_written",
+            fake_read_frames_written,
+        ),
+    ):
+        highest = RE(
+            sweep_stopflow_rate(
+                results,
+                start_exposure=8e-3,
+                shortest_exposure=1e-3,
+                duration=1.0,
+                bisect_steps=0,
+                panda=beamline.panda,
+                detectors={beamline.saxs},
+                baseline=set(),
+            )
+        ).plan_result
+
+    deadtime = frame_deadtime({beamline.saxs, beamline.panda}, 4e-3)
+    assert deadtime > 0
+    assert highest == {"saxs": pytest.approx(1 / (4e-3 + deadtime))}
+    with results.open() as file:
+        rows = list(csv.DictReader(file))
+    assert [row["sustained"] for row in rows] == ["True", "True", "False"]
+    assert float(rows[1]["rate"]) == pytest.approx(1 / (4e-3 + deadtime), rel=1e-5)
+    # Each run lasts the duration, frames and deadtime together
+    assert int(rows[1]["frames"]) == round(1.0 / (4e-3 + deadtime))
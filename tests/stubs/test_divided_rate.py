@@ -0,0 +1,79 @@
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from ophyd_async.fastcs.panda import SeqTrigger
+
+from i22_bluesky.stubs.divided_rate import (
+    DIVIDED_START_TRIGGER,
+    divide_trigger,
+    divided_metadata,
+    divided_seq_table,
+    frame_deadtime,
+    too_slow_detectors,
+)
+from i22_bluesky.stubs.stopflow import stopflow_seq_table
+from i22_bluesky.util.seq_emulator import emulate_seq_table
+
+
+def mock_detector(name: str, deadtime: float) -> Mock:
+    detector = Mock()
+    detector.name = name
+    detector._controller.get_deadtime.return_value = deadtime
+    return detector
+
+
+def test_only_too_slow_detectors_divided():
+    saxs, oav = mock_detector("saxs", 2.28e-3), mock_detector("oav", 2e-3)
+    assert too_slow_detectors(0.01, {saxs, oav}) == {oav}
+
+    divided = divide_trigger(Mock(), {oav}, exposure=0.01, deadtime=2.3e-3)
+    # 1/22 s exposure plus deadtime spans just under 4 frames of 12.3 ms
+    assert divided.divisor == 4
+    assert divided.deadtime == pytest.approx(2.02e-3)
+    assert divided_metadata(divided, "main_divided", [0, 10]) == {
+        "stream": "main_divided",
+        "detectors": ["oav"],
+        "divisor": 4,
+        "run_starts": [0, 10],
+    }
+
+
+@pytest.mark.parametrize("pre_stop_frames", [0, 10, 11])
+def test_divided_frames_stay_in_step(pre_stop_frames: int):
+    table = stopflow_seq_table(pre_stop_frames, 25, 0.01, 4e-3, 2.3e-3, 0.0)
+    divided = divided_seq_table(table, divisor=4, deadtime=2.02e-3)
+    conditions = {SeqTrigger.BITA_1: [(1.0, np.inf)]}
+    main = emulate_seq_table(table, conditions)
+    main_rising, main_falling = main.gates("b")
+    # The divided sequencer is started by the main frames
+    slow = emulate_seq_table(
+        divided,
+        {**conditions, DIVIDED_START_TRIGGER: np.stack([main_rising, main_falling], 1)},
+    )
+
+    slow_rising, slow_falling = slow.gates("b")
+    # Each run of frames is divided separately, from its first frame
+    expected = np.concatenate(
+        [np.arange(0, pre_stop_frames - 3, 4), pre_stop_frames + np.arange(0, 22, 4)]
+    )
+    np.testing.assert_allclose(slow_rising, main_rising[expected])
+    # Each divided frame ends before the main frame after its last
+    assert np.all(slow_falling < main_rising[expected + 3] + 0.0123)
+    # The divided sequencer never drives the shutter
+    assert not slow.outputs["a"].any()
+    assert slow.end <= main.end
+
+
+def test_divided_sequencer_waits_for_first_main_frame():
+    table = stopflow_seq_table(0, 25, 0.01, 4e-3, 2.3e-3, 0.0)
+    divided = divided_seq_table(table, divisor=4, deadtime=2.02e-3)
+
+    assert divided.trigger[0] == DIVIDED_START_TRIGGER
+    # Left waiting, as the main frames never start without the stop
+    assert emulate_seq_table(divided).end == np.inf
+
+
+def test_frames_cannot_be_timed_without_fast_detectors():
+    with pytest.raises(ValueError, match="No detectors take frames"):
+        frame_deadtime(set(), 0.01)
@@ -0,0 +1,64 @@
+import csv
+from pathlib import Path
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.run_engine import RunEngine
+
+from i22_bluesky.stubs.rate_sweep import (
+    RateStep,
+    append_rate_step,
+    exposure_ladder,
+    search_shortest_exposure,
+)
+
+
+def test_ladder_ends_at_shortest_exposure():
+    assert exposure_ladder(0.01, 0.004) == pytest.approx([0.01, 0.005, 0.004])
+    assert exposure_ladder(0.01, 0.0025) == pytest.approx([0.01, 0.005, 0.0025])
+    with pytest.raises(ValueError):
+        exposure_ladder(0.001, 0.01)
+
+
+@pytest.mark.parametrize(
+    "limit,expected_tries,expected",
+    [
+        # Ladder 8, 4, 2 ms then 2.83, 3.36 ms between 4 and 2 ms
+        (3e-3, 5, 4e-3 / 2**0.25),
+        (0.5e-3, 4, 1e-3),
+        (10e-3, 1, None),
+    ],
+)
+def test_search_bisects_after_first_failure(
+    RE: RunEngine, limit: float, expected_tries: int, expected: float | None
+):
+    tried = []
+
+    def sustains(exposure: float):
+        yield from bps.null()
+        tried.append(exposure)
+        return exposure >= limit
+
+    ladder = exposure_ladder(8e-3, 1e-3)
+    result = RE(search_shortest_exposure(ladder, sustains, bisect_steps=2))
+    assert len(tried) == expected_tries
+    assert result.plan_result == pytest.approx(expected)
+
+
+def test_missing_frames_not_sustained(tmp_path: Path):
+    table = tmp_path / "sweep.csv"
+    sustained = RateStep(["saxs"], 0.0099, 1e-4, 100, {"saxs": 100, "panda1": 100})
+    dropped = RateStep(["saxs", "waxs"], 0.005, 0, 200, {"saxs": 200, "waxs": 199})
+    failed = RateStep(["waxs"], 0.004, 0, 250, {"waxs": 250}, error="Timeout")
+    for step in (sustained, dropped, failed):
+        append_rate_step(table, step)
+
+    with table.open() as file:
+        rows = list(csv.DictReader(file))
+    assert [row["sustained"] for row in rows] == ["True", "False", "False"]
+    # The deadtime between frames counts against the rate
+    assert rows[0]["rate"] == "100"
+    assert rows[0]["deadtime"] == "0.0001"
+    assert rows[1]["detectors"] == "saxs+waxs"
+    assert rows[1]["frames_written"] == "saxs=200 waxs=199"
+    assert rows[2]["error"] == "Timeout"
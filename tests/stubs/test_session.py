@@ -0,0 +1,169 @@
+import asyncio
+from pathlib import Path
+from unittest.mock import Mock
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+import pytest
+from bluesky.run_engine import RunEngine
+from ophyd_async.core import (
+    Device,
+    StaticFilenameProvider,
+    StaticPathProvider,
+    init_devices,
+)
+from ophyd_async.epics.adpilatus import PilatusDetector
+
+from i22_bluesky.stubs.session import run_staged_session
+
+
+class StageCounter(Device):
+    def __init__(self, name: str):
+        self.calls: list[str] = []
+        super().__init__(name=name)
+
+    def stage(self):
+        self.calls.append("stage")
+        return [self]
+
+    def unstage(self):
+        self.calls.append("unstage")
+        return [self]
+
+
+def counted_run(*devices):
+    @bpp.stage_decorator(devices)
+    @bpp.run_decorator()
+    def inner():
+        yield from bps.null()
+
+    return inner
+
+
+def failing_run(*devices):
+    @bpp.stage_decorator(devices)
+    @bpp.run_decorator()
+    def inner():
+        yield from bps.null()
+        raise ValueError("Detector timeout")
+
+    return inner
+
+
+def test_devices_staged_once_for_all_runs(RE: RunEngine):
+    a, b, c = StageCounter("a"), StageCounter("b"), StageCounter("c")
+    starts = []
+    RE(
+        run_staged_session(
+            [counted_run(a, b), counted_run(b, c), counted_run(a)],
+            [{a, b}, {b, c}, {a}],
+            on_failure=Mock(),
+        ),
+        lambda name, doc: starts.append(doc) if name == "start" else None,
+    )
+    assert len(starts) == 3
+    for device in (a, b, c):
+        assert device.calls == ["stage", "unstage"]
+
+
+def test_failed_run_does_not_stop_session(RE: RunEngine):
+    a, b = StageCounter("a"), StageCounter("b")
+    on_failure = Mock()
+    stops = []
+    results = RE(
+        run_staged_session(
+            [counted_run(a), failing_run(a, b), counted_run(a, b)],
+            [{a}, {a, b}, {a, b}],
+            on_failure=on_failure,
+        ),
+        lambda name, doc: stops.append(doc["exit_status"]) if name == "stop" else None,
+    ).plan_result
+    assert stops == ["success", "fail", "success"]
+    assert results[1] is None
+    index, exception = on_failure.call_args.args
+    assert index == 1
+    assert isinstance(exception, ValueError)
+    # Devices used by the failed run are reset before the next one
+    for device in (a, b):
+        assert device.calls == ["stage", "unstage", "stage", "unstage"]
+
+
+def test_unstaged_detector_writer_is_closed_between_runs(RE: RunEngine, tmp_path: Path):
+    with init_devices(mock=True):
+        saxs = PilatusDetector(
+            "SAXS:", StaticPathProvider(StaticFilenameProvider("foo"), tmp_path)
+        )
+    closes = []
+    writer_close = saxs._writer.close
+
+    async def close():
+        closes.append(True)
+        await writer_close()
+
+    saxs._writer.close = close  # type: ignore
+    RE(
+        run_staged_session(
+            [counted_run(saxs), counted_run(saxs)],
+            [{saxs}, {saxs}],
+            on_failure=Mock(),
+        )
+    )
+    # Once after each run, once on stage and once on the final unstage
+    assert len(closes) == 4
+
+
+def logged_close(saxs: PilatusDetector, log: list[str]):
+    writer_close = saxs._writer.close
+
+    async def close():
+        log.append("close started")
+        await asyncio.sleep(0.05)
+        await writer_close()
+        log.append("close finished")
+
+    saxs._writer.close = close  # type: ignore
+
+
+def logging_run(saxs: PilatusDetector, log: list[str]):
+    async def started():
+        log.append("run started")
+
+    @bpp.stage_decorator([saxs])
+    @bpp.run_decorator()
+    def inner():
+        yield from bps.wait_for([started])
+        yield from bps.rd(saxs.driver.acquire_time)
+        log.append("detector used")
+
+    return inner
+
+
+IN_SEQUENCE = ["close started", "close finished", "run started", "detector used"]
+OVERLAPPED = ["close started", "run started", "close finished", "detector used"]
+
+
+@pytest.mark.parametrize(
+    "close_in_background,expected", [(False, IN_SEQUENCE), (True, OVERLAPPED)]
+)
+def test_next_run_waits_for_close_only_to_use_detector(
+    RE: RunEngine, tmp_path: Path, close_in_background: bool, expected: list[str]
+):
+    with init_devices(mock=True):
+        saxs = PilatusDetector(
+            "SAXS:", StaticPathProvider(StaticFilenameProvider("foo"), tmp_path)
+        )
+    log: list[str] = []
+    logged_close(saxs, log)
+    RE(
+        run_staged_session(
+            [logging_run(saxs, log), logging_run(saxs, log)],
+            [{saxs}, {saxs}],
+            on_failure=Mock(),
+            close_in_background=close_in_background,
+        )
+    )
+    # After staging, and the first run
+    assert log[:4] == IN_SEQUENCE
+    assert log[4:8] == expected
+    # Every close has finished by the end of the session
+    assert log.count("close started") == log.count("close finished") == 4
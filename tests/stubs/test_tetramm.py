@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import cast
+from unittest.mock import Mock
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.run_engine import RunEngine
+from bluesky.utils import MsgGenerator
+from dodal.devices.tetramm import TetrammController, TetrammDetector
+from ophyd_async.core import (
+    DetectorTrigger,
+    StaticFilenameProvider,
+    StaticPathProvider,
+    TriggerInfo,
+    init_devices,
+)
+
+from i22_bluesky.stubs.tetramm import tetramm_averaging_wrapper
+
+
+@pytest.fixture
+def i0(RE: RunEngine, tmp_path: Path) -> TetrammDetector:
+    with init_devices(mock=True):
+        i0 = TetrammDetector(
+            "TEST:",
+            StaticPathProvider(StaticFilenameProvider("data"), tmp_path),
+        )
+    return i0
+
+
+def prepare_controller(detector: TetrammDetector, exposure: float) -> MsgGenerator:
+    trigger_info = TriggerInfo(
+        number_of_events=10,
+        trigger=DetectorTrigger.CONSTANT_GATE,
+        livetime=exposure,
+    )
+    yield from bps.wait_for([lambda: detector._controller.prepare(trigger_info)])
+
+
+@pytest.mark.parametrize(
+    "readings_per_frame, values_per_reading", [(1, 1000), (4, 250)]
+)
+def test_each_gate_averaged_into_readings(
+    RE: RunEngine,
+    i0: TetrammDetector,
+    readings_per_frame: int,
+    values_per_reading: int,
+):
+    RE(
+        tetramm_averaging_wrapper(
+            prepare_controller(i0, exposure=0.01), {i0, Mock()}, readings_per_frame
+        )
+    )
+
+    assert RE(bps.rd(i0.drv.values_per_reading)).plan_result == values_per_reading
+    (shape,) = RE(bps.wait_for([i0._writer._dataset_describer.shape])).plan_result
+    assert shape.result() == (11, readings_per_frame)
+
+
+def test_short_exposures_write_fewer_readings(RE: RunEngine, i0: TetrammDetector):
+    # 1 ms is 100 samples, at least 5 of which must be averaged into each reading
+    RE(tetramm_averaging_wrapper(prepare_controller(i0, exposure=1e-3), {i0}, 1000))
+
+    assert i0._controller.readings_per_frame == 20
+    assert RE(bps.rd(i0.drv.values_per_reading)).plan_result == 5
+
+
+def test_previous_averaging_restored_after_plan(RE: RunEngine, i0: TetrammDetector):
+    controller = cast(TetrammController, i0._controller)
+    controller.maximum_readings_per_frame = 10
+
+    def failing_plan() -> MsgGenerator:
+        assert controller.maximum_readings_per_frame == 1
+        yield from bps.null()
+        raise RuntimeError("Prepare failed")
+
+    with pytest.raises(RuntimeError, match="Prepare failed"):
+        RE(tetramm_averaging_wrapper(failing_plan(), {i0}, 1))
+    assert controller.maximum_readings_per_frame == 10
+
+
+def test_at_least_one_reading_per_frame(RE: RunEngine, i0: TetrammDetector):
+    with pytest.raises(ValueError, match="at least one reading"):
+        RE(tetramm_averaging_wrapper(prepare_controller(i0, exposure=0.01), {i0}, 0))
@@ -0,0 +1,105 @@
+import asyncio
+import gc
+import time
+import weakref
+
+import bluesky.plans as bp
+import bluesky.preprocessors as bpp
+from bluesky.run_engine import RunEngine
+from event_model import DataKey
+
+from i22_bluesky.util.cached_baseline import CachedReadable, cached_baseline
+
+
+class SlowReadable:
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.parent = None
+        self.delay = delay
+        self.reads = 0
+
+    async def read(self):
+        self.reads += 1
+        await asyncio.sleep(self.delay)
+        return {f"{self.name}-value": {"value": self.reads, "timestamp": time.time()}}
+
+    async def describe(self):
+        return {
+            f"{self.name}-value": DataKey(source=self.name, dtype="number", shape=[])
+        }
+
+    async def read_configuration(self):
+        return {f"{self.name}-units": {"value": "mm", "timestamp": time.time()}}
+
+    async def describe_configuration(self):
+        return {
+            f"{self.name}-units": DataKey(source=self.name, dtype="string", shape=[])
+        }
+
+
+def run_with_baseline(RE: RunEngine, baseline: list[CachedReadable]) -> list[dict]:
+    docs = []
+    RE(bpp.baseline_wrapper(bp.count([]), baseline), lambda *doc: docs.append(doc))
+    return docs
+
+
+def test_devices_keep_their_names_and_configuration(RE: RunEngine):
+    slits = SlowReadable("slits_1")
+    docs = run_with_baseline(RE, cached_baseline([slits]))
+
+    (descriptor,) = (doc for name, doc in docs if name == "descriptor")
+    assert descriptor["object_keys"] == {"slits_1": ["slits_1-value"]}
+    assert descriptor["configuration"]["slits_1"]["data"] == {"slits_1-units": "mm"}
+    events = [doc for name, doc in docs if name == "event"]
+    # Read live at the start and end, with no cache by default
+    assert [event["data"] for event in events] == [
+        {"slits_1-value": 1},
+        {"slits_1-value": 2},
+    ]
+
+
+def test_slow_devices_are_reused_within_ttl(RE: RunEngine):
+    slits, synchrotron = SlowReadable("slits_1"), SlowReadable("synchrotron")
+    events = []
+    for _ in range(2):
+        docs = run_with_baseline(RE, cached_baseline([slits, synchrotron], ttl=3600))
+        events += [doc for name, doc in docs if name == "event"]
+
+    # Read once at the start of the first run only
+    assert slits.reads == 1
+    # Read at the start and end of each run
+    assert synchrotron.reads == 4
+    assert [event["data"]["slits_1-value"] for event in events] == [1, 1, 1, 1]
+    assert [event["data"]["synchrotron-value"] for event in events] == [1, 2, 3, 4]
+    assert events[0]["data"]["slits_1-baseline_age"] == 0.0
+    assert all(event["data"]["slits_1-baseline_age"] > 0.0 for event in events[1:])
+    assert all(event["data"]["synchrotron-baseline_age"] == 0.0 for event in events)
+
+
+def test_readings_are_refreshed_after_ttl_or_invalidate(RE: RunEngine):
+    slits = SlowReadable("slits_1")
+    run_with_baseline(RE, cached_baseline([slits]))
+    assert slits.reads == 2
+
+    (baseline,) = cached_baseline([slits], ttl=3600)
+    baseline.invalidate()
+    run_with_baseline(RE, [baseline])
+    assert slits.reads == 3
+
+
+def test_devices_are_read_concurrently(RE: RunEngine):
+    devices = [SlowReadable(f"slits_{i}", delay=0.2) for i in range(1, 7)]
+    start = time.monotonic()
+    run_with_baseline(RE, cached_baseline(devices))
+    assert time.monotonic() - start < 6 * 0.2
+
+
+def test_one_wrapper_per_device_while_it_exists():
+    slits = SlowReadable("slits_1")
+    assert cached_baseline([slits]) == cached_baseline([slits], ttl=10.0)
+    assert cached_baseline(set()) == []
+
+    device = weakref.ref(slits)
+    del slits
+    gc.collect()
+    assert device() is None
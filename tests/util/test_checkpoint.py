@@ -0,0 +1,110 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+import i22_bluesky.plans.linkam
+from i22_bluesky.plans.linkam import linkam_plan, resume_linkam_plan
+from i22_bluesky.stubs import LinkamPathSegment, LinkamTrajectory
+from i22_bluesky.util.checkpoint import LinkamCheckpoint
+from i22_bluesky.util.roi import DetectorROI
+from i22_bluesky.util.writer_profiles import WriterProfile
+
+
+@pytest.fixture
+def trajectory() -> LinkamTrajectory:
+    return LinkamTrajectory(
+        start=20.0,
+        path=[
+            LinkamPathSegment(stop=30.0, rate=10.0, num=3, flown=False),
+            LinkamPathSegment(stop=20.0, rate=10.0, num=5),
+        ],
+        default_exposure=0.1,
+        default_num_frames=2,
+    )
+
+
+def test_checkpoint_round_trip(tmp_path: Path, trajectory: LinkamTrajectory):
+    path = tmp_path / "checkpoint.json"
+    checkpoint = LinkamCheckpoint(trajectory=trajectory, completed_points=3)
+    checkpoint.run_uids.append("abc")
+    checkpoint.save(path)
+    assert LinkamCheckpoint.load(path) == checkpoint
+    assert not (tmp_path / "checkpoint.json.partial").exists()
+
+
+def test_checkpoint_complete(trajectory: LinkamTrajectory):
+    assert not LinkamCheckpoint(trajectory=trajectory, completed_points=7).complete
+    assert LinkamCheckpoint(trajectory=trajectory, completed_points=8).complete
+
+
+def test_checkpoints_have_unique_ids(trajectory: LinkamTrajectory):
+    assert (
+        LinkamCheckpoint(trajectory=trajectory).id
+        != LinkamCheckpoint(trajectory=trajectory).id
+    )
+
+
+def start_plan(trajectory: LinkamTrajectory, **kwargs):
+    # Skip validation of the mock devices, checking happens before any message
+    plan = linkam_plan.__wrapped__.__wrapped__(
+        trajectory,
+        linkam=MagicMock(),
+        panda=MagicMock(),
+        stamped_detector=MagicMock(),
+        detectors=set(),
+        **kwargs,
+    )
+    next(plan)
+
+
+@pytest.mark.parametrize(
+    "completed,kwargs,error",
+    [
+        (8, {}, "completed trajectory"),
+        (2, {"trajectory": None}, "different trajectory"),
+    ],
+)
+def test_resume_rejects_unusable_checkpoint(
+    tmp_path: Path, trajectory: LinkamTrajectory, completed, kwargs, error
+):
+    path = tmp_path / "checkpoint.json"
+    LinkamCheckpoint(trajectory=trajectory, completed_points=completed).save(path)
+    if "trajectory" in kwargs:
+        trajectory = trajectory.model_copy(update={"start": 25.0})
+    with pytest.raises(ValueError, match=error):
+        start_plan(trajectory, checkpoint=path, resume=True)
+
+
+def test_resume_needs_checkpoint(trajectory: LinkamTrajectory):
+    with pytest.raises(ValueError, match="without a checkpoint"):
+        start_plan(trajectory, resume=True)
+
+
+def test_resume_replays_options_of_trajectory(
+    tmp_path: Path, trajectory: LinkamTrajectory, monkeypatch: pytest.MonkeyPatch
+):
+    path = tmp_path / "checkpoint.json"
+    LinkamCheckpoint(
+        trajectory=trajectory,
+        completed_points=2,
+        plan_args={
+            "writer_profile": WriterProfile.FAST,
+            "coalesce": False,
+            "roi": {"saxs": DetectorROI(bin_x=2, bin_y=2)},
+            "tetramm_readings_per_frame": 4,
+        },
+    ).save(path)
+    resumed = MagicMock(return_value=iter(()))
+    monkeypatch.setattr(i22_bluesky.plans.linkam, "linkam_plan", resumed)
+
+    list(resume_linkam_plan(path, linkam=MagicMock(), panda=MagicMock()))
+
+    options = resumed.call_args.kwargs
+    assert options["resume"] is True
+    assert options["trajectory"] == trajectory
+    # Validated back into models and enums by linkam_plan
+    assert options["writer_profile"] == "fast"
+    assert options["coalesce"] is False
+    assert options["roi"] == {"saxs": DetectorROI(bin_x=2, bin_y=2).model_dump()}
+    assert options["tetramm_readings_per_frame"] == 4
@@ -0,0 +1,112 @@
+import urllib.request
+from pathlib import Path
+
+import bluesky.plan_stubs as bps
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg
+
+from i22_bluesky.util.metrics import CONTENT_TYPE, PlanMetrics
+from i22_bluesky.util.trace import set_msg_hook
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def test_prepare_and_collect_timed_until_finished():
+    clock = Clock()
+    metrics = PlanMetrics(clock=clock)
+    metrics.start({"time": 0.0, "uid": "a", "plan_name": "stopflow"})
+    steps = [
+        (0.0, Msg("prepare", None, group="prepare")),
+        (0.1, Msg("prepare", None, group="prepare")),
+        (0.2, Msg("wait", None, group="prepare")),
+        # The wait for the prepares finishes when the next message starts
+        (1.5, Msg("collect", None)),
+        (1.52, Msg("null")),
+        (2.0, Msg("collect", None)),
+        (2.6, Msg("null")),
+    ]
+    for time, msg in steps:
+        clock.time = time
+        metrics.msg_hook(msg)
+
+    assert metrics.prepare_latency.count(plan_name="stopflow") == 1
+    assert metrics.collect_latency.count(plan_name="stopflow") == 2
+    text = metrics.render()
+    assert 'i22_prepare_latency_seconds_bucket{plan_name="stopflow",le="1.0"} 0' in text
+    assert 'i22_prepare_latency_seconds_bucket{plan_name="stopflow",le="2.5"} 1' in text
+    assert 'i22_collect_latency_seconds_bucket{plan_name="stopflow",le="0.5"} 1' in text
+    assert 'i22_collect_latency_seconds_count{plan_name="stopflow"} 2' in text
+
+
+def test_runs_timed_by_plan_name(RE: RunEngine, tmp_path: Path):
+    textfile = tmp_path / "i22.prom"
+    metrics = PlanMetrics(textfile=textfile)
+    RE.subscribe(metrics)
+
+    def plan():
+        yield from bps.open_run(md={"plan_name": "pressure_jump"})
+        yield from bps.close_run()
+
+    RE(plan())
+    RE(plan())
+    assert (
+        metrics.plan_duration.count(plan_name="pressure_jump", exit_status="success")
+        == 2
+    )
+    assert (
+        'i22_plan_duration_seconds_count{exit_status="success",'
+        'plan_name="pressure_jump"} 2'
+    ) in textfile.read_text()
+
+
+def test_installed_alongside_previous_msg_hook(RE: RunEngine):
+    messages: list[Msg] = []
+    set_msg_hook(RE, messages.append)
+    metrics = PlanMetrics()
+    metrics.install(RE)
+
+    def plan():
+        yield from bps.open_run(md={"plan_name": "stopflow"})
+        yield from bps.close_run()
+
+    try:
+        RE(plan())
+    finally:
+        metrics.uninstall(RE)
+
+    assert metrics.plan_duration.count(plan_name="stopflow", exit_status="success") == 1
+    # The previous msg_hook is still called, and restored
+    assert [msg.command for msg in messages] == ["open_run", "close_run"]
+    assert RE.msg_hook == messages.append
+
+
+def test_frame_rate_from_stream_datum():
+    metrics = PlanMetrics()
+    metrics.start({"time": 0.0, "uid": "a"})
+    for resource, stop in [("saxs", 100), ("saxs", 400), ("panda", 400)]:
+        metrics.stream_datum(
+            {"stream_resource": resource, "indices": {"start": 0, "stop": stop}}
+        )
+    metrics.stop({"time": 2.0, "run_start": "a", "exit_status": "success"})
+    assert 'i22_frames_per_second_sum{plan_name="unknown"} 200.0' in (metrics.render())
+
+
+def test_served_over_http():
+    metrics = PlanMetrics()
+    server = metrics.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert "# TYPE i22_plan_duration_seconds histogram" in (
+                response.read().decode()
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,94 @@
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+import pytest
+from bluesky.run_engine import RunEngine
+from ophyd_async.core import SignalRW, soft_signal_rw
+
+from i22_bluesky.util.monitor import DecimatedMonitor, MonitorDecimation
+
+
+@pytest.fixture
+def temp(RE: RunEngine) -> SignalRW[float]:
+    return soft_signal_rw(float, 20.0, name="linkam-temp")
+
+
+@pytest.fixture
+def ramp_rate(RE: RunEngine) -> SignalRW[float]:
+    return soft_signal_rw(float, 10.0, name="linkam-ramp_rate")
+
+
+def run_monitor(
+    RE: RunEngine,
+    monitor: DecimatedMonitor,
+    *updates: tuple[SignalRW[float], float],
+    collect_every: int = 1,
+) -> list[dict]:
+    pages = []
+
+    @bpp.run_decorator()
+    def plan():
+        yield from bps.declare_stream(monitor, name="monitor", collect=True)
+        yield from bps.kickoff(monitor, wait=True)
+        for i, (signal, value) in enumerate(updates, start=1):
+            yield from bps.mv(signal, value)
+            if i % collect_every == 0:
+                yield from bps.collect(monitor, name="monitor")
+        yield from bps.complete(monitor, wait=True)
+        yield from bps.collect(monitor, name="monitor")
+
+    RE(plan(), lambda name, doc: pages.append(doc) if name == "event_page" else None)
+    return pages
+
+
+def test_monitor_records_only_after_min_delta(
+    RE: RunEngine, temp: SignalRW[float], ramp_rate: SignalRW[float]
+):
+    monitor = DecimatedMonitor(
+        temp,
+        [ramp_rate],
+        MonitorDecimation(min_interval=3600, min_delta=0.5),
+        name="monitor",
+    )
+    pages = run_monitor(
+        RE,
+        monitor,
+        *((temp, value) for value in (20.1, 20.2, 20.6, 20.7, 21.2, 21.3)),
+        collect_every=10,
+    )
+    assert len(pages) == 1
+    # Initial value is recorded on subscription
+    assert pages[0]["data"]["linkam-temp"] == [20.0, 20.6, 21.2]
+    assert pages[0]["data"]["linkam-ramp_rate"] == [10.0, 10.0, 10.0]
+
+
+def test_monitor_records_every_update_without_thresholds(
+    RE: RunEngine, temp: SignalRW[float], ramp_rate: SignalRW[float]
+):
+    monitor = DecimatedMonitor(
+        temp,
+        [ramp_rate],
+        MonitorDecimation(min_interval=0, min_delta=0),
+        name="monitor",
+    )
+    pages = run_monitor(RE, monitor, (ramp_rate, 5.0), (temp, 21.0), (temp, 22.0))
+    assert [page["data"]["linkam-temp"] for page in pages] == [[20.0], [21.0], [22.0]]
+    # Ramp rate changes are only recorded with the next temperature update
+    assert [page["data"]["linkam-ramp_rate"] for page in pages] == [
+        [10.0],
+        [5.0],
+        [5.0],
+    ]
+
+
+def test_monitor_stops_buffering_after_complete(
+    RE: RunEngine, temp: SignalRW[float], ramp_rate: SignalRW[float]
+):
+    monitor = DecimatedMonitor(
+        temp,
+        [ramp_rate],
+        MonitorDecimation(min_interval=0, min_delta=0),
+        name="monitor",
+    )
+    run_monitor(RE, monitor, (temp, 21.0))
+    RE(bps.mv(temp, 30.0))
+    assert list(monitor.collect()) == []
@@ -0,0 +1,151 @@
+from collections.abc import Callable
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pytest
+from event_model import ComposeStreamResource, compose_run
+
+from i22_bluesky.util.normalization import (
+    NORMALIZATION_DATASET,
+    TETRAMM_SUM_CHANNEL,
+    NormalizationSidecar,
+    normalization_table,
+)
+
+
+def test_columns_lined_up_with_frames():
+    table = normalization_table(
+        num_frames=4,
+        gate_times=[1.0, 1.1, 1.2],
+        exposure=0.09,
+        i0=np.array([2.0, 4.0, 4.0, 8.0, 8.0]),
+        it=np.array([1.0, 1.0, 0.0, 2.0]),
+    )
+
+    assert table["frame"].tolist() == [0, 1, 2, 3]
+    # The PandA missed the last gate
+    np.testing.assert_allclose(table["timestamp"], [1.0, 1.1, 1.2, np.nan])
+    np.testing.assert_allclose(table["exposure"], [0.09] * 4)
+    np.testing.assert_allclose(table["transmission"], [0.5, 0.25, 0.0, 0.25])
+
+
+def test_missing_columns_are_nan():
+    table = normalization_table(num_frames=2, gate_times=[0.0, 0.1])
+
+    for column in ("exposure", "i0", "it", "transmission"):
+        assert np.isnan(table[column]).all()
+
+
+def write_run(
+    sidecar: NormalizationSidecar,
+    tmp_path: Path,
+    exposure: float,
+    hold_open_for_write: Callable[..., None] | None = None,
+    **datasets,
+):
+    run = compose_run(metadata={"plan_args": {"exposure": exposure}})
+    sidecar("start", dict(run.start_doc))
+    paths = []
+    for key, data in datasets.items():
+        path = tmp_path / f"{key}.h5"
+        paths.append(path)
+        with h5py.File(path, "w", libver="latest") as file:
+            file["/data"] = data
+        resource = ComposeStreamResource()(
+            mimetype="application/x-hdf5",
+            uri=f"file://localhost{path}",
+            data_key=key,
+            parameters={"dataset": "/data"},
+        )
+        sidecar("stream_resource", dict(resource.stream_resource_doc))
+    if hold_open_for_write is not None:
+        # The stop document is sent before the writers are closed on unstage
+        hold_open_for_write(*paths)
+    sidecar("stop", dict(run.compose_stop()))
+    return run.start_doc["uid"]
+
+
+def tetramm_frames(currents: np.ndarray, readings: int = 2) -> np.ndarray:
+    frames = np.zeros((len(currents), 11, readings))
+    frames[:, TETRAMM_SUM_CHANNEL, :] = currents[:, np.newaxis]
+    # Other channels are left unread
+    frames[:, 0, :] = -1.0
+    return frames
+
+
+def test_sidecar_written_next_to_detector_file(tmp_path: Path):
+    num_frames = 1000
+    uid = write_run(
+        NormalizationSidecar(),
+        tmp_path,
+        exposure=1e-3,
+        saxs=np.zeros((num_frames, 4, 4), dtype=np.uint32),
+        time=np.arange(num_frames) * 1.2e-3,
+        gate_duration=np.full(num_frames, 0.99e-3),
+        i0=tetramm_frames(np.full(num_frames, 4e-9)),
+        it=tetramm_frames(np.full(num_frames, 1e-9)),
+    )
+
+    with h5py.File(tmp_path / "saxs_normalization.h5", "r") as file:
+        table = file[NORMALIZATION_DATASET][()]
+        assert file[NORMALIZATION_DATASET].attrs["run_uid"] == uid
+    assert len(table) == num_frames
+    np.testing.assert_allclose(table["timestamp"][-1], 999 * 1.2e-3)
+    # Gate lengths captured by the PandA are preferred to the nominal exposure
+    np.testing.assert_allclose(table["exposure"], 0.99e-3)
+    np.testing.assert_allclose(table["i0"], 4e-9)
+    np.testing.assert_allclose(table["transmission"], 0.25)
+
+
+def test_sidecar_written_while_files_open_for_write(
+    tmp_path: Path, hold_open_for_write: Callable[..., None]
+):
+    write_run(
+        NormalizationSidecar(),
+        tmp_path,
+        exposure=0.1,
+        hold_open_for_write=hold_open_for_write,
+        saxs=np.zeros((3, 4, 4), dtype=np.uint32),
+        time=[0.0, 0.2, 0.4],
+        i0=tetramm_frames(np.full(3, 4e-9)),
+        it=tetramm_frames(np.full(3, 2e-9)),
+    )
+
+    with h5py.File(tmp_path / "saxs_normalization.h5", "r") as file:
+        table = file[NORMALIZATION_DATASET][()]
+    np.testing.assert_allclose(table["timestamp"], [0.0, 0.2, 0.4])
+    np.testing.assert_allclose(table["transmission"], 0.5)
+
+
+def test_sidecar_without_tetramms_uses_nominal_exposure(tmp_path: Path):
+    write_run(
+        NormalizationSidecar(),
+        tmp_path,
+        exposure=0.1,
+        saxs=np.zeros((3, 4, 4), dtype=np.uint32),
+        time=[0.0, 0.2, 0.4],
+    )
+
+    with h5py.File(tmp_path / "saxs_normalization.h5", "r") as file:
+        table = file[NORMALIZATION_DATASET][()]
+    np.testing.assert_allclose(table["exposure"], 0.1)
+    assert np.isnan(table["transmission"]).all()
+
+
+def test_unreadable_files_do_not_stop_the_run(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+):
+    sidecar = NormalizationSidecar()
+    write_run(
+        sidecar,
+        tmp_path,
+        exposure=0.1,
+        saxs=np.zeros((3, 4, 4), dtype=np.uint32),
+        time=[0.0, 0.2, 0.4],
+        # A TetrAMM file without channels
+        i0=np.zeros(3),
+    )
+
+    assert not (tmp_path / "saxs_normalization.h5").exists()
+    assert "Could not write" in caplog.text
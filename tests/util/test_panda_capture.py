@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import Any
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.run_engine import RunEngine
+from ophyd_async.core import (
+    Device,
+    DeviceVector,
+    StaticFilenameProvider,
+    StaticPathProvider,
+    init_devices,
+    soft_signal_rw,
+)
+from ophyd_async.fastcs.panda import HDFPanda
+from pydantic import ValidationError
+
+from i22_bluesky.util.panda_capture import (
+    CapturedField,
+    CaptureMode,
+    PandaCaptureSpec,
+    apply_capture_spec,
+)
+
+
+class CapturableBlock(Device):
+    def __init__(self, fields: list[str], name: str = ""):
+        for field in fields:
+            setattr(self, f"{field}_capture", soft_signal_rw(str, "Value"))
+            setattr(self, f"{field}_dataset", soft_signal_rw(str, ""))
+        super().__init__(name)
+
+
+@pytest.fixture
+def mock_panda(RE: RunEngine, tmp_path: Path) -> HDFPanda:
+    with init_devices(mock=True):
+        panda = HDFPanda(
+            "PANDA:", StaticPathProvider(StaticFilenameProvider("panda"), tmp_path)
+        )
+    # Fields are only discovered from a real PandA, so add some that HDFPanda's
+    # type does not know of
+    extended: Any = panda
+    extended.inenc = DeviceVector({1: CapturableBlock(["val"])})
+    extended.counter = DeviceVector({1: CapturableBlock(["out"])})
+    extended.pcap.ts_trig_capture = soft_signal_rw(str, "Value")
+    RE(bps.wait_for([lambda: panda.connect(mock=True)]))
+    return panda
+
+
+def read(RE: RunEngine, signal):
+    return RE(bps.rd(signal)).plan_result
+
+
+def test_only_fields_in_spec_captured(RE: RunEngine, mock_panda: HDFPanda):
+    spec = PandaCaptureSpec(
+        fields=[
+            CapturedField(field="PCAP.TS_TRIG"),
+            CapturedField(field="INENC1.VAL", mode=CaptureMode.MEAN, dataset="x"),
+        ]
+    )
+    RE(apply_capture_spec(mock_panda, spec))
+    panda: Any = mock_panda
+    assert read(RE, panda.pcap.ts_trig_capture) == "Value"
+    assert read(RE, panda.inenc[1].val_capture) == "Mean"
+    assert read(RE, panda.inenc[1].val_dataset) == "x"
+    assert read(RE, panda.counter[1].out_capture) == "No"
+    # The data block's settings are not mistaken for fields
+    assert read(RE, panda.data.num_capture) == 0
+
+
+def test_unknown_field_rejected(RE: RunEngine, mock_panda: HDFPanda):
+    def plan():
+        yield from apply_capture_spec(
+            mock_panda, PandaCaptureSpec(fields=[CapturedField(field="INENC2.VAL")])
+        )
+
+    with pytest.raises(ValueError, match="INENC2.VAL"):
+        RE(plan())
+
+
+def test_field_names_validated():
+    with pytest.raises(ValidationError):
+        CapturedField(field="inenc1:val")
@@ -0,0 +1,147 @@
+import os
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pytest
+from event_model import ComposeStreamResource, DataKey, compose_run
+
+from i22_bluesky.util.reduction import LiveReduction, QBinning, ReductionGeometry
+
+SHAPE = (48, 64)
+GEOMETRY = ReductionGeometry(
+    beam_centre_x=20.5, beam_centre_y=10.5, distance=1000.0, wavelength=1.0, num_bins=20
+)
+
+
+def ring_frames(num_frames: int) -> np.ndarray:
+    # Intensity depending only on distance from the beam centre, scaled per frame
+    rows, columns = np.indices(SHAPE)
+    radius = np.hypot(rows - GEOMETRY.beam_centre_y, columns - GEOMETRY.beam_centre_x)
+    return np.stack([(i + 1) * (100 - radius) for i in range(num_frames)])
+
+
+def test_binning_of_uniform_frames_is_flat():
+    binning = QBinning(GEOMETRY, SHAPE)
+    frames = np.stack([np.full(SHAPE, 3.0), np.full(SHAPE, 5.0)])
+    curves = binning.reduce(frames)
+    assert curves.shape == (2, 20)
+    populated = ~np.isnan(curves[0])
+    assert populated.all()
+    np.testing.assert_allclose(curves[0], 3.0)
+    np.testing.assert_allclose(curves[1], 5.0)
+
+
+def test_binning_matches_mean_of_pixels_in_each_bin():
+    binning = QBinning(GEOMETRY, SHAPE)
+    frames = ring_frames(3)
+    curves = binning.reduce(frames)
+    bins = binning.bins.reshape(SHAPE)
+    for frame, curve in zip(frames, curves, strict=True):
+        expected = [frame[bins == i].mean() for i in range(GEOMETRY.num_bins)]
+        np.testing.assert_allclose(curve, expected)
+    # Intensity falls off with q, and scales with the frame
+    assert (np.diff(curves[0]) < 0).all()
+    np.testing.assert_allclose(curves[2], 3 * curves[0])
+
+
+def test_masked_pixels_are_ignored():
+    mask = np.zeros(SHAPE, dtype=bool)
+    mask[:, 32:] = True
+    frames = np.full((1, *SHAPE), 1.0)
+    frames[0, :, 32:] = 1e6
+    curve = QBinning(GEOMETRY, SHAPE, mask).reduce(frames)[0]
+    np.testing.assert_allclose(curve[~np.isnan(curve)], 1.0)
+
+
+@pytest.mark.skipif(
+    (os.cpu_count() or 1) < 4,
+    reason="Reducing whole frames is memory bound, so needs frames in parallel",
+)
+def test_binning_keeps_up_with_pilatus_frame_rate():
+    # Pilatus3 2M frames, which it writes at up to 250 Hz
+    shape = (1679, 1475)
+    geometry = ReductionGeometry(
+        beam_centre_x=700.0, beam_centre_y=800.0, distance=3000.0, wavelength=1.0
+    )
+    binning = QBinning(geometry, shape)
+    frames = np.random.default_rng(0).poisson(50, (25, *shape)).astype(np.uint32)
+    binning.reduce(frames)
+
+    start = time.perf_counter()
+    for _ in range(4):
+        binning.reduce(frames)
+    frame_rate = 4 * len(frames) / (time.perf_counter() - start)
+
+    assert frame_rate > 250
+
+
+@pytest.fixture
+def frames_file(tmp_path: Path) -> Path:
+    return tmp_path / "saxs.h5"
+
+
+def test_live_reduction_reads_frames_as_they_are_written(frames_file: Path):
+    frames = ring_frames(4)
+    published: list[tuple[str, Mapping]] = []
+    reduction = LiveReduction(
+        {"saxs": GEOMETRY}, lambda name, doc: published.append((name, doc))
+    )
+
+    run = compose_run()
+    descriptor = run.compose_descriptor(
+        name="primary",
+        data_keys={
+            "saxs": DataKey(
+                source="ca://SAXS:HDF5:FullFileName_RBV",
+                dtype="array",
+                shape=[1, *SHAPE],
+                external="STREAM:",
+            )
+        },
+    ).descriptor_doc
+    resource = ComposeStreamResource()(
+        mimetype="application/x-hdf5",
+        uri=f"file://localhost{frames_file}",
+        data_key="saxs",
+        parameters={"dataset": "/entry/data/data", "chunk_shape": [1, *SHAPE]},
+    )
+    reduction("start", dict(run.start_doc))
+    reduction("descriptor", dict(descriptor))
+    reduction("stream_resource", dict(resource.stream_resource_doc))
+
+    with h5py.File(frames_file, "w", libver="latest") as f:
+        dataset = f.create_dataset(
+            "/entry/data/data",
+            shape=(0, *SHAPE),
+            maxshape=(None, *SHAPE),
+            chunks=(1, *SHAPE),
+            dtype=np.float64,
+        )
+        f.swmr_mode = True
+        for start, stop in [(0, 1), (1, 4)]:
+            dataset.resize(stop, axis=0)
+            dataset[start:stop] = frames[start:stop]
+            dataset.flush()
+            reduction(
+                "stream_datum",
+                dict(
+                    resource.compose_stream_datum(
+                        indices={"start": start, "stop": stop},
+                        seq_nums={"start": start + 1, "stop": stop + 1},
+                        descriptor=descriptor,
+                    )
+                ),
+            )
+    reduction("stop", dict(run.compose_stop()))
+
+    names = [name for name, _ in published]
+    assert names == ["start", "descriptor", "event_page", "event_page", "stop"]
+    assert published[0][1]["parent_uid"] == run.start_doc["uid"]
+    assert published[1][1]["name"] == "reduced_saxs"
+    pages = [doc for name, doc in published if name == "event_page"]
+    assert [page["seq_num"] for page in pages] == [[1], [2, 3, 4]]
+    curves = np.array([curve for page in pages for curve in page["data"]["saxs-I"]])
+    np.testing.assert_allclose(curves, QBinning(GEOMETRY, SHAPE).reduce(frames))
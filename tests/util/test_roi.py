@@ -0,0 +1,118 @@
+from pathlib import Path
+from typing import cast
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.run_engine import RunEngine
+from ophyd_async.core import (
+    StaticFilenameProvider,
+    StaticPathProvider,
+    init_devices,
+)
+from ophyd_async.epics.adpilatus import PilatusDetector
+from ophyd_async.testing import set_mock_value
+
+from i22_bluesky.util.roi import (
+    NDROIIO,
+    ROI_SUFFIX,
+    DetectorROI,
+    roi_wrapper,
+    validate_roi,
+)
+
+
+@pytest.fixture
+def mock_saxs(RE: RunEngine, tmp_path: Path) -> PilatusDetector:
+    roi = NDROIIO("BL22I-EA-PILAT-01:" + ROI_SUFFIX)
+    with init_devices(mock=True):
+        saxs = PilatusDetector(
+            "BL22I-EA-PILAT-01:",
+            StaticPathProvider(StaticFilenameProvider("foo"), tmp_path),
+            plugins={"roi": roi},
+        )
+    set_mock_value(saxs.driver.array_size_x, 1475)
+    set_mock_value(saxs.driver.array_size_y, 1679)
+    set_mock_value(saxs.fileio.nd_array_port, "PILAT1")
+    set_mock_value(saxs.fileio.file_path_exists, True)
+    set_mock_value(roi.port_name, "PILAT1.ROI")
+    return saxs
+
+
+def frame_shape_and_port(detector: PilatusDetector):
+    writer = detector._writer  # noqa: SLF001
+    (describe,) = yield from bps.wait_for([lambda: writer.open(detector.name)])
+    port = yield from bps.rd(detector.fileio.nd_array_port)
+    return tuple(describe.result()[detector.name]["shape"]), port
+
+
+def test_roi_wrapper_reduces_frame_shape_then_restores(
+    RE: RunEngine, mock_saxs: PilatusDetector
+):
+    region = DetectorROI(min_x=75, size_x=1000, bin_x=2, bin_y=4)
+    during = RE(
+        roi_wrapper(frame_shape_and_port(mock_saxs), {mock_saxs}, {"saxs": region})
+    ).plan_result
+    assert during == ((1, 1679 // 4, 1000 // 2), "PILAT1.ROI")
+
+    roi = cast(NDROIIO, mock_saxs.get_plugin("roi", NDROIIO))
+    assert RE(bps.rd(roi.nd_array_port)).plan_result == "PILAT1"
+    assert RE(bps.rd(roi.size_y)).plan_result == 1679
+
+    after = RE(frame_shape_and_port(mock_saxs)).plan_result
+    assert after == ((1, 1679, 1475), "PILAT1")
+
+
+def test_roi_wrapper_restores_after_failure(RE: RunEngine, mock_saxs: PilatusDetector):
+    def failing_plan():
+        yield from bps.null()
+        raise ValueError("Failed")
+
+    with pytest.raises(ValueError, match="Failed"):
+        RE(
+            roi_wrapper(
+                failing_plan(), {mock_saxs}, {"saxs": DetectorROI(bin_x=2, bin_y=2)}
+            )
+        )
+    after = RE(frame_shape_and_port(mock_saxs)).plan_result
+    assert after == ((1, 1679, 1475), "PILAT1")
+
+
+def test_roi_wrapper_rejects_unknown_detector(
+    RE: RunEngine, mock_saxs: PilatusDetector
+):
+    def plan():
+        yield from bps.null()
+
+    with pytest.raises(ValueError, match="waxs"):
+        RE(roi_wrapper(plan(), {mock_saxs}, {"waxs": DetectorROI()}))
+
+
+def test_detector_without_roi_plugin_is_rejected(RE: RunEngine, tmp_path: Path):
+    with init_devices(mock=True):
+        waxs = PilatusDetector(
+            "BL22I-EA-PILAT-03:",
+            StaticPathProvider(StaticFilenameProvider("foo"), tmp_path),
+        )
+
+    def plan():
+        yield from bps.null()
+
+    with pytest.raises(TypeError, match="waxs.roi"):
+        RE(roi_wrapper(plan(), {waxs}, {"waxs": DetectorROI()}))
+
+
+@pytest.mark.parametrize(
+    "region",
+    [
+        DetectorROI(min_x=1475),
+        DetectorROI(min_y=1000, size_y=700),
+        DetectorROI(size_x=2, bin_x=4),
+    ],
+)
+def test_region_must_fit_within_sensor(region: DetectorROI):
+    with pytest.raises(ValueError):
+        validate_roi(region, (1679, 1475))
+
+
+def test_region_defaults_to_edge_of_sensor():
+    assert validate_roi(DetectorROI(min_x=75, min_y=79), (1679, 1475)) == (1600, 1400)
@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+import pytest
+from ophyd_async.fastcs.panda import SeqTable, SeqTrigger
+
+from i22_bluesky.stubs.stopflow import stopflow_seq_table
+from i22_bluesky.util.seq_emulator import emulate_seq_table
+
+
+def test_stopflow_gates_follow_the_stop():
+    table = stopflow_seq_table(
+        pre_stop_frames=3,
+        post_stop_frames=4,
+        exposure=0.05,
+        shutter_time=4e-3,
+        deadtime=2e-3,
+        period=0.0,
+    )
+    timeline = emulate_seq_table(
+        table, {SeqTrigger.BITA_1: [(0.01, 0.02), (1.0, 1.1), (2.0, 2.1)]}
+    )
+    rising, falling = timeline.gates("b")
+    frame = np.arange(4) * 0.052
+    np.testing.assert_allclose(rising, np.concatenate([0.004 + frame[:3], 1 + frame]))
+    np.testing.assert_allclose(falling, rising + 0.05)
+    # Only the first stop after the pre-stop frames triggers the post-stop frames
+    assert timeline.end == pytest.approx(1 + 4 * 0.052 + 0.004)
+    # The shutter is held open while waiting for the stop
+    shutter_open, shutter_closed = timeline.gates("a")
+    np.testing.assert_allclose(shutter_open, [0.0])
+    np.testing.assert_allclose(shutter_closed, [1 + 4 * 0.052])
+    assert timeline.state("a", [-1.0, 0.5, 2.0]).tolist() == [False, True, False]
+
+
+@pytest.mark.parametrize(
+    "held,expected",
+    [
+        # Held high throughout, each repeat starts as soon as the last ends
+        ([(0.0, np.inf)], [0.0, 20e-6, 40e-6]),
+        # Held through two repeats, then the third waits for it to go high again
+        ([(5e-6, 30e-6), (100e-6, 110e-6)], [5e-6, 25e-6, 100e-6]),
+    ],
+)
+def test_condition_held_high_triggers_repeats(held, expected):
+    table = SeqTable.row(
+        trigger=SeqTrigger.BITA_1, repeats=3, time1=10, outb1=True, time2=10
+    )
+    timeline = emulate_seq_table(table, {SeqTrigger.BITA_1: held})
+    rising, _ = timeline.gates("b")
+    np.testing.assert_allclose(rising, expected)
+    assert timeline.end == pytest.approx(expected[-1] + 20e-6)
+
+
+def test_condition_intervals_must_not_overlap():
+    table = SeqTable.row(trigger=SeqTrigger.BITA_1)
+    with pytest.raises(ValueError, match="overlap"):
+        emulate_seq_table(table, {SeqTrigger.BITA_1: [(0.0, 2.0), (1.0, 3.0)]})
+
+
+def test_waits_indefinitely_without_trigger():
+    table = stopflow_seq_table(0, 2, 0.1, 4e-3, 2e-3, 0.0)
+    timeline = emulate_seq_table(table)
+    assert timeline.end == np.inf
+    assert timeline.gates("b")[0].size == 0
+    assert timeline.state("a", [1e6]).tolist() == [True]
+
+
+def test_table_repeats():
+    table = SeqTable.row(repeats=2, time1=10, outb1=True, time2=20)
+    timeline = emulate_seq_table(table, repeats=3)
+    rising, falling = timeline.gates("b")
+    np.testing.assert_allclose(rising, np.arange(6) * 30e-6)
+    np.testing.assert_allclose(falling, rising + 10e-6)
+    assert timeline.end == pytest.approx(180e-6)
+
+
+def test_millions_of_frames_quickly():
+    table = SeqTable.row(time2=4000, outa2=True) + SeqTable.row(
+        repeats=50000, time1=1000, outa1=True, outb1=True, time2=10, outa2=True
+    )
+    started = time.monotonic()
+    timeline = emulate_seq_table(table, repeats=40)
+    assert time.monotonic() - started < 5.0
+    assert timeline.gates("b")[0].size == 2_000_000
@@ -0,0 +1,109 @@
+from pathlib import Path
+from unittest.mock import Mock
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg
+from ophyd_async.core import Device, SignalRW, YamlSettingsProvider, soft_signal_rw
+
+from i22_bluesky.util import settings
+from i22_bluesky.util.settings import load_device
+from i22_bluesky.util.state_cache import DEFAULT_STATE_CACHE, StateCache, cached_mv
+from i22_bluesky.util.trace import set_msg_hook
+
+
+@pytest.fixture
+def signal(RE: RunEngine) -> SignalRW[float]:
+    signal = soft_signal_rw(float, name="signal")
+    RE(bps.wait_for([signal.connect]))
+    return signal
+
+
+def sets(RE: RunEngine, plan) -> list[Msg]:
+    msgs: list[Msg] = []
+    set_msg_hook(RE, msgs.append)
+    RE(plan)
+    set_msg_hook(RE, None)
+    return [msg for msg in msgs if msg.command == "set"]
+
+
+def test_second_set_to_same_value_is_skipped(RE: RunEngine, signal: SignalRW[float]):
+    cache = StateCache()
+
+    assert len(sets(RE, cached_mv(signal, 3.0, cache=cache))) == 1
+    assert sets(RE, cached_mv(signal, 3.0, cache=cache)) == []
+    assert RE(bps.rd(signal)).plan_result == 3.0
+    assert len(sets(RE, cached_mv(signal, 4.0, cache=cache))) == 1
+
+
+def test_set_within_tolerance_is_skipped(RE: RunEngine, signal: SignalRW[float]):
+    cache = StateCache()
+    RE(cache.watch(signal, tolerance=0.5))
+
+    RE(cached_mv(signal, 20.0, cache=cache))
+
+    assert sets(RE, cached_mv(signal, 20.4, cache=cache)) == []
+    assert len(sets(RE, cached_mv(signal, 21.0, cache=cache))) == 1
+
+
+def test_change_from_elsewhere_forgets_value(RE: RunEngine, signal: SignalRW[float]):
+    cache = StateCache()
+    RE(cached_mv(signal, 3.0, cache=cache))
+
+    # Moved by something other than the cache, e.g. from another client
+    RE(bps.mv(signal, 5.0))
+
+    assert not cache.is_at(signal, 3.0)
+    assert len(sets(RE, cached_mv(signal, 3.0, cache=cache))) == 1
+
+
+def test_cache_is_separate_per_device(RE: RunEngine, signal: SignalRW[float]):
+    cache = StateCache()
+    other = soft_signal_rw(float, name="other")
+    RE(bps.wait_for([other.connect]))
+
+    RE(cached_mv(signal, 3.0, cache=cache))
+
+    assert cache.is_at(signal, 3.0)
+    assert not cache.is_at(other, 3.0)
+
+
+def test_invalidate_forgets_every_value(RE: RunEngine, signal: SignalRW[float]):
+    cache = StateCache()
+    RE(cached_mv(signal, 3.0, cache=cache))
+
+    cache.invalidate()
+
+    assert len(sets(RE, cached_mv(signal, 3.0, cache=cache))) == 1
+
+
+def test_device_without_readback_is_always_moved():
+    cache = StateCache()
+    device = Mock()
+
+    for _ in range(2):
+        msgs = list(cached_mv(device, 1.0, cache=cache))
+        assert Msg("set", device, 1.0, group=msgs[0].kwargs["group"]) in msgs
+        cache.confirm(device, 1.0)
+        assert not cache.is_at(device, 1.0)
+
+
+class Settable(Device):
+    def __init__(self, name: str = ""):
+        self.value = soft_signal_rw(float)
+        super().__init__(name)
+
+
+def test_loading_settings_forgets_their_values(
+    RE: RunEngine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    device = Settable(name="device")
+    RE(bps.wait_for([device.connect]))
+    (tmp_path / "plan.yaml").write_text("value: 5.0\n")
+    monkeypatch.setattr(settings, "_SETTINGS_PROVIDER", YamlSettingsProvider(tmp_path))
+    RE(cached_mv(device.value, 3.0))
+
+    RE(load_device(device, "plan"))
+
+    assert not DEFAULT_STATE_CACHE.is_at(device.value, 3.0)
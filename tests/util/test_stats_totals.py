@@ -0,0 +1,100 @@
+from collections.abc import Mapping
+from pathlib import Path
+
+import h5py
+import numpy as np
+from event_model import ComposeStreamResource, DataKey, compose_run
+
+from i22_bluesky.util.stats_totals import BeamLossThreshold, StatsTotals
+
+
+def test_beam_loss_compares_to_recent_frames_with_beam():
+    totals = StatsTotals(
+        ["saxs"], lambda name, doc: None, BeamLossThreshold(minimum=50.0, window=3)
+    )
+    lost = totals.beam_lost("saxs", np.array([100.0, 110.0, 10.0, 90.0]))
+    assert lost.tolist() == [False, False, True, False]
+    # Reference is now the median of 100, 110 and 90, the lost frame excluded
+    lost = totals.beam_lost("saxs", np.array([60.0, 40.0]))
+    assert lost.tolist() == [False, True]
+
+
+def test_beam_lost_from_first_frame_is_flagged():
+    totals = StatsTotals(
+        ["saxs"], lambda name, doc: None, BeamLossThreshold(minimum=50.0)
+    )
+    # Compared to their own median these would all have beam
+    lost = totals.beam_lost("saxs", np.array([10.0, 12.0, 11.0]))
+    assert lost.tolist() == [True, True, True]
+
+
+def test_recent_frames_kept_between_runs():
+    totals = StatsTotals(
+        ["saxs"], lambda name, doc: None, BeamLossThreshold(minimum=1.0)
+    )
+    totals.beam_lost("saxs", np.array([100.0, 100.0]))
+
+    totals("start", dict(compose_run().start_doc))
+
+    lost = totals.beam_lost("saxs", np.array([20.0, 90.0]))
+    assert lost.tolist() == [True, False]
+
+
+def test_totals_published_per_frame(tmp_path: Path):
+    path = tmp_path / "saxs.h5"
+    sums = np.array([1000.0, 1010.0, 20.0, 30.0, 1005.0, 1000.0])
+    with h5py.File(path, "w") as f:
+        f["/entry/data/data"] = np.zeros((6, 4, 4))
+        f["/entry/instrument/NDAttributes/saxs-sum"] = sums
+
+    published: list[tuple[str, Mapping]] = []
+    totals = StatsTotals(
+        ["saxs"],
+        lambda name, doc: published.append((name, doc)),
+        BeamLossThreshold(minimum=500.0),
+    )
+    run = compose_run()
+    descriptor = run.compose_descriptor(
+        name="primary",
+        data_keys={
+            "saxs": DataKey(
+                source="ca://SAXS:HDF5:FullFileName_RBV",
+                dtype="array",
+                shape=[2, 4, 4],
+                external="STREAM:",
+            )
+        },
+    ).descriptor_doc
+    resource = ComposeStreamResource()(
+        mimetype="application/x-hdf5",
+        uri=f"file://localhost{path}",
+        data_key="saxs",
+        parameters={"dataset": "/entry/data/data", "chunk_shape": [1, 4, 4]},
+    )
+    totals("start", dict(run.start_doc))
+    totals("descriptor", dict(descriptor))
+    totals("stream_resource", dict(resource.stream_resource_doc))
+    totals(
+        "stream_datum",
+        dict(
+            resource.compose_stream_datum(
+                indices={"start": 0, "stop": 3},
+                seq_nums={"start": 1, "stop": 4},
+                descriptor=descriptor,
+            )
+        ),
+    )
+    totals("stop", dict(run.compose_stop()))
+
+    assert [name for name, _ in published] == [
+        "start",
+        "descriptor",
+        "event_page",
+        "stop",
+    ]
+    assert published[1][1]["name"] == "totals_saxs"
+    page = published[2][1]
+    # Two exposures per event are summed
+    assert page["data"]["saxs-sum"] == [2010.0, 50.0, 2005.0]
+    assert page["data"]["saxs-beam_lost"] == [False, True, False]
+    assert page["seq_num"] == [1, 2, 3]
@@ -0,0 +1,75 @@
+from unittest.mock import AsyncMock, Mock
+
+import bluesky.preprocessors as bpp
+import pytest
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg
+
+from i22_bluesky.util.telemetry import (
+    DetectorLagError,
+    FrameRateSample,
+    FrameRateTelemetry,
+    read_frames_written,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def test_rates_and_lag_of_each_stream():
+    clock = Clock()
+    samples: list[FrameRateSample] = []
+    telemetry = FrameRateTelemetry(publish=samples.append, clock=clock)
+    telemetry.start()
+
+    clock.time = 1.0
+    telemetry.update({"main": {"saxs": 100, "panda1": 100}, "main_divided": {"oav": 4}})
+    clock.time = 1.5
+    sample = telemetry.update(
+        {"main": {"saxs": 140, "panda1": 150}, "main_divided": {"oav": 6}}
+    )
+
+    assert samples[-1] is sample
+    assert sample.instantaneous_rate == pytest.approx(
+        {"saxs": 80.0, "panda1": 100.0, "oav": 4.0}
+    )
+    assert sample.average_rate == pytest.approx(
+        {"saxs": 140 / 1.5, "panda1": 100.0, "oav": 4.0}
+    )
+    # Detectors at a divided rate are not compared with the others
+    assert sample.lag == {"main": 10, "main_divided": 0}
+    assert "saxs 140" in sample.summary()
+
+
+def test_abort_when_detector_falls_behind():
+    clock = Clock()
+    telemetry = FrameRateTelemetry(max_lag=10, publish=lambda sample: None, clock=clock)
+    telemetry.start()
+    telemetry.update({"main": {"saxs": 100, "waxs": 90}})
+    with pytest.raises(DetectorLagError, match="10 frames"):
+        telemetry.update({"main": {"saxs": 200, "waxs": 189}})
+
+
+def test_frames_written_read_together(RE: RunEngine):
+    detectors = []
+    for name, count in (("saxs", 100), ("waxs", 98), ("panda", 100)):
+        detector = Mock()
+        detector.name = name
+        detector.get_index = AsyncMock(return_value=count)
+        detectors.append(detector)
+    msgs: list[Msg] = []
+
+    def record(msg: Msg) -> Msg:
+        msgs.append(msg)
+        return msg
+
+    plan = bpp.msg_mutator(read_frames_written(detectors), record)
+    frames_written = RE(plan).plan_result
+
+    assert frames_written == {"saxs": 100, "waxs": 98, "panda": 100}
+    assert [msg.command for msg in msgs] == ["wait_for"]
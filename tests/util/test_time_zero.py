@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Any
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+import h5py
+import numpy as np
+import pytest
+from bluesky.run_engine import RunEngine
+from ophyd_async.core import (
+    Device,
+    DeviceVector,
+    StaticFilenameProvider,
+    StaticPathProvider,
+    init_devices,
+    soft_signal_rw,
+)
+from ophyd_async.fastcs.panda import HDFPanda
+from ophyd_async.testing import set_mock_value
+
+from i22_bluesky.stubs.stopflow import (
+    TIME_SINCE_STOP_STREAM,
+    capture_stop_time,
+    record_time_since_stop,
+)
+from i22_bluesky.util.time_zero import (
+    STOP_TIME_FIELD,
+    STOP_TIME_KEY,
+    TimeZeroSource,
+    read_time_zero,
+    time_since_stop,
+)
+
+# Two frames every 10 ms, a stop at 26.5 ms, frames every 10 ms from 30 ms
+GATE_TIMES = np.array([0.0, 0.01, 0.03, 0.04, 0.05])
+
+
+def write_capture(path: Path, stop_time: bool = True) -> Path:
+    with h5py.File(path, "w") as file:
+        file["time"] = GATE_TIMES
+        if stop_time:
+            # Latched from the stop, so garbage before it
+            file["stop_time"] = [0.0, 0.0, 0.0265, 0.0265, 0.0265]
+    return path
+
+
+def test_frames_timed_from_bita_edge():
+    timed = time_since_stop(GATE_TIMES, 2, [0.0, 0.0, 0.0265, 0.0265, 0.0265])
+    assert timed.source == TimeZeroSource.BITA_EDGE
+    assert timed.time_zero == pytest.approx(0.0265)
+    np.testing.assert_allclose(
+        timed.time_since_stop, [-0.0265, -0.0165, 0.0035, 0.0135, 0.0235]
+    )
+
+
+def test_frames_timed_from_first_post_stop_gate_without_edge(tmp_path: Path):
+    timed = read_time_zero(write_capture(tmp_path / "panda.h5", False), 2)
+    assert timed.source == TimeZeroSource.FIRST_POST_STOP_GATE
+    np.testing.assert_allclose(timed.time_since_stop, [-0.03, -0.02, 0, 0.01, 0.02])
+    with pytest.raises(ValueError, match="No post-stop gates"):
+        time_since_stop(GATE_TIMES[:2], 2)
+
+
+@pytest.fixture
+def panda(RE: RunEngine, tmp_path: Path) -> HDFPanda:
+    with init_devices(mock=True):
+        panda = HDFPanda(
+            "PANDA:", StaticPathProvider(StaticFilenameProvider("panda"), tmp_path)
+        )
+    return panda
+
+
+class Counter(Device):
+    def __init__(self, name: str = ""):
+        self.out_capture = soft_signal_rw(str, "No")
+        self.out_dataset = soft_signal_rw(str, "")
+        super().__init__(name)
+
+
+def test_latched_stop_time_captured(RE: RunEngine, panda: HDFPanda):
+    # Fields are only discovered from a real PandA, so add the counter
+    extended: Any = panda
+    extended.counter = DeviceVector({1: Counter()})
+    RE(bps.wait_for([lambda: panda.connect(mock=True)]))
+
+    RE(capture_stop_time(panda))
+
+    assert RE(bps.rd(extended.counter[1].out_capture)).plan_result == "Value"
+    assert RE(bps.rd(extended.counter[1].out_dataset)).plan_result == STOP_TIME_KEY
+
+
+def test_missing_stop_time_warned(
+    RE: RunEngine, panda: HDFPanda, tmp_path: Path, caplog: pytest.LogCaptureFixture
+):
+    RE(capture_stop_time(panda))
+    assert STOP_TIME_FIELD in caplog.text
+
+    write_capture(tmp_path / "panda.h5", stop_time=False)
+    set_mock_value(panda.data.hdf_directory, str(tmp_path))
+    set_mock_value(panda.data.hdf_file_name, "panda.h5")
+    RE(bpp.run_wrapper(record_time_since_stop(panda, 2)))
+    assert "timing frames from the first post-stop gate" in caplog.text
+
+
+def test_time_since_stop_emitted_in_run(RE: RunEngine, panda: HDFPanda, tmp_path: Path):
+    write_capture(tmp_path / "panda.h5")
+    set_mock_value(panda.data.hdf_directory, str(tmp_path))
+    set_mock_value(panda.data.hdf_file_name, "panda.h5")
+    docs = []
+    RE(
+        bpp.run_wrapper(record_time_since_stop(panda, 2)),
+        lambda name, doc: docs.append((name, doc)),
+    )
+
+    (descriptor,) = [doc for name, doc in docs if name == "descriptor"]
+    (event,) = [doc for name, doc in docs if name == "event"]
+    assert descriptor["name"] == TIME_SINCE_STOP_STREAM
+    assert event["data"]["stop-source"] == "bita_edge"
+    np.testing.assert_allclose(
+        event["data"]["stop-time_since_stop"], GATE_TIMES - 0.0265
+    )
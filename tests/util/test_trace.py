@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import bluesky.plan_stubs as bps
+import bluesky.preprocessors as bpp
+from bluesky.run_engine import RunEngine
+from bluesky.utils import Msg
+from ophyd_async.core import init_devices, soft_signal_rw
+
+from i22_bluesky.util.trace import set_msg_hook, start_tracing, stop_tracing, traced
+
+
+@traced
+def set_both(a, b):
+    yield from bps.abs_set(a, 1.0, group="both")
+    yield from bps.abs_set(b, 2.0, group="both")
+    yield from bps.wait(group="both")
+
+
+@traced
+def outer(a, b):
+    yield from set_both(a, b)
+    yield from bps.sleep(0.01)
+
+
+def test_nested_stubs_and_grouped_waits_traced(RE: RunEngine, tmp_path: Path):
+    with init_devices():
+        a = soft_signal_rw(float)
+        b = soft_signal_rw(float)
+    messages: list[Msg] = []
+    set_msg_hook(RE, messages.append)
+    start_tracing(RE, tmp_path)
+    try:
+        RE(bpp.run_wrapper(outer(a, b)))
+    finally:
+        stop_tracing(RE)
+
+    # The previous msg_hook is still called, and restored
+    assert RE.msg_hook == messages.append
+    assert any(msg.command == "set" for msg in messages)
+
+    (path,) = tmp_path.glob("*.json")
+    events = json.loads(path.read_text())["traceEvents"]
+    stubs = [(e["ph"], e["name"]) for e in events if e.get("tid") == 1 and "ts" in e]
+    assert stubs == [
+        ("B", "test_trace.outer"),
+        ("B", "test_trace.set_both"),
+        ("E", "test_trace.set_both"),
+        ("E", "test_trace.outer"),
+    ]
+    grouped = [(e["ph"], e["name"]) for e in events if e.get("id") == "both"]
+    # Both sets are under way together, until the wait for them finishes
+    assert grouped == [
+        ("b", "set a"),
+        ("b", "set b"),
+        ("b", "wait both"),
+        ("e", "set a"),
+        ("e", "set b"),
+        ("e", "wait both"),
+    ]
+    (sleep,) = [e for e in events if e["name"] == "sleep"]
+    assert sleep["dur"] >= 0.01 * 1e6
+
+
+def test_untraced_plan_returned_when_disabled():
+    plan = set_both(None, None)
+    assert plan.gi_code is set_both.__wrapped__.__code__
+    plan.close()
@@ -0,0 +1,104 @@
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import h5py
+import numpy as np
+from event_model import ComposeStreamResource, compose_run
+from ophyd_async.fastcs.panda import SeqTable, SeqTrigger
+
+from i22_bluesky.stubs.stopflow import stopflow_seq_table
+from i22_bluesky.util.seq_emulator import emulate_seq_table
+from i22_bluesky.util.trigger_analysis import (
+    TriggerAnalysis,
+    TriggerReport,
+    analyse_triggers,
+)
+
+
+def test_missed_and_unexpected_gates_found():
+    table = stopflow_seq_table(3, 4, 0.05, 4e-3, 2e-3, 0.0)
+    expected, _ = emulate_seq_table(table, {SeqTrigger.BITA_1: [(1.0, np.inf)]}).gates(
+        "b"
+    )
+    rng = np.random.default_rng(0)
+    captured = expected + 12.5 + rng.normal(0, 2e-6, len(expected))
+    # First and a post stop gate missed, one spurious gate
+    captured = np.append(np.delete(captured, [0, 5]), 12.5 + 0.5)
+
+    report = analyse_triggers(captured, expected, {"saxs": 5, "waxs": 7})
+    assert abs(report.offset - 12.5) < 1e-5
+    assert report.missed.tolist() == [0, 5]
+    assert report.unexpected.tolist() == [2]
+    assert np.abs(report.jitter).max() < 1e-5
+    assert report.frame_count_mismatches == {"saxs": -2}
+    assert "6/7 gates captured, 2 missed, 1 unexpected" in report.summary()
+    assert "saxs wrote 5 frames, expected 7" in report.summary()
+
+
+def test_million_gate_capture_analysed_at_end_of_run(tmp_path: Path):
+    table = SeqTable.row(repeats=50000, time1=1000, outb1=True, time2=10)
+    expected, _ = emulate_seq_table(table, repeats=20).gates("b")
+    panda_file, saxs_file = tmp_path / "panda.h5", tmp_path / "saxs.h5"
+    with h5py.File(panda_file, "w") as f:
+        f["/time"] = expected + 3.0
+    with h5py.File(saxs_file, "w") as f:
+        f.create_dataset("/entry/data/data", shape=(999_999, 1679, 1475), dtype="u4")
+
+    reports: list[TriggerReport] = []
+    analysis = TriggerAnalysis(lambda start: expected, reports.append)
+    run = compose_run(metadata={"detectors": ["saxs"]})
+    analysis("start", dict(run.start_doc))
+    for key, path, dataset in (
+        ("time", panda_file, "/time"),
+        ("saxs", saxs_file, "/entry/data/data"),
+    ):
+        resource = ComposeStreamResource()(
+            mimetype="application/x-hdf5",
+            uri=f"file://localhost{path}",
+            data_key=key,
+            parameters={"dataset": dataset},
+        )
+        analysis("stream_resource", dict(resource.stream_resource_doc))
+    started = time.monotonic()
+    analysis("stop", dict(run.compose_stop()))
+    assert time.monotonic() - started < 5.0
+
+    (report,) = reports
+    assert report.num_captured == report.num_expected == 1_000_000
+    assert len(report.missed) == len(report.unexpected) == 0
+    assert report.frame_count_mismatches == {"saxs": -1}
+
+
+def test_files_still_open_for_write_analysed(
+    tmp_path: Path, hold_open_for_write: Callable[..., None]
+):
+    expected = np.arange(10) * 0.1
+    panda_file, saxs_file = tmp_path / "panda.h5", tmp_path / "saxs.h5"
+    with h5py.File(panda_file, "w", libver="latest") as f:
+        f["/time"] = expected + 3.0
+    with h5py.File(saxs_file, "w", libver="latest") as f:
+        f.create_dataset("/entry/data/data", shape=(10, 4, 4), dtype="u4")
+    # The stop document is sent before the writers are closed on unstage
+    hold_open_for_write(panda_file, saxs_file)
+
+    reports: list[TriggerReport] = []
+    analysis = TriggerAnalysis(lambda start: expected, reports.append)
+    run = compose_run(metadata={"detectors": ["saxs"]})
+    analysis("start", dict(run.start_doc))
+    for key, path, dataset in (
+        ("time", panda_file, "/time"),
+        ("saxs", saxs_file, "/entry/data/data"),
+    ):
+        resource = ComposeStreamResource()(
+            mimetype="application/x-hdf5",
+            uri=f"file://localhost{path}",
+            data_key=key,
+            parameters={"dataset": dataset},
+        )
+        analysis("stream_resource", dict(resource.stream_resource_doc))
+    analysis("stop", dict(run.compose_stop()))
+
+    (report,) = reports
+    assert report.num_captured == report.num_expected == 10
+    assert report.frame_counts == {"saxs": 10}
@@ -0,0 +1,132 @@
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import bluesky.plan_stubs as bps
+import h5py
+import numpy as np
+import pytest
+from bluesky.run_engine import RunEngine
+from ophyd_async.core import StaticFilenameProvider, StaticPathProvider, init_devices
+from ophyd_async.epics.adcore import ADCompression
+from ophyd_async.epics.adpilatus import PilatusDetector
+
+from i22_bluesky.util.writer_profiles import (
+    WriterProfile,
+    apply_writer_profile,
+)
+
+# h5py equivalents of the areaDetector filters. LZ4 with bitshuffle needs the
+# hdf5plugin filters, without them LZF is the closest fast built-in compressor.
+try:
+    import hdf5plugin
+
+    FAST_FILTER: dict[str, Any] = dict(hdf5plugin.Bitshuffle(cname="lz4"))
+except ImportError:
+    FAST_FILTER = {"compression": "lzf", "shuffle": True}
+
+H5PY_COMPRESSION: dict[WriterProfile, dict[str, Any]] = {
+    WriterProfile.FAST: FAST_FILTER,
+    WriterProfile.ARCHIVE: {"compression": "gzip", "compression_opts": 6},
+    WriterProfile.NONE: {},
+}
+
+
+@pytest.fixture
+def mock_saxs(RE: RunEngine, tmp_path: Path) -> PilatusDetector:
+    with init_devices(mock=True):
+        saxs = PilatusDetector(
+            "SAXS:", StaticPathProvider(StaticFilenameProvider("foo"), tmp_path)
+        )
+    return saxs
+
+
+@pytest.mark.parametrize(
+    "profile,compression",
+    [
+        (WriterProfile.FAST, ADCompression.BSLZ4),
+        (WriterProfile.ARCHIVE, ADCompression.ZLIB),
+        (WriterProfile.NONE, ADCompression.NONE),
+    ],
+)
+def test_apply_writer_profile(
+    RE: RunEngine,
+    mock_saxs: PilatusDetector,
+    profile: WriterProfile,
+    compression: ADCompression,
+):
+    RE(apply_writer_profile({mock_saxs}, profile))
+    assert RE(bps.rd(mock_saxs.fileio.compression)).plan_result == compression
+
+
+def test_no_writer_profile_leaves_compression(
+    RE: RunEngine, mock_saxs: PilatusDetector
+):
+    RE(apply_writer_profile({mock_saxs}, WriterProfile.ARCHIVE))
+    RE(apply_writer_profile({mock_saxs}, None))
+    assert RE(bps.rd(mock_saxs.fileio.compression)).plan_result == ADCompression.ZLIB
+
+
+def synthetic_frames(num_frames: int, shape: tuple[int, int]) -> np.ndarray:
+    # Poisson counts falling off radially from the centre, like SAXS data
+    rng = np.random.default_rng(0)
+    y, x = np.indices(shape)
+    r = np.hypot(y - shape[0] / 2, x - shape[1] / 2)
+    mean = 1e4 / (1.0 + (r / 20.0) ** 2)
+    return rng.poisson(mean, size=(num_frames, *shape)).astype(np.uint32)
+
+
+def write_frames(profile: WriterProfile, frames: np.ndarray, path: Path) -> float:
+    # One frame at a time into a frame-aligned chunked dataset, as the HDF writer
+    # would, returning the seconds taken
+    with h5py.File(path, "w") as f:
+        dataset = f.create_dataset(
+            "/entry/data/data",
+            shape=(0, *frames.shape[1:]),
+            maxshape=(None, *frames.shape[1:]),
+            chunks=(1, *frames.shape[1:]),
+            dtype=frames.dtype,
+            **H5PY_COMPRESSION[profile],
+        )
+        start = time.perf_counter()
+        for index, frame in enumerate(frames):
+            dataset.resize(index + 1, axis=0)
+            dataset[index] = frame
+        f.flush()
+        return time.perf_counter() - start
+
+
+#: Frame size of the Pilatus 3 2M on SAXS
+PILATUS_SHAPE = (1679, 1475)
+
+
+def test_benchmark_writer_profiles(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    record_property: Callable[[str, object], None],
+):
+    frames = synthetic_frames(num_frames=5, shape=PILATUS_SHAPE)
+
+    rates: dict[WriterProfile, float] = {}
+    ratios: dict[WriterProfile, float] = {}
+    for profile in WriterProfile:
+        path = tmp_path / f"{profile.value}.h5"
+        rates[profile] = len(frames) / write_frames(profile, frames, path)
+        ratios[profile] = frames.nbytes / path.stat().st_size
+        record_property(f"{profile.value}_frames_per_second", rates[profile])
+        record_property(f"{profile.value}_compression_ratio", ratios[profile])
+    with capsys.disabled():
+        print(
+            "".join(
+                f"\n{profile.value:>8}: {rates[profile]:7.1f} frames/s, "
+                f"compression ratio {ratios[profile]:.2f}"
+                for profile in WriterProfile
+            )
+        )
+
+    assert ratios[WriterProfile.NONE] == pytest.approx(1, rel=0.2)
+    assert ratios[WriterProfile.FAST] > 1.5
+    assert ratios[WriterProfile.ARCHIVE] > 1.5
+    # The point of FAST is to write frames much faster than ARCHIVE does
+    assert rates[WriterProfile.FAST] > 2 * rates[WriterProfile.ARCHIVE]